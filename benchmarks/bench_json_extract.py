@@ -0,0 +1,161 @@
+"""
+Micro-benchmark: single-pass json_extract vs the former six-method cascade.
+
+Runs both extractors over a corpus of model responses and reports the mean
+time per response, the speed-up and how often both return the same code.
+Pass --corpus with a JSONL file of {"response": "..."} objects (e.g. raw
+responses saved from real runs); without it a synthetic corpus covering the
+usual failure modes is generated from input.csv.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from json_extract import extract_translated_code  # noqa: E402
+
+
+def legacy_extract_code_from_json(response_text):
+    """
+    The six-method cascade extract_code_from_json used before json_extract.
+    """
+    response_text = response_text.strip()
+
+    try:
+        data = json.loads(response_text)
+        if 'translated_code' in data:
+            return data['translated_code'].strip()
+    except json.JSONDecodeError:
+        pass
+
+    json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
+    matches = re.findall(json_pattern, response_text, re.DOTALL)
+    if matches:
+        try:
+            data = json.loads(matches[0])
+            if 'translated_code' in data:
+                return data['translated_code'].strip()
+        except json.JSONDecodeError:
+            pass
+
+    value_pattern = r'"translated_code"\s*:\s*"((?:[^"\\]|\\.)*)"'
+    matches = re.findall(value_pattern, response_text, re.DOTALL)
+    if matches:
+        code = matches[0]
+        code = code.replace('\\"', '"')
+        code = code.replace('\\n', '\n')
+        code = code.replace('\\t', '\t')
+        return code.strip()
+
+    if '"translated_code"' in response_text:
+        brace_count = 0
+        start_idx = -1
+        for i, char in enumerate(response_text):
+            if char == '{':
+                if brace_count == 0:
+                    start_idx = i
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
+                if brace_count == 0 and start_idx != -1:
+                    try:
+                        data = json.loads(response_text[start_idx:i+1])
+                        if 'translated_code' in data:
+                            return data['translated_code'].strip()
+                    except json.JSONDecodeError:
+                        continue
+
+    code_pattern = r'```(?:fortran)?\s*(.*?)\s*```'
+    code_matches = re.findall(code_pattern, response_text, re.DOTALL | re.IGNORECASE)
+    if code_matches:
+        return code_matches[0].strip()
+
+    if response_text.startswith('{'):
+        cleaned = re.sub(r'^\s*\{\s*"translated_code"\s*:\s*"', '', response_text)
+        cleaned = re.sub(r'"\s*\}\s*$', '', cleaned)
+        cleaned = cleaned.replace('\\"', '"')
+        cleaned = cleaned.replace('\\n', '\n')
+        cleaned = cleaned.replace('\\t', '\t')
+        if cleaned != response_text and len(cleaned) > 0:
+            return cleaned.strip()
+
+    return response_text.strip()
+
+
+def synthetic_corpus(input_csv, repeat):
+    """
+    Responses in the shapes models actually produce, built around real snippets.
+    """
+    with open(input_csv, 'r', newline='', encoding='utf-8') as f:
+        snippets = [row['legacy_code'] for row in csv.DictReader(f) if row.get('legacy_code')]
+
+    corpus = []
+    for snippet in snippets:
+        code = (f"module x_mod\n  implicit none\ncontains\n  subroutine x()\n"
+                f"    write(*,*) 'step é'\n{snippet}\n  end subroutine x\nend module x_mod\n") * repeat
+        valid = json.dumps({"translated_code": code})
+        corpus += [
+            ('valid', valid),
+            ('fenced', f"```json\n{valid}\n```"),
+            ('chatter', f"Here is the translation:\n{valid}\nLet me know if you need {{anything}} else."),
+            ('unescaped-quotes', '{"translated_code": "' + code.replace('\n', '\\n') + ' print *, "done""}'),
+            ('truncated', valid[:len(valid) * 2 // 3]),
+            ('fortran-block', f"Sure!\n```fortran\n{code}```\nDone."),
+            ('brace-heavy', ("{ " * 200 + "} " * 200) * repeat + valid[:-2]),
+        ]
+    return corpus
+
+
+def load_corpus(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [('corpus', json.loads(line)['response']) for line in f if line.strip()]
+
+
+def time_extractor(extract, corpus, rounds):
+    timings = defaultdict(float)
+    for _ in range(rounds):
+        for category, response in corpus:
+            start = time.perf_counter()
+            extract(response)
+            timings[category] += time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description='Benchmark the JSON extractors.')
+    parser.add_argument('--corpus', default=None, help='JSONL file of {"response": ...} objects')
+    parser.add_argument('--input-csv', default=os.path.join(root, 'input.csv'),
+                        help='Snippets for the synthetic corpus (default: input.csv)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='How many times each synthetic snippet is repeated, i.e. response size (default: 20)')
+    parser.add_argument('--rounds', type=int, default=20, help='Passes over the corpus (default: 20)')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.input_csv, args.repeat)
+    counts = defaultdict(int)
+    agree = defaultdict(int)
+    for category, response in corpus:
+        counts[category] += 1
+        agree[category] += legacy_extract_code_from_json(response) == extract_translated_code(response)[0]
+
+    legacy = time_extractor(legacy_extract_code_from_json, corpus, args.rounds)
+    single_pass = time_extractor(extract_translated_code, corpus, args.rounds)
+
+    print(f"{'category':<18}{'n':>4}{'legacy us':>12}{'new us':>10}{'speed-up':>10}{'same':>6}")
+    for category in counts:
+        n = counts[category] * args.rounds
+        old_us = legacy[category] / n * 1e6
+        new_us = single_pass[category] / n * 1e6
+        print(f"{category:<18}{counts[category]:>4}{old_us:>12.1f}{new_us:>10.1f}"
+              f"{old_us / new_us:>9.1f}x{agree[category]:>6}")
+    total_old = sum(legacy.values())
+    total_new = sum(single_pass.values())
+    print(f"{'total':<18}{len(corpus):>4}{total_old * 1e3:>10.1f}ms{total_new * 1e3:>8.1f}ms"
+          f"{total_old / total_new:>9.1f}x")
@@ -0,0 +1,97 @@
+"""
+Benchmark scoring.py on a synthetic results sheet.
+
+A reference column of ~--cell-bytes Fortran per row is built from
+input.csv-style statements, and every model column is the reference with a
+share of its lines dropped, duplicated or edited, so all three metrics have
+real work to do. Reports the wall time of score_csv.
+
+    python3 benchmarks/bench_scoring.py --rows 10000 --columns 6 --cell-bytes 1000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scoring import score_csv  # noqa: E402
+
+
+STATEMENTS = [
+    "do jr = ir, ubbcnt - 1",
+    "ur % ubb(jr) = ur % ubb(jr + 1)",
+    "end do",
+    "ubbcnt = size(ur % ubb, 1)",
+    "call segadj(ur, ubbcnt)",
+    "! [ooo].obsolete: segdes,ur",
+    "iur = fndur(lib, name)",
+    "if (iur == 0) then",
+    "write(*,*) 'cannot find user ', name",
+    "return",
+    "end if",
+    "bk => book_mypnt(lib, lb % bref(ibk))",
+    "title2 = bk % btitle",
+    "integer, intent(in) :: ibk",
+    "type(book), pointer :: bk",
+]
+
+
+def reference(rng, cell_bytes):
+    lines, size = [], 0
+    while size < cell_bytes:
+        line = rng.choice(STATEMENTS).replace('ibk', f"i{rng.randrange(100)}")
+        lines.append('  ' + line)
+        size += len(line) + 3
+    return lines
+
+
+def mutate(rng, lines, rate):
+    out = []
+    for line in lines:
+        roll = rng.random()
+        if roll < rate / 3:
+            continue
+        if roll < 2 * rate / 3:
+            out.append(line)
+        elif roll < rate:
+            line = line.replace('ur', 'usr').replace('==', '.eq.')
+        out.append(line)
+    return '\n'.join(out)
+
+
+def build_sheet(path, rows, columns, cell_bytes, seed=0):
+    rng = random.Random(seed)
+    names = [f"output_model_{k}" for k in range(columns)]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code', 'Reference'] + [c for name in names for c in (name, f"{name}_score")])
+        for _ in range(rows):
+            lines = reference(rng, cell_bytes)
+            cells = [mutate(rng, lines, 0.1 + 0.1 * k) for k in range(columns)]
+            writer.writerow(['x = 1', '\n'.join(lines)] + [c for cell in cells for c in (cell, '')])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark scoring.py on a synthetic sheet.')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows in the sheet (default: 10000)')
+    parser.add_argument('--columns', type=int, default=6, help='Model columns (default: 6)')
+    parser.add_argument('--cell-bytes', type=int, default=1000, help='Approximate size of each cell (default: 1000)')
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'sheet.csv')
+        build_sheet(path, args.rows, args.columns, args.cell_bytes)
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            summary = score_csv(path, path, workers=args.workers)
+        elapsed = time.perf_counter() - start
+    print(f"{args.rows} rows x {args.columns} columns (~{args.cell_bytes} bytes per cell), "
+          f"{os.cpu_count()} CPUs: {elapsed:.1f} s")
+    for col, means in summary.items():
+        print(f"  {col}: BLEU {means['bleu']}, chrF {means['chrf']}, edit {means['edit']}")
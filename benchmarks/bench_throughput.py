@@ -0,0 +1,216 @@
+"""
+Offline throughput benchmark: process_csv and VLLMClient against mock_vllm_server.
+
+The mock server runs in its own process with the given latency distribution,
+token rate, error rate and malformed-JSON rate. Each (rows, concurrency)
+case runs in a fresh child process so its CPU use and peak RSS are its own.
+Reports rows/s, request latency percentiles, CPU and peak RSS, and saves
+them as JSON; --compare prints the change against an earlier result file.
+
+    python3 benchmarks/bench_throughput.py --rows 200 1000 --concurrency 1 8 32
+    python3 benchmarks/bench_throughput.py --error-rate 0.02 --malformed-rate 0.1 --compare before.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import translate_fortran_json_response as translator  # noqa: E402
+from resilience import CircuitBreaker, RetryBudget  # noqa: E402
+from row_metrics import percentile  # noqa: E402
+from vllm_client import VLLMClient  # noqa: E402
+
+
+class TimedClient(VLLMClient):
+    """
+    VLLMClient that records the wall time of every completion request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def chat(self, payload):
+        start = time.perf_counter()
+        try:
+            return super().chat(payload)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def stream_chat(self, payload):
+        start = time.perf_counter()
+        try:
+            yield from super().stream_chat(payload)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def load_snippets(input_csv):
+    with open(input_csv, 'r', newline='', encoding='utf-8') as f:
+        snippets = [row['legacy_code'] for row in csv.DictReader(f) if row.get('legacy_code')]
+    return snippets or ['      x = 1']
+
+
+def write_rows(path, rows, snippets):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code'])
+        for i in range(rows):
+            writer.writerow([f"c row {i}\n{snippets[i % len(snippets)]}"])
+
+
+def run_case(case):
+    """
+    Translate a generated CSV once and measure it. Runs in a child process.
+    """
+    workdir = tempfile.mkdtemp(prefix='bench_throughput_')
+    input_csv = os.path.join(workdir, 'input.csv')
+    output_csv = os.path.join(workdir, 'output.csv')
+    write_rows(input_csv, case['rows'], load_snippets(case['input_csv']))
+
+    client = TimedClient(api_url=case['url'], pool_size=case['concurrency'], breaker=CircuitBreaker())
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), client:
+        settings = translator.TranslationSettings(concurrency=case['concurrency'], stream=case['stream'])
+        translator.process_csv(input_csv, output_csv, settings=settings, client=client, retry_budget=RetryBudget())
+    seconds = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+
+    with open(output_csv, 'r', newline='', encoding='utf-8') as f:
+        cells = [row['translated_code'] for row in csv.DictReader(f, delimiter=';')]
+    shutil.rmtree(workdir)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss_scale = 1 if sys.platform == 'darwin' else 1024
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return {
+        'rows': case['rows'],
+        'concurrency': case['concurrency'],
+        'stream': case['stream'],
+        'seconds': round(seconds, 3),
+        'rows_per_s': round(case['rows'] / seconds, 2),
+        'requests': len(client.latencies),
+        'latency_p50': round(percentile(client.latencies, 50), 4),
+        'latency_p95': round(percentile(client.latencies, 95), 4),
+        'latency_p99': round(percentile(client.latencies, 99), 4),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': round(100 * cpu / seconds, 1),
+        'peak_rss_mb': round(after.ru_maxrss * rss_scale / 2 ** 20, 1),
+        'error_rows': sum(1 for cell in cells if translator.is_translation_error(cell)),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_mock(args, port):
+    server = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'mock_vllm_server.py'), '--ports', str(port),
+        '--latency', str(args.latency), '--latency-distribution', args.latency_distribution,
+        '--token-rate', str(args.token_rate), '--error-rate', str(args.error_rate),
+        '--malformed-rate', str(args.malformed_rate), '--seed', str(args.seed),
+    ], stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Mock server did not start")
+
+
+def compare(results, baseline_file):
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {(r['rows'], r['concurrency'], r['stream']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_file}:")
+    for result in results:
+        old = baseline.get((result['rows'], result['concurrency'], result['stream']))
+        if old is None:
+            print(f"  rows={result['rows']} concurrency={result['concurrency']}: no matching case")
+            continue
+        change = 100 * (result['rows_per_s'] / old['rows_per_s'] - 1)
+        print(f"  rows={result['rows']} concurrency={result['concurrency']}: "
+              f"{old['rows_per_s']} -> {result['rows_per_s']} rows/s ({change:+.1f}%), "
+              f"p95 {old['latency_p95']} -> {result['latency_p95']} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark process_csv against a mock vLLM server.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[200], help='CSV sizes (default: 200)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='Concurrency levels (default: 1 4 16)')
+    parser.add_argument('--stream', action='store_true', help='Use streaming requests')
+    parser.add_argument('--input-csv', default=os.path.join(ROOT, 'input.csv'),
+                        help='Snippets the rows are built from (default: input.csv)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Mock mean time to first token in seconds (default: 0.05)')
+    parser.add_argument('--latency-distribution', default='lognormal',
+                        help='Mock latency distribution (default: lognormal)')
+    parser.add_argument('--token-rate', type=float, default=1000.0,
+                        help='Mock tokens per second per request (default: 1000)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Mock 503 rate (default: 0)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Mock malformed-JSON rate (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Mock random seed (default: 0)')
+    parser.add_argument('--output', default='bench_throughput.json',
+                        help='Result file (default: bench_throughput.json)')
+    parser.add_argument('--compare', default=None, help='Earlier result file to compare with')
+    parser.add_argument('--case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        sys.exit(0)
+
+    port = free_port()
+    server = start_mock(args, port)
+    results = []
+    try:
+        print(f"{'rows':>6}{'conc':>6}{'rows/s':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+              f"{'cpu %':>7}{'rss MB':>8}{'errors':>8}")
+        for rows in args.rows:
+            for concurrency in args.concurrency:
+                case = {'url': f"http://127.0.0.1:{port}/v1/chat/completions", 'rows': rows,
+                        'concurrency': concurrency, 'stream': args.stream, 'input_csv': args.input_csv}
+                child = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                                       capture_output=True, text=True, check=True)
+                result = json.loads(child.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{rows:>6}{concurrency:>6}{result['rows_per_s']:>9.1f}{result['latency_p50']:>8.3f}"
+                      f"{result['latency_p95']:>8.3f}{result['latency_p99']:>8.3f}{result['cpu_percent']:>7.1f}"
+                      f"{result['peak_rss_mb']:>8.1f}{result['error_rows']:>8}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    mock = {key: getattr(args, key) for key in
+            ('latency', 'latency_distribution', 'token_rate', 'error_rate', 'malformed_rate', 'seed')}
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'mock': mock,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
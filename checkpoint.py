@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def journal_path_for(output_file, translated_col):
+    """
+    Default journal location: next to the output file, one journal per column.
+    """
+    safe_col = re.sub(r'[^A-Za-z0-9_.-]', '_', translated_col)
+    return f"{output_file}.{safe_col}.journal.jsonl"
+
+
+def hash_code(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal of completed row translations.
+
+    Every completed row is written as one line and fsync'ed immediately, so a
+    crash loses at most the rows that were still in flight. Entries are tagged
+    with the translated column, the model and a hash of the legacy code, and
+    only entries matching all three are reused on resume.
+    """
+
+    def __init__(self, path, translated_col, model, resume=False):
+        self.path = path
+        self.translated_col = translated_col
+        self.model = model
+        self._lock = threading.Lock()
+        self.completed = self._load() if resume else {}
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self):
+        completed = {}
+        if not os.path.isfile(self.path):
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    continue
+                if entry.get('col') != self.translated_col or entry.get('model') != self.model:
+                    continue
+                completed[entry['row']] = (entry['legacy_hash'], entry['translated'], entry.get('finish_reason'))
+        return completed
+
+    def lookup(self, row_index, legacy_code):
+        """
+        Return the journaled translation for a row, or None if it must be (re)done.
+        """
+        entry = self.completed.get(row_index)
+        if entry is None or entry[0] != hash_code(legacy_code):
+            return None
+        return entry[1]
+
+    def finish_reason(self, row_index):
+        """
+        The finish_reason journaled with a row's translation, e.g. 'length' if it was truncated.
+        """
+        entry = self.completed.get(row_index)
+        return entry[2] if entry is not None else None
+
+    def record(self, row_index, legacy_code, translated, finish_reason=None):
+        entry = {
+            'row': row_index,
+            'col': self.translated_col,
+            'model': self.model,
+            'legacy_hash': hash_code(legacy_code),
+            'translated': translated,
+            'finish_reason': finish_reason,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self, remove=False):
+        with self._lock:
+            self._file.close()
+        if remove:
+            os.remove(self.path)
+
+
+@contextmanager
+def atomic_write(path, encoding='utf-8'):
+    """
+    Open a temp file next to `path` for writing and rename it over `path` on success.
+
+    Readers never see a half-written file, and `path` may safely be the file
+    the caller is still reading from.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        # mkstemp creates the file 0600; keep the permissions the output would normally get
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        with os.fdopen(fd, 'w', newline='', encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
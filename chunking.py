@@ -0,0 +1,210 @@
+import re
+
+from esope_rules import COMMENT_RE, CONTINUATION_RE
+from token_budget import estimate_tokens
+
+
+# --- Fortran 77 structure ---
+UNIT_START_RE = re.compile(
+    r'^\s*(?:(?:recursive|pure|elemental)\s+)*'
+    r'(?:(?:integer|real|logical|complex|double\s+precision|character(?:\s*\*\s*(?:\(\s*\*\s*\)|\d+))?)\s+)?'
+    r'(?:subroutine|function|program)\s+(\w+)',
+    re.IGNORECASE
+)
+LABEL_RE = re.compile(r'^\s*(\d+)\s')
+DO_RE = re.compile(r'^\s*(?:\d+\s+)?(?:\w+\s*:\s*)?do\b(?:\s+(\d+))?', re.IGNORECASE)
+IF_THEN_RE = re.compile(r'^\s*(?:\d+\s+)?(?:\w+\s*:\s*)?if\s*\(.*\)\s*then\s*$', re.IGNORECASE)
+SELECT_RE = re.compile(r'^\s*(?:\d+\s+)?(?:\w+\s*:\s*)?select\s+case\b', re.IGNORECASE)
+END_BLOCK_RE = re.compile(r'^\s*(?:\d+\s+)?end\s*(do|if|select)\b', re.IGNORECASE)
+
+# --- Translated (Fortran 2008) structure ---
+MODULE_START_RE = re.compile(r'^\s*module\s+(?!procedure\b)(\w+)\s*$', re.IGNORECASE)
+CONTAINS_RE = re.compile(r'^\s*contains\s*$', re.IGNORECASE)
+END_MODULE_RE = re.compile(r'^\s*end\s*module\b', re.IGNORECASE)
+USE_RE = re.compile(r'^\s*use\b', re.IGNORECASE)
+IMPLICIT_NONE_RE = re.compile(r'^\s*implicit\s+none\s*$', re.IGNORECASE)
+
+
+def _is_comment(line):
+    return not line.strip() or COMMENT_RE.match(line) or line.lstrip().startswith('!')
+
+
+def _statements(code):
+    """
+    Split source into statements. A statement is its leading comment lines,
+    its initial line and its continuation lines (fixed-form column 6 or a
+    trailing '&'), so a cut between statements never breaks one apart.
+    """
+    statements = []
+    current = []
+    has_code = False
+    continued = False
+
+    for line in code.splitlines(keepends=True):
+        if _is_comment(line):
+            if has_code:
+                statements.append(''.join(current))
+                current, has_code = [], False
+            current.append(line)
+        elif has_code and (continued or CONTINUATION_RE.match(line)):
+            current.append(line)
+        else:
+            if has_code:
+                statements.append(''.join(current))
+                current = []
+            current.append(line)
+            has_code = True
+        if not _is_comment(line):
+            continued = line.rstrip().endswith('&')
+
+    if current:
+        statements.append(''.join(current))
+    return statements
+
+
+def _code_line(statement):
+    for line in statement.splitlines():
+        if not _is_comment(line):
+            return line
+    return ''
+
+
+def _update_blocks(stack, statement):
+    """
+    Track open DO/IF/SELECT blocks so chunks are preferably cut outside them.
+    """
+    line = _code_line(statement)
+    label = LABEL_RE.match(line)
+    if label:
+        # A labelled statement closes every DO loop that ends on that label
+        while stack and stack[-1] == f"do:{label.group(1)}":
+            stack.pop()
+
+    match = DO_RE.match(line)
+    if match:
+        stack.append(f"do:{match.group(1)}" if match.group(1) else 'do')
+    elif IF_THEN_RE.match(line) or SELECT_RE.match(line):
+        stack.append('block')
+    elif END_BLOCK_RE.match(line) and stack:
+        stack.pop()
+
+
+def _split_unit(statements, budget):
+    """
+    Split one program unit into fragments of at most `budget` tokens, cutting
+    at the last statement outside any block when possible.
+    """
+    fragments = []
+    current = []
+    current_tokens = 0
+    last_safe = 0
+    stack = []
+
+    for statement in statements:
+        tokens = estimate_tokens(statement)
+        if current and current_tokens + tokens > budget:
+            cut = last_safe or len(current)
+            fragments.append(''.join(current[:cut]))
+            current = current[cut:]
+            current_tokens = sum(estimate_tokens(s) for s in current)
+            last_safe = 0
+        current.append(statement)
+        current_tokens += tokens
+        _update_blocks(stack, statement)
+        if not stack:
+            last_safe = len(current)
+
+    if current:
+        fragments.append(''.join(current))
+    return fragments
+
+
+def split_fortran(code, budget):
+    """
+    Split Fortran 77 source into chunks of at most `budget` estimated tokens.
+
+    Returns a list of groups. Small consecutive SUBROUTINE/FUNCTION units
+    are packed into one single-chunk group; a unit larger than the budget
+    becomes a multi-chunk group of fragments, cut at statement boundaries
+    and preferably outside DO/IF blocks. Comment lines stay attached to the
+    statement that follows them and continuation lines are never separated.
+    """
+    units = []
+    for statement in _statements(code):
+        if not units or UNIT_START_RE.match(_code_line(statement)):
+            units.append([])
+        units[-1].append(statement)
+
+    groups = []
+    packed = ''
+    for unit in units:
+        text = ''.join(unit)
+        if estimate_tokens(text) > budget:
+            if packed:
+                groups.append([packed])
+                packed = ''
+            groups.append(_split_unit(unit, budget))
+        elif packed and estimate_tokens(packed + text) > budget:
+            groups.append([packed])
+            packed = text
+        else:
+            packed += text
+    if packed:
+        groups.append([packed])
+    return groups
+
+
+def _parse_module(text):
+    """
+    Split a translated module into (name, uses, specs, procedures).
+    Text that isn't a module is returned as procedures only.
+    """
+    name = None
+    uses, specs, procedures = [], [], []
+    section = procedures
+    for line in text.splitlines():
+        if name is None and MODULE_START_RE.match(line):
+            name = MODULE_START_RE.match(line).group(1)
+            section = specs
+        elif name is not None and section is specs and CONTAINS_RE.match(line):
+            section = procedures
+        elif name is not None and END_MODULE_RE.match(line):
+            section = []
+        elif section is specs and USE_RE.match(line):
+            uses.append(line.strip())
+        elif section is specs and IMPLICIT_NONE_RE.match(line):
+            continue
+        else:
+            section.append(line)
+    return name, uses, specs, procedures
+
+
+def stitch_modules(translations):
+    """
+    Merge the translations of one or more chunks into a single module: USE
+    statements are de-duplicated and every procedure goes under one CONTAINS.
+    A lone routine (e.g. the joined fragments of one long routine, which are
+    translated without a MODULE wrapper) is wrapped in a module too.
+    """
+    module_name = None
+    uses, specs, procedures = [], [], []
+    for text in translations:
+        name, chunk_uses, chunk_specs, chunk_procedures = _parse_module(text)
+        if module_name is None and name:
+            module_name = name
+        uses.extend(use for use in chunk_uses if use not in uses)
+        specs.extend(line for line in chunk_specs if line.strip())
+        procedures.extend(chunk_procedures)
+
+    if module_name is None:
+        first_unit = next((UNIT_START_RE.match(line) for line in procedures if UNIT_START_RE.match(line)), None)
+        module_name = f"{first_unit.group(1)}_mod" if first_unit else 'translated_mod'
+
+    lines = [f"module {module_name}"]
+    lines.extend(f"  {use}" for use in uses)
+    lines.append("  implicit none")
+    lines.extend(specs)
+    lines.append("contains")
+    lines.extend(procedures)
+    lines.append(f"end module {module_name}")
+    return '\n'.join(lines)
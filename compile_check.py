@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+
+# `use foo_mod`, `use :: foo_mod`, `use, non_intrinsic :: foo_mod, only: bar`
+USE_RE = re.compile(r'^\s*use\s*(?:,\s*(intrinsic|non_intrinsic)\s*)?(?:::)?\s*([a-z_]\w*)',
+                    re.IGNORECASE | re.MULTILINE)
+MODULE_RE = re.compile(r'^\s*module\s+(?!procedure\b)([a-z_]\w*)', re.IGNORECASE | re.MULTILINE)
+# A complete program unit; anything else is a fragment and gets wrapped in a subroutine
+UNIT_RE = re.compile(r'^\s*(?:module|submodule|program)\b|^\s*end\s*(?:subroutine|function)\b',
+                     re.IGNORECASE | re.MULTILINE)
+DIAGNOSTIC_RE = re.compile(r'(?:^|: )(Fatal Error|Error|Warning): (.*)', re.MULTILINE)
+# Errors a fragment gets only because its declarations live in the code around it:
+# implicit typing, and attributes or types the wrapper can't know about
+CONTEXT_DIAGNOSTIC_RE = re.compile(
+    r"has no IMPLICIT type|is being used before it is defined|Deleted feature: .* must be integer"
+    r"|Non-POINTER in pointer association context|must deliver a pointer result"
+    r"|must have the pointer attribute|Allocate-object at \(1\) is (?:neither|not)"
+    r"|argument of '\w+' intrinsic at \(1\) must be|Selector shall be polymorphic")
+
+
+def stub_modules(code):
+    """
+    Names of the *_mod modules `code` uses but does not define.
+    """
+    defined = {name.lower() for name in MODULE_RE.findall(code)}
+    used = []
+    for nature, name in USE_RE.findall(code):
+        name = name.lower()
+        if nature.lower() != 'intrinsic' and name.endswith('_mod') and name not in defined and name not in used:
+            used.append(name)
+    return used
+
+
+def check_fortran(code, compiler='gfortran', std='f2008', timeout=30):
+    """
+    Syntax-check one translation with `compiler -fsyntax-only -std=<std>` in a
+    temp directory. Empty modules stand in for the *_mod dependencies, so USE
+    statements resolve; symbols those modules would provide still don't.
+    Fragments that are not a complete program unit are checked inside a
+    wrapper subroutine, and errors that only say their declarations are
+    missing (see CONTEXT_DIAGNOSTIC_RE) are not counted against them.
+
+    Returns "pass:N" or "fail:N", N being the number of diagnostics counted,
+    or "error:timeout" if the compiler did not finish in time.
+    """
+    workdir = tempfile.mkdtemp(prefix='compile_check_')
+    try:
+        files = []
+        for name in stub_modules(code):
+            path = os.path.join(workdir, f"{name}.f90")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"module {name}\nend module {name}\n")
+            files.append(path)
+        fragment = not UNIT_RE.search(code)
+        if fragment:
+            code = f"subroutine compile_check_fragment\n{code}\nend subroutine compile_check_fragment\n"
+        path = os.path.join(workdir, 'translation.f90')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(code if code.endswith('\n') else code + '\n')
+        files.append(path)
+        try:
+            result = subprocess.run([compiler, '-fsyntax-only', f'-std={std}', '-J', workdir] + files,
+                                    cwd=workdir, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return "error:timeout"
+        diagnostics = DIAGNOSTIC_RE.findall(result.stderr)
+        if not fragment:
+            return f"{'pass' if result.returncode == 0 else 'fail'}:{len(diagnostics)}"
+        counted = [(kind, message) for kind, message in diagnostics
+                   if not CONTEXT_DIAGNOSTIC_RE.search(message)]
+        # A failing compile with nothing to show for it (e.g. a crash) is still a failure
+        failed = any(kind != 'Warning' for kind, _ in counted) or (result.returncode != 0 and not diagnostics)
+        return f"{'fail' if failed else 'pass'}:{len(counted)}"
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class CompileChecker:
+    """
+    Runs check_fortran in a process pool, so compiles overlap with the
+    translations still in flight. submit() returns a Future of the score.
+    """
+
+    def __init__(self, workers=None, compiler='gfortran', std='f2008', timeout=30):
+        if shutil.which(compiler) is None:
+            raise FileNotFoundError(f"Compiler '{compiler}' not found")
+        self.compiler = compiler
+        self.std = std
+        self.timeout = timeout
+        # Workers start while translation threads are running, which fork() doesn't handle safely
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    def submit(self, code):
+        return self._executor.submit(check_fortran, code, self.compiler, self.std, self.timeout)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
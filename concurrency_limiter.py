@@ -0,0 +1,108 @@
+import itertools
+import threading
+
+
+class AIMDLimiter:
+    """
+    Adaptive limit on the number of requests in flight (additive increase,
+    multiplicative decrease, as in TCP congestion control).
+
+    Every completed request reports its latency. While the recent average
+    latency stays within `tolerance` times the baseline (the best average seen,
+    drifting slowly towards later ones), the limit grows: by one
+    per success during slow start, then by about one per `limit` successes.
+    A request that times out, fails with a 5xx, or is much slower than the
+    baseline multiplies the limit by `backoff`; requests that were already
+    in flight at that moment cannot lower it again, so one burst of queueing
+    counts once.
+
+    Latencies can be normalised per token (pass `tokens` to release) so long
+    translations don't look like congestion.
+    """
+
+    def __init__(self, maximum, minimum=1, initial=None, tolerance=2.0, backoff=0.7,
+                 smoothing=0.1, baseline_drift=0.001):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(min(self.maximum, max(self.minimum, initial or min(4, self.maximum))))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self.recent = None
+        self.baseline = None
+        self.in_flight = 0
+        self.slow_start = True
+        self.decreases = 0
+        self.lowest = self.highest = self.limit
+        self._tickets = itertools.count(1)
+        self._last_decrease_ticket = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Block until a request may start; returns a ticket for release().
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return next(self._tickets)
+
+    def release(self, ticket, latency=None, tokens=None, failed=False):
+        """
+        Finish a request. `failed` marks a timeout or server error; without a
+        latency (e.g. a client error) the limit is left unchanged.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if failed:
+                self._decrease(ticket, 'request failed')
+            elif latency is not None:
+                sample = latency / tokens if tokens else latency
+                # A moving average, so one slow request is not mistaken for queueing
+                if self.recent is None:
+                    self.recent = sample
+                else:
+                    self.recent += self.smoothing * (sample - self.recent)
+                if self.baseline is None or self.recent < self.baseline:
+                    self.baseline = self.recent
+                else:
+                    # Let the baseline follow slow, lasting changes (e.g. longer rows)
+                    self.baseline += self.baseline_drift * (self.recent - self.baseline)
+                if self.recent > self.tolerance * self.baseline:
+                    self._decrease(ticket, f"latency {self.recent / self.baseline:.1f}x baseline")
+                elif self.slow_start:
+                    self.limit = min(self.maximum, self.limit + 1)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.highest = max(self.highest, self.limit)
+            self._condition.notify_all()
+
+    def _decrease(self, ticket, reason):
+        if ticket <= self._last_decrease_ticket:
+            return
+        self._last_decrease_ticket = next(self._tickets)
+        self.slow_start = False
+        self.limit = max(self.minimum, self.limit * self.backoff)
+        self.lowest = min(self.lowest, self.limit)
+        self.decreases += 1
+        print(f"    Concurrency limit lowered to {int(self.limit)} ({reason})")
+
+    def snapshot(self):
+        """
+        Current state as metrics: limit, in-flight requests, range and decreases.
+        """
+        with self._condition:
+            return {
+                'concurrency_limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'limit_min': int(self.lowest),
+                'limit_max': int(self.highest),
+                'limit_decreases': self.decreases,
+            }
+
+    def summary(self):
+        state = self.snapshot()
+        return (f"Concurrency limit: {state['concurrency_limit']} at the end "
+                f"(range {state['limit_min']}-{state['limit_max']}, {state['limit_decreases']} decreases)")
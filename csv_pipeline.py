@@ -0,0 +1,56 @@
+import csv
+from collections import deque
+
+
+def count_rows(input_file, delimiter=';'):
+    """
+    Count data rows without keeping them, for progress messages.
+    """
+    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
+        reader = csv.reader(infile, delimiter=delimiter)
+        next(reader, None)
+        return sum(1 for _ in reader)
+
+
+def iter_rows(reader):
+    """
+    Yield rows from a DictReader, dropping the keys that hold overflow cells.
+    Keys that aren't strings make DictWriter crash ('ValueError: ... None').
+    """
+    for row in reader:
+        keys_to_fix = [k for k in row.keys() if k is None or k == 'extra_cols']
+        for k in keys_to_fix:
+            del row[k]
+        yield row
+
+
+def model_columns(fieldnames, exclude=()):
+    """
+    Translation columns of a results CSV: those the translation scripts gave
+    a <col>_score column, apart from `exclude`.
+    """
+    return [col for col in fieldnames if f"{col}_score" in fieldnames and col not in exclude]
+
+
+def in_order(tasks, max_pending):
+    """
+    Yield (item, result) pairs in input order from an iterable of (item, future).
+
+    `future` may be None for items that need no async work (result is None).
+    `tasks` is consumed lazily and at most `max_pending` items are held at once,
+    so a generator that submits work as it is iterated stays memory bounded.
+    """
+    pending = deque()
+
+    def ready():
+        return pending and (pending[0][1] is None or pending[0][1].done())
+
+    for task in tasks:
+        pending.append(task)
+        while len(pending) > max_pending or ready():
+            item, future = pending.popleft()
+            yield item, future.result() if future is not None else None
+
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result() if future is not None else None
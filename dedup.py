@@ -0,0 +1,176 @@
+"""
+Group identical and near-identical legacy snippets, so each group is sent
+to the model once and its translation fanned out to every row, e.g.:
+
+    python3 dedup.py input.csv --near-dup-threshold 0.9
+
+Snippets are compared on a canonical form: code case-folded and
+whitespace collapsed outside string literals, and `c`/`*`/`!` comments
+reduced to their text, so rows that share a translation differ in nothing
+a translation would keep. With a threshold, MinHash signatures and LSH
+banding also group snippets whose token shingles overlap at least that much
+(estimated Jaccard similarity); their copies are provisional.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import zlib
+
+import numpy as np
+
+from esope_rules import COMMENT_RE, STRING_RE
+
+
+# A comment line 'c' that is not an assignment to a variable named c
+FIXED_COMMENT_RE = re.compile(COMMENT_RE.pattern + r'(?!\s*=)')
+# Spaces next to an operator or punctuation carry no meaning
+PUNCTUATION_SPACE_RE = re.compile(r' ?([^\w\s]) ?')
+TOKEN_RE = re.compile(r"""'[^']*'|"[^"]*"|\w+|[^\w\s]""")
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+
+
+def canonicalize(code):
+    """
+    Canonical form of a snippet: blank lines dropped, code case-folded and
+    whitespace collapsed, leaving string literals untouched. Comments keep
+    their text (whitespace collapsed) behind a `!`, whichever marker they had.
+    """
+    lines = []
+    for line in code.splitlines():
+        if FIXED_COMMENT_RE.match(line):
+            line = '!' + line[1:]
+        parts, comment, position = [], '', 0
+        for part in STRING_RE.split(line):
+            if part.startswith(("'", '"')):
+                parts.append(part)
+            elif '!' in part:
+                parts.append(part[:part.index('!')].casefold())
+                comment = '!' + ' '.join(line[position + part.index('!') + 1:].split())
+                break
+            else:
+                parts.append(part.casefold())
+            position += len(part)
+        text = PUNCTUATION_SPACE_RE.sub(r'\1', ' '.join(''.join(parts).split())) + comment
+        if text:
+            lines.append(text)
+    return '\n'.join(lines)
+
+
+def snippet_key(canonical):
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+
+class MinHasher:
+    """
+    MinHash signatures of the token shingles of canonical snippets, with
+    `num_perm` multiply-shift hash functions evaluated at once in NumPy.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=0):
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.increments = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, canonical):
+        tokens = TOKEN_RE.findall(canonical)
+        size = min(self.shingle_size, len(tokens))
+        # crc32 rather than hash(), which PYTHONHASHSEED salts differently in every run
+        return {zlib.crc32('\x1f'.join(tokens[k:k + size]).encode('utf-8'))
+                for k in range(len(tokens) - size + 1)}
+
+    def signature(self, canonical):
+        values = np.fromiter(self.shingles(canonical), dtype=np.uint64)
+        # uint64 products wrap modulo 2**64; the high 32 bits are the hash
+        hashes = (self.multipliers[:, None] * values[None, :] + self.increments[:, None]) >> np.uint64(32)
+        return hashes.min(axis=1).astype(np.uint32)
+
+
+def find_duplicates(snippets, near_threshold=None, num_perm=NUM_PERM, bands=BANDS):
+    """
+    Group `snippets` (an iterable of legacy code) and return
+    ({row index: index of the group's first row} for every row that is not
+    the first of its group, {near-duplicate row index: first row with the
+    same canonical form}). Empty snippets are never grouped.
+
+    With `near_threshold`, a snippet whose canonical form is new joins the
+    first earlier group whose first snippet it matches with at least that
+    estimated Jaccard similarity. Candidates come from LSH buckets (`bands`
+    bands of the signature), and every member is compared with the first
+    snippet of its group, so groups don't drift by chaining.
+    """
+    duplicate_of = {}
+    near = {}
+    near_keys = {}
+    first_rows = {}
+    hasher = MinHasher(num_perm) if near_threshold is not None else None
+    rows_per_band = num_perm // bands
+    buckets = {}
+    signatures = {}
+
+    for i, code in enumerate(snippets):
+        canonical = canonicalize(code or '')
+        if not canonical:
+            continue
+        key = snippet_key(canonical)
+        if key in first_rows:
+            duplicate_of[i] = first_rows[key]
+            if key in near_keys:
+                near[i] = near_keys[key]
+            continue
+        first_rows[key] = i
+        if hasher is None:
+            continue
+
+        signature = hasher.signature(canonical)
+        band_keys = [(band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())
+                     for band in range(bands)]
+        candidates = sorted({row for band_key in band_keys for row in buckets.get(band_key, ())})
+        match = next((row for row in candidates
+                      if np.mean(signatures[row] == signature) >= near_threshold), None)
+        if match is not None:
+            duplicate_of[i] = match
+            first_rows[key] = match
+            near_keys[key] = near[i] = i
+            continue
+        signatures[i] = signature
+        for band_key in band_keys:
+            buckets.setdefault(band_key, []).append(i)
+    return duplicate_of, near
+
+
+def group_sizes(duplicate_of):
+    """
+    {index of a group's first row: rows in the group} for groups of two or more rows.
+    """
+    sizes = {}
+    for first in duplicate_of.values():
+        sizes[first] = sizes.get(first, 1) + 1
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report duplicate and near-duplicate legacy snippets.')
+    parser.add_argument('input_csv', help='CSV of legacy code (`;` separated)')
+    parser.add_argument('--legacy-col', default='legacy_code', help='Legacy code column (default: legacy_code)')
+    parser.add_argument('--near-dup-threshold', type=float, default=None,
+                        help='Also group snippets with at least this estimated Jaccard similarity (e.g. 0.9)')
+    parser.add_argument('--top', type=int, default=10, help='Largest groups to list (default: 10)')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_csv):
+        print(f"Error: Input file '{args.input_csv}' does not exist.")
+        exit(1)
+    with open(args.input_csv, 'r', newline='', encoding='utf-8') as f:
+        snippets = [row.get(args.legacy_col) or '' for row in csv.DictReader(f, delimiter=';')]
+    duplicate_of, near = find_duplicates(snippets, args.near_dup_threshold)
+
+    sizes = group_sizes(duplicate_of)
+    print(f"{len(snippets)} rows: {len(duplicate_of)} are duplicates of {len(sizes)} others "
+          f"({len(near)} near-duplicates), {len(snippets) - len(duplicate_of)} to translate")
+    for first, size in sorted(sizes.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  row {first + 1}: {size} rows")
@@ -0,0 +1,117 @@
+import itertools
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def parse_endpoints(value):
+    """
+    Split a comma-separated list of chat completion URLs (e.g. $API_URL).
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    return [url.strip() for url in value if url.strip()]
+
+
+class Endpoint:
+    """
+    One vLLM replica and the requests currently in flight to it.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.base_url = url.rsplit('/v1/', 1)[0]
+        self.healthy = True
+        self.outstanding = 0
+        self.served = 0
+
+
+class EndpointPool:
+    """
+    Spreads requests over several vLLM replicas by least outstanding requests.
+
+    Replicas that refuse connections or answer with a 5xx are taken out of
+    rotation; a background thread polls each replica's /health endpoint
+    (as wait_for_vllm in run_all_models.sh does) and puts it back once it
+    answers again. If every replica is down, requests still go to the least
+    loaded one so the caller sees the error instead of hanging.
+    """
+
+    def __init__(self, urls, health_interval=10.0, health_timeout=5.0):
+        self.endpoints = [Endpoint(url) for url in parse_endpoints(urls)]
+        if not self.endpoints:
+            raise ValueError("At least one endpoint URL is required")
+        # Health checks get their own connections: the client's pool blocks
+        # while a saturated replica holds them all, which would stall the
+        # checks of every other replica behind it
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=1, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        # Rotates the scan start so ties don't always go to the first replica
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+        if len(self.endpoints) > 1 and health_interval > 0:
+            self._thread = threading.Thread(target=self._health_loop, name='vllm-health', daemon=True)
+            self._thread.start()
+
+    def acquire(self):
+        """
+        Pick the healthy replica with the fewest requests in flight and count one more.
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            start = next(self._turn) % len(candidates)
+            rotated = candidates[start:] + candidates[:start]
+            endpoint = min(rotated, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint, healthy=True):
+        """
+        Finish a request; `healthy=False` takes the replica out of rotation.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.served += 1
+            if not healthy and endpoint.healthy and len(self.endpoints) > 1:
+                endpoint.healthy = False
+                print(f"Endpoint {endpoint.base_url} failed, removing it from rotation")
+
+    def check_health(self):
+        """
+        Poll /health on every replica and update the rotation.
+        """
+        for endpoint in self.endpoints:
+            try:
+                response = self.session.get(f"{endpoint.base_url}/health", timeout=self.health_timeout)
+                healthy = response.status_code == 200
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self._lock:
+                if healthy != endpoint.healthy:
+                    state = 'back in rotation' if healthy else 'unhealthy, removing it from rotation'
+                    print(f"Endpoint {endpoint.base_url} {state}")
+                endpoint.healthy = healthy
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def summary(self):
+        with self._lock:
+            return ', '.join(
+                f"{e.base_url} {e.served} requests{'' if e.healthy else ' (unhealthy)'}"
+                for e in self.endpoints
+            )
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.session.close()
@@ -0,0 +1,209 @@
+import re
+from collections import Counter
+
+
+# --- Compiled rules ---
+# Fixed-form comment: 'c', 'C' or '*' in column 1 followed by a blank (so 'call'/'character' don't match)
+COMMENT_RE = re.compile(r'^[cC*](?=\s|$)')
+STRING_RE = re.compile(r"('[^']*'|\"[^\"]*\")")
+RELATIONAL_RE = re.compile(r'\s*\.(eq|ne|lt|le|gt|ge)\.\s*', re.IGNORECASE)
+RELATIONAL_OPS = {'eq': '==', 'ne': '/=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+# Dotted operators and constants (.and., .true., .eq.), which are not component access
+DOT_OPERATOR = r'(?:and|or|not|eqv|neqv|true|false|eq|ne|lt|le|gt|ge)\.'
+DOT_OPERATOR_RE = re.compile(r'\.' + DOT_OPERATOR, re.IGNORECASE)
+# var.member, nested (lb.bref.len) too, but not dotted operators or real literals
+DOT_ACCESS_RE = re.compile(
+    rf'(?<![\w.])[A-Za-z]\w*(?:\.(?!{DOT_OPERATOR})[A-Za-z]\w*)+(?!\w|\.(?!{DOT_OPERATOR}))', re.IGNORECASE
+)
+REAL_LITERAL_RE = re.compile(r'\b\d+\.\d*(?:[ed][+-]?\d+)?', re.IGNORECASE)
+# Any component access left after the rules ran, e.g. after an array element: ur.ubb(jr).len
+RESIDUAL_DOT_RE = re.compile(r'[\w)]\s*\.\s*[A-Za-z]')
+SLASH_SIZE_RE = re.compile(r'([A-Za-z]\w*(?:\s*%\s*[A-Za-z]\w*)+)\(\s*/\s*(\d+)\s*\)')
+# segact/segdes of one or more segments, each with an optional *MOD/*NOMOD mode
+SEG_MACRO_RE = re.compile(
+    r'^(\s*)(segact|segdes)\b\s*,?\s*(\w+\s*(?:\*\s*\w+)?(?:\s*,\s*\w+\s*(?:\*\s*\w+)?)*)\s*$', re.IGNORECASE
+)
+SEG_MODE_RE = re.compile(r'\s*\*\s*\w+')
+OBSOLETE_CALL_RE = re.compile(r'^(\s*)(call\s+(?:oooeta|actstr|desstr)\s*\(.*\))\s*$', re.IGNORECASE)
+IF_OBSOLETE_CALL_RE = re.compile(
+    r'^(\s*)if\s*\((.*)\)\s*(call\s+(?:oooeta|actstr|desstr)\s*\(.*\))\s*$', re.IGNORECASE
+)
+ARG_SPACING_RE = re.compile(r',\s+')
+POINTEUR_RE = re.compile(r'^(\s*)pointeur\s+(.*)$', re.IGNORECASE)
+POINTEUR_ITEM_RE = re.compile(r'^(\w+)\s*\.\s*(\w+)$')
+MYPNT_RE = re.compile(r'^(\s*)(\w+)\s*=\s*mypnt\s*\((.*)\)\s*$', re.IGNORECASE)
+PSTR_INCLUDE_RE = re.compile(r'^\s*#include\s+"(PSTR\.inc)"\s*$', re.IGNORECASE)
+DECLARATION_RE = re.compile(
+    r'^(\s*)(integer|logical|real|double\s+precision|character(?:\s*\*\s*(?:\(\s*\*\s*\)|\d+))?)\s+'
+    r'(?!function\b)([A-Za-z]\w*(?:\s*\([^)]*\))?(?:\s*,\s*[A-Za-z]\w*(?:\s*\([^)]*\))?)*)\s*$',
+    re.IGNORECASE
+)
+CHARACTER_LEN_RE = re.compile(r'character\s*\*\s*(?:\(\s*(\*)\s*\)|(\d+))', re.IGNORECASE)
+# A non-blank, non-zero column 6 after five blanks is a fixed-form continuation line
+CONTINUATION_RE = re.compile(r'^ {5}[^ 0]')
+
+# Constructs that need context the rules don't have (module layout, intents,
+# segment dimensions, typed mypnt names), and ESOPE left on a line no rule
+# matched: snippets containing them go to the LLM.
+NEEDS_MODEL_RE = re.compile(
+    r'^\s*#|\b(subroutine|function|program|external|entry|common|equivalence|'
+    r'segact|segdes|segini|segadj|segsup|mypnt|pointeur)\b|\(\s*/',
+    re.IGNORECASE
+)
+
+# Segment names whose Fortran 2008 type differs from the ESOPE name
+SEGMENT_TYPES = {'pstr': 'str'}
+
+
+def _map_code(line, fn):
+    """
+    Apply `fn` to the parts of `line` outside string literals.
+    """
+    parts = STRING_RE.split(line)
+    return ''.join(part if i % 2 else fn(part) for i, part in enumerate(parts))
+
+
+def _rewrite_expression(line, fired):
+    def rewrite(code):
+        code, n = RELATIONAL_RE.subn(lambda m: f" {RELATIONAL_OPS[m.group(1).lower()]} ", code)
+        if n:
+            fired['relational-operator'] += n
+        code, n = DOT_ACCESS_RE.subn(lambda m: ' % '.join(m.group(0).split('.')), code)
+        if n:
+            fired['dot-access'] += n
+        code, n = SLASH_SIZE_RE.subn(r'size(\1, \2)', code)
+        if n:
+            fired['slash-size'] += n
+        return code
+    return _map_code(line, rewrite)
+
+
+def _needs_model(line):
+    """
+    Whether `line`, once rewritten, still holds something the rules didn't translate.
+    """
+    code = STRING_RE.sub("''", line)
+    if NEEDS_MODEL_RE.search(code):
+        return True
+    code = REAL_LITERAL_RE.sub('0', DOT_OPERATOR_RE.sub(' ', code))
+    return bool(RESIDUAL_DOT_RE.search(code))
+
+
+def _rewrite_declaration(match, fired):
+    indent, type_spec, names = match.groups()
+    char_len = CHARACTER_LEN_RE.match(type_spec)
+    if char_len:
+        type_spec = f"character(len={char_len.group(1) or char_len.group(2)})"
+    else:
+        type_spec = ' '.join(type_spec.lower().split())
+    fired['declaration'] += 1
+    return f"{indent}{type_spec} :: {names.strip()}"
+
+
+def pretranslate(code):
+    """
+    Apply the mechanical ESOPE -> Fortran 2008 rules from SYSTEM_PROMPT.
+
+    Returns (translated, fired, complete): the rewritten code, a Counter of the
+    rules that fired, and whether every line was fully handled so the snippet
+    can skip the LLM. Lines the rules can't handle are left untouched for the
+    model to finish.
+    """
+    fired = Counter()
+    complete = True
+    pointer_types = {}
+    out = []
+
+    for line in code.splitlines():
+        line = line.rstrip()
+
+        if not line.strip():
+            out.append(line)
+            continue
+
+        if COMMENT_RE.match(line):
+            out.append('!' + line[1:])
+            fired['comment'] += 1
+            continue
+
+        if line.lstrip().startswith('!'):
+            out.append(line)
+            continue
+
+        if CONTINUATION_RE.match(line):
+            # Joining continuation lines needs free-form '&' layout; leave it to the model
+            complete = False
+            out.append(line)
+            continue
+
+        match = SEG_MACRO_RE.match(line)
+        if match:
+            indent, macro, segments = match.groups()
+            segments = ','.join(SEG_MODE_RE.sub('', segment).strip() for segment in segments.split(','))
+            out.append(f"{indent}! [ooo].obsolete: {macro.lower()},{segments}")
+            fired['obsolete-macro'] += 1
+            continue
+
+        match = OBSOLETE_CALL_RE.match(line)
+        if match:
+            indent, call = match.groups()
+            call = ARG_SPACING_RE.sub(',', call)
+            out.append(f"{indent}! [ooo].obsolete: {call}")
+            fired['obsolete-macro'] += 1
+            continue
+
+        match = IF_OBSOLETE_CALL_RE.match(line)
+        if match:
+            indent, condition, call = match.groups()
+            condition = _rewrite_expression(condition.strip(), fired)
+            call = ARG_SPACING_RE.sub(',', call)
+            out.append(f"{indent}! [ooo].empty-var: if ({condition}) ! [ooo].obsolete: {call}")
+            fired['obsolete-macro'] += 1
+            continue
+
+        match = PSTR_INCLUDE_RE.match(line)
+        if match:
+            out.append(f"! [ooo] empty #include {match.group(1)}")
+            fired['include'] += 1
+            continue
+
+        match = POINTEUR_RE.match(line)
+        if match:
+            indent, items = match.groups()
+            declarations = []
+            for item in items.split(','):
+                item_match = POINTEUR_ITEM_RE.match(item.strip())
+                if not item_match:
+                    declarations = None
+                    break
+                var, segment = item_match.groups()
+                seg_type = SEGMENT_TYPES.get(segment.lower(), segment.lower())
+                pointer_types[var.lower()] = seg_type
+                declarations.append(f"{indent}type({seg_type}), pointer :: {var}")
+            if declarations:
+                out.extend(declarations)
+                fired['pointeur'] += 1
+                # Arguments also need an intent, which only the surrounding routine reveals
+                complete = False
+                continue
+
+        match = MYPNT_RE.match(line)
+        if match and match.group(2).lower() in pointer_types:
+            indent, var, args = match.groups()
+            seg_type = pointer_types[var.lower()]
+            args = _rewrite_expression(args, fired)
+            out.append(f"{indent}{var} => {seg_type}_mypnt({args})")
+            fired['mypnt'] += 1
+            continue
+
+        match = DECLARATION_RE.match(line)
+        if match:
+            out.append(_rewrite_declaration(match, fired))
+            continue
+
+        line = _rewrite_expression(line, fired)
+        if _needs_model(line):
+            complete = False
+        out.append(line)
+
+    return '\n'.join(out), fired, complete
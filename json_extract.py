@@ -0,0 +1,184 @@
+import json
+import re
+
+
+KEY = '"translated_code"'
+WHITESPACE = ' \t\r\n'
+SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+HEX_DIGITS = set('0123456789abcdefABCDEF')
+SPECIAL_RE = re.compile(r'["\\]')
+# Body of a well-formed JSON string up to its closing quote (unrolled, no backtracking)
+STRING_BODY_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# Raw newlines in strings are common in model output and harmless
+DECODER = json.JSONDecoder(strict=False)
+# Recovery paths that return the string exactly as the model wrote it
+CLEAN_METHODS = ('json', 'fenced-json', 'embedded-json')
+
+
+def _skip_whitespace(text, i):
+    while i < len(text) and text[i] in WHITESPACE:
+        i += 1
+    return i
+
+
+def _next_is_key(text, i):
+    i = _skip_whitespace(text, i)
+    return i < len(text) and text[i] == '"'
+
+
+def _read_hex4(text, i):
+    digits = text[i:i + 4]
+    if len(digits) == 4 and all(c in HEX_DIGITS for c in digits):
+        return int(digits, 16)
+    return None
+
+
+def _closes_value(text, i):
+    k = _skip_whitespace(text, i + 1)
+    return k >= len(text) or text[k] == '}' or (text[k] == ',' and _next_is_key(text, k + 1))
+
+
+def _decode_string(text, i):
+    """
+    Decode a JSON string body starting just after its opening quote.
+
+    Returns (value, end, terminated, repaired): `end` is the index after the
+    closing quote. A quote that isn't followed by '}', by ',' and another key,
+    or by the end of the text is taken as an unescaped quote inside the code
+    (repaired=True), and invalid escapes are kept literally instead of failing.
+    """
+    n = len(text)
+    # Well-formed strings are matched and decoded by the C scanners
+    j = STRING_BODY_RE.match(text, i).end()
+    if j < n and _closes_value(text, j):
+        try:
+            return DECODER.decode(text[i - 1:j + 1]), j + 1, True, False
+        except ValueError:
+            pass
+
+    out = []
+    repaired = False
+    while i < n:
+        # Copy the run of ordinary characters in one slice
+        special = SPECIAL_RE.search(text, i)
+        j = special.start() if special else n
+        out.append(text[i:j])
+        i = j
+        if i >= n:
+            break
+
+        if text[i] == '"':
+            if _closes_value(text, i):
+                return ''.join(out), i + 1, True, repaired
+            out.append('"')
+            repaired = True
+            i += 1
+            continue
+
+        # Backslash escape
+        if i + 1 >= n:
+            out.append('\\')
+            break
+        escape = text[i + 1]
+        if escape in SIMPLE_ESCAPES:
+            out.append(SIMPLE_ESCAPES[escape])
+            i += 2
+        elif escape == 'u' and _read_hex4(text, i + 2) is not None:
+            code = _read_hex4(text, i + 2)
+            i += 6
+            if 0xD800 <= code < 0xDC00 and text[i:i + 2] == '\\u':
+                low = _read_hex4(text, i + 2)
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                    i += 6
+            out.append(chr(code))
+        else:
+            out.append(text[i:i + 2])
+            repaired = True
+            i += 2
+    return ''.join(out), n, False, repaired
+
+
+def _find_value(text):
+    """
+    Locate the first `"translated_code": "` in one left-to-right scan.
+    Returns (key_index, value_index) or None.
+    """
+    start = 0
+    while True:
+        key = text.find(KEY, start)
+        if key == -1:
+            return None
+        i = _skip_whitespace(text, key + len(KEY))
+        if i < len(text) and text[i] == ':':
+            i = _skip_whitespace(text, i + 1)
+            if i < len(text) and text[i] == '"':
+                return key, i + 1
+        start = key + len(KEY)
+
+
+def _fenced_block(text):
+    """
+    Content of the first ``` fenced block, without its language tag.
+    """
+    start = text.find('```')
+    if start == -1:
+        return None
+    end = text.find('```', start + 3)
+    if end == -1:
+        return None
+    body = text[start + 3:end]
+    newline = body.find('\n')
+    if newline != -1 and body[:newline].strip().isalpha():
+        body = body[newline + 1:]
+    return body
+
+
+def extract_translated_code(response_text):
+    """
+    Extract the translated code from a model response in linear time.
+
+    Well-formed responses are decoded by the json module's C scanner; the
+    single-pass scanner below only runs when that fails.
+
+    Returns (code, method), where method names the recovery path:
+      json                 the response is a JSON object with a translated_code string
+      fenced-json          the object is wrapped in a markdown code fence
+      embedded-json        the object is surrounded by other text
+      repaired-json        the string had unescaped quotes or invalid escapes
+      unterminated-json    the string never closes (e.g. truncated output)
+      code-block           no JSON; content of a ``` code block
+      raw                  nothing recognised; the stripped response
+    """
+    text = response_text.strip()
+    if text.startswith('{'):
+        try:
+            data = DECODER.decode(text)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get('translated_code'), str):
+            return data['translated_code'].strip(), 'json'
+
+    found = _find_value(text)
+
+    if found is not None:
+        key, value_start = found
+        code, end, terminated, repaired = _decode_string(text, value_start)
+        if not terminated:
+            return code.strip(), 'unterminated-json'
+        if repaired:
+            return code.strip(), 'repaired-json'
+        before = text[:key].rstrip()
+        after = text[end:].lstrip()
+        if before.startswith('{') and after.endswith('}'):
+            # The object, but not valid JSON: another member is malformed
+            return code.strip(), 'repaired-json'
+        if before.endswith('{') and before[:-1].rstrip().startswith('```') and after.rstrip().endswith('```'):
+            return code.strip(), 'fenced-json'
+        return code.strip(), 'embedded-json'
+
+    block = _fenced_block(text)
+    if block is not None:
+        return block.strip(), 'code-block'
+
+    return text, 'raw'
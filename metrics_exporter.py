@@ -0,0 +1,259 @@
+"""
+Prometheus metrics for the translation pipeline, in the text exposition
+format, without the prometheus_client dependency.
+
+Served over HTTP next to vLLM's own /metrics (MetricsServer), or written
+periodically to a file for node_exporter's textfile collector
+(TextfileExporter), so client-side and server-side saturation can be put
+on one dashboard.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from checkpoint import atomic_write
+
+
+PREFIX = 'fortran_translation'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; a row spans anything from a cache hit to several long continuations
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# 'copied': a duplicate row given another row's translation, without a request
+ROW_STATUSES = ('ok', 'error', 'retryable', 'copied')
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count of observed values.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f"{name}_bucket", labels + (('le', format_value(float(bound))),), count
+        yield f"{name}_bucket", labels + (('le', '+Inf'),), self.count
+        yield f"{name}_sum", labels, round(self.sum, 6)
+        yield f"{name}_count", labels, self.count
+
+
+class PipelineMetrics:
+    """
+    Counters and histograms of translated rows, labelled by model and column,
+    plus gauges read from the client (requests in flight per replica, replica
+    health, concurrency limit, circuit breaker) and the retry budget at
+    scrape time.
+
+    `client` and `retry_budget` may be swapped between runs, as the
+    orchestrator does for each model.
+    """
+
+    def __init__(self, client=None, retry_budget=None, buckets=LATENCY_BUCKETS):
+        self.client = client
+        self.retry_budget = retry_budget
+        self.buckets = buckets
+        self.input_rows = {}
+        self.rows = {}
+        self.tokens = {}
+        self.retries = {}
+        self.continuations = {}
+        self.cache = {}
+        self.latency = {}
+        self.ttft = {}
+        self._lock = threading.Lock()
+
+    def set_input_rows(self, model, column, total):
+        with self._lock:
+            self.input_rows[(model, column)] = total
+
+    def observe_row(self, model, column, record, status):
+        """
+        Count one translated row; `record` is a row_metrics.row_record and
+        `status` one of ROW_STATUSES.
+        """
+        key = (model, column)
+        with self._lock:
+            self.rows[key + (status,)] = self.rows.get(key + (status,), 0) + 1
+            if status == 'copied':
+                return
+            for kind in ('prompt', 'completion', 'cached'):
+                tokens = record.get(f'{kind}_tokens') or 0
+                self.tokens[key + (kind,)] = self.tokens.get(key + (kind,), 0) + tokens
+            self.retries[key] = self.retries.get(key, 0) + (record.get('retries') or 0)
+            self.continuations[key] = self.continuations.get(key, 0) + (record.get('continuations') or 0)
+            result = 'hit' if record.get('cache_hit') else 'miss'
+            self.cache[key + (result,)] = self.cache.get(key + (result,), 0) + 1
+            if not record.get('cache_hit'):
+                self.latency.setdefault(key, Histogram(self.buckets)).observe(record['latency_s'])
+                if record.get('ttft_s') is not None:
+                    self.ttft.setdefault(key, Histogram(self.buckets)).observe(record['ttft_s'])
+
+    def families(self):
+        """
+        (name, type, help, samples) for every metric, samples being (name, labels, value).
+        """
+        with self._lock:
+            families = [
+                (f'{PREFIX}_input_rows', 'gauge', 'Rows in the input CSV of each run',
+                 [(f'{PREFIX}_input_rows', (('model', m), ('column', c)), n)
+                  for (m, c), n in sorted(self.input_rows.items())]),
+                (f'{PREFIX}_rows', 'counter', 'Rows translated, by outcome',
+                 [(f'{PREFIX}_rows_total', (('model', m), ('column', c), ('status', s)), n)
+                  for (m, c, s), n in sorted(self.rows.items())]),
+                (f'{PREFIX}_tokens', 'counter', 'Tokens used by translated rows, by kind',
+                 [(f'{PREFIX}_tokens_total', (('model', m), ('column', c), ('kind', k)), n)
+                  for (m, c, k), n in sorted(self.tokens.items())]),
+                (f'{PREFIX}_row_retries', 'counter', 'Request retries made for translated rows',
+                 [(f'{PREFIX}_row_retries_total', (('model', m), ('column', c)), n)
+                  for (m, c), n in sorted(self.retries.items())]),
+                (f'{PREFIX}_continuations', 'counter', 'Follow-up requests for responses cut off at max_tokens',
+                 [(f'{PREFIX}_continuations_total', (('model', m), ('column', c)), n)
+                  for (m, c), n in sorted(self.continuations.items())]),
+                (f'{PREFIX}_cache_lookups', 'counter', 'Translation cache lookups, by result',
+                 [(f'{PREFIX}_cache_lookups_total', (('model', m), ('column', c), ('result', r)), n)
+                  for (m, c, r), n in sorted(self.cache.items())]),
+                (f'{PREFIX}_row_latency_seconds', 'histogram', 'Wall time of each translated row, cache hits excluded',
+                 [sample for (m, c), histogram in sorted(self.latency.items())
+                  for sample in histogram.samples(f'{PREFIX}_row_latency_seconds', (('model', m), ('column', c)))]),
+                (f'{PREFIX}_time_to_first_token_seconds', 'histogram', 'Time to first token of streamed rows',
+                 [sample for (m, c), histogram in sorted(self.ttft.items())
+                  for sample in histogram.samples(f'{PREFIX}_time_to_first_token_seconds',
+                                                  (('model', m), ('column', c)))]),
+            ]
+        families.extend(self._client_families())
+        return families
+
+    def _client_families(self):
+        families = []
+        client = self.client
+        if client is not None:
+            endpoints = client.endpoints.endpoints
+            families.append((f'{PREFIX}_requests_in_flight', 'gauge', 'Requests in flight to each vLLM replica',
+                             [(f'{PREFIX}_requests_in_flight', (('endpoint', e.base_url),), e.outstanding)
+                              for e in endpoints]))
+            families.append((f'{PREFIX}_endpoint_healthy', 'gauge', 'Whether each vLLM replica is in rotation',
+                             [(f'{PREFIX}_endpoint_healthy', (('endpoint', e.base_url),), int(e.healthy))
+                              for e in endpoints]))
+            if client.limiter is not None:
+                snapshot = client.limiter.snapshot()
+                families.append((f'{PREFIX}_concurrency_limit', 'gauge', 'Current adaptive concurrency limit',
+                                 [(f'{PREFIX}_concurrency_limit', (), snapshot['concurrency_limit'])]))
+            if client.breaker is not None:
+                breaker = client.breaker
+                families.append((f'{PREFIX}_circuit_breaker_state', 'gauge', 'Circuit breaker state (1 = current)',
+                                 [(f'{PREFIX}_circuit_breaker_state', (('state', state),), int(breaker.state == state))
+                                  for state in ('closed', 'open', 'half-open')]))
+                families.append((f'{PREFIX}_circuit_breaker_opened', 'counter', 'Times the circuit breaker opened',
+                                 [(f'{PREFIX}_circuit_breaker_opened_total', (), breaker.opened)]))
+        budget = self.retry_budget
+        if budget is not None:
+            families.append((f'{PREFIX}_retry_budget_retries', 'counter', 'Retries granted by the retry budget',
+                             [(f'{PREFIX}_retry_budget_retries_total', (), budget.retries)]))
+            families.append((f'{PREFIX}_retry_budget_denied', 'counter', 'Retries denied by the retry budget',
+                             [(f'{PREFIX}_retry_budget_denied_total', (), budget.denied)]))
+        return families
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, kind, help_text, samples in self.families():
+            if kind == 'counter':
+                name += '_total'
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    Serves `metrics` at http://host:port/metrics from a background thread.
+    """
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                data = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        print(f"Serving Prometheus metrics on http://{host}:{self.server.server_port}/metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+class TextfileExporter:
+    """
+    Rewrites `path` with the current metrics every `interval` seconds, and
+    once more on close, for node_exporter's textfile collector (which only
+    reads *.prom files). The file is replaced atomically, so a scrape never
+    sees it half-written.
+    """
+
+    def __init__(self, metrics, path, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='metrics-textfile', daemon=True)
+        self._thread.start()
+
+    def write(self):
+        with atomic_write(self.path) as f:
+            f.write(self.metrics.render())
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
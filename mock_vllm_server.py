@@ -0,0 +1,193 @@
+"""
+Minimal stand-in for the vLLM OpenAI-compatible server, for local testing
+without a GPU. Serves /v1/chat/completions (plain and streamed) and /health
+on one or more ports, each port acting as a separate replica:
+
+    python3 mock_vllm_server.py --ports 8001 8002 8003
+    API_URL=http://localhost:8001/v1/chat/completions,http://localhost:8002/v1/chat/completions \
+        python3 translate_fortran_json_response.py input.csv output.csv --concurrency 8
+
+The "translation" echoes the legacy code under a comment line, wrapped in
+the JSON contract, and honours max_tokens (finish_reason "length") and
+continue_final_message. For benchmarks, the time to the first token can
+follow a distribution, tokens are generated at a given rate, and a share
+of requests can fail (503) or come back as malformed JSON.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CHARS_PER_TOKEN = 4
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+
+def sample_latency(distribution, mean, sigma=0.5):
+    """
+    Seconds before the first token, drawn from `distribution` with the given mean.
+    """
+    if mean <= 0 or distribution == 'constant':
+        return max(0.0, mean)
+    if distribution == 'uniform':
+        return random.uniform(0, 2 * mean)
+    if distribution == 'exponential':
+        return random.expovariate(1 / mean)
+    if distribution == 'lognormal':
+        # mu chosen so the distribution's mean is `mean`
+        return random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+def malform(answer):
+    """
+    One of the ways models break the JSON contract.
+    """
+    code = json.loads(answer)['translated_code']
+    return random.choice([
+        f"```json\n{answer}\n```",
+        f"Here is the translated code:\n{answer}\nLet me know if you need anything else.",
+        '{"translated_code": "' + code.replace('\n', '\\n') + ' ! "done""}',
+        answer[:len(answer) // 2],
+    ])
+
+
+def mock_translation(messages):
+    """
+    The full JSON answer for a conversation: the legacy code, marked as translated.
+    """
+    user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+    code = user.split('Legacy Code:\n', 1)[-1]
+    return json.dumps({"translated_code": f"! mock translation\n{code}"})
+
+
+def make_handler(latency=0.05, token_rate=1000.0, latency_distribution='constant', latency_sigma=0.5,
+                 error_rate=0.0, malformed_rate=0.0):
+    """
+    Request handler class; `token_rate` is in tokens per second (0: instant).
+    """
+    token_delay = 1 / token_rate if token_rate > 0 else 0
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as separate writes; without this, Nagle and
+        # delayed ACKs add ~40 ms to some responses
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if self.path == '/health':
+                self.send_json(200, {})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self.read_json()
+            if self.path != '/v1/chat/completions':
+                self.send_json(404, {"error": "not found"})
+                return
+
+            if random.random() < error_rate:
+                time.sleep(sample_latency(latency_distribution, latency, latency_sigma))
+                self.send_json(503, {"error": "mock overload"})
+                return
+
+            messages = body.get('messages', [])
+            answer = mock_translation(messages)
+            # A continuation resumes after the partial assistant message
+            if body.get('continue_final_message') and messages and messages[-1]['role'] == 'assistant':
+                answer = answer[len(messages[-1]['content']):]
+            elif random.random() < malformed_rate:
+                answer = malform(answer)
+            limit = (body.get('max_tokens') or 2048) * CHARS_PER_TOKEN
+            finish_reason = 'stop'
+            if len(answer) > limit:
+                answer, finish_reason = answer[:limit], 'length'
+
+            prompt_tokens = sum(len(m.get('content', '')) for m in messages) // CHARS_PER_TOKEN + 1
+            usage = {"prompt_tokens": prompt_tokens,
+                     "completion_tokens": len(answer) // CHARS_PER_TOKEN + 1}
+            time.sleep(sample_latency(latency_distribution, latency, latency_sigma))
+
+            if body.get('stream'):
+                self.stream(answer, finish_reason, usage)
+            else:
+                time.sleep(usage['completion_tokens'] * token_delay)
+                self.send_json(200, {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage,
+                })
+
+        def stream(self, answer, finish_reason, usage):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            pieces = [answer[i:i + CHARS_PER_TOKEN] for i in range(0, len(answer), CHARS_PER_TOKEN)]
+            try:
+                for index, piece in enumerate(pieces):
+                    last = index == len(pieces) - 1
+                    chunk = {"choices": [{"index": 0, "delta": {"content": piece},
+                                          "finish_reason": finish_reason if last else None}],
+                             "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading, like vLLM aborting the request
+                pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock vLLM OpenAI-compatible server for local testing.')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--ports', type=int, nargs='+', default=[8000],
+                        help='One replica is served on each port (default: 8000)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Mean seconds before the first token (default: 0.05)')
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='constant',
+                        help='Distribution of the time to first token (default: constant)')
+    parser.add_argument('--latency-sigma', type=float, default=0.5,
+                        help='Shape of the lognormal distribution (default: 0.5)')
+    parser.add_argument('--token-rate', type=float, default=1000.0,
+                        help='Generated tokens per second per request; 0 for instant (default: 1000)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests answered with 503 (default: 0)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='Share of answers that break the JSON contract (default: 0)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed, for repeatable runs')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    handler = make_handler(args.latency, args.token_rate, args.latency_distribution, args.latency_sigma,
+                           args.error_rate, args.malformed_rate)
+    servers = [ThreadingHTTPServer((args.host, port), handler) for port in args.ports]
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Mock vLLM listening on {', '.join(f'{args.host}:{port}' for port in args.ports)}")
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,414 @@
+"""
+Multi-model sweep: the Python replacement for the model loop in run_all_models.sh.
+
+For each model a vLLM server is started through a container backend, the
+translation runs in-process through process_csv, and the server is stopped.
+While one model translates, the next one is already loading on the GPUs it
+leaves free, or, when it needs the same GPUs, its weights are downloaded
+ahead of time. Load time and translation time are recorded separately
+in a JSON report.
+
+    python3 orchestrator.py --backend compose --tp-size 4 --gpus 8
+    python3 orchestrator.py --backend fake --input-csv small.csv --report /tmp/report.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import requests
+
+import translate_fortran_json_response as translator
+from checkpoint import atomic_write
+from compile_check import CompileChecker
+from metrics_exporter import MetricsServer, PipelineMetrics, TextfileExporter
+from mock_vllm_server import make_handler
+from provenance import ProvenanceIndex, provenance_path_for
+from resilience import CircuitBreaker, RetryBudget
+from token_budget import ExpansionRatioStore
+from translation_cache import TranslationCache
+from vllm_client import VLLMClient
+
+
+# --- Configuration ---
+MODELS = [
+    "codellama/CodeLlama-34b-Instruct-hf",
+    "mistralai/Mistral-7B-Instruct-v0.3",
+    "Qwen/Qwen2.5-Coder-32B-Instruct",
+    "deepseek-ai/deepseek-coder-33b-instruct",
+]
+BASE_PORT = 8000
+HEALTH_POLL_SECONDS = 10
+
+
+def column_name(model):
+    """
+    Output column for a model, e.g. output_mistralai_Mistral_7B_Instruct_v0_3.
+    """
+    return f"output_{re.sub(r'[/.-]', '_', model)}"
+
+
+def count_gpus():
+    """
+    Number of GPUs reported by nvidia-smi, or 0 when there is none.
+    """
+    try:
+        result = subprocess.run(['nvidia-smi', '-L'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 0
+    return sum(1 for line in result.stdout.splitlines() if line.startswith('GPU '))
+
+
+class Server:
+    """
+    One vLLM server being started by a backend, and when it became healthy.
+    """
+
+    def __init__(self, model, gpus, port, handle=None):
+        self.model = model
+        self.gpus = gpus
+        self.port = port
+        self.handle = handle
+        self.base_url = f"http://localhost:{port}"
+        self.url = f"{self.base_url}/v1/chat/completions"
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+
+    def watch(self, poll_seconds):
+        """
+        Poll /health in the background, as wait_for_vllm does, and set `ready`.
+        """
+        def poll():
+            while not self._stop.is_set():
+                try:
+                    if requests.get(f"{self.base_url}/health", timeout=5).status_code == 200:
+                        self.ready_at = time.monotonic()
+                        self.ready.set()
+                        return
+                except requests.exceptions.RequestException:
+                    pass
+                self._stop.wait(poll_seconds)
+
+        threading.Thread(target=poll, name=f"health-{self.port}", daemon=True).start()
+
+    @property
+    def load_seconds(self):
+        return self.ready_at - self.started_at if self.ready_at is not None else None
+
+    def stop_watching(self):
+        self._stop.set()
+
+
+class ComposeBackend:
+    """
+    Runs each server as its own Docker Compose project from docker-compose.yml.
+    The model, GPUs and host port are passed through the environment.
+    """
+
+    def __init__(self, compose_file='docker-compose.yml', image='vllm/vllm-openai:latest',
+                 hf_cache='/tmp/hf-cache'):
+        self.compose_file = compose_file
+        self.image = image
+        self.hf_cache = hf_cache
+
+    def _compose(self, project, *args, env=None):
+        subprocess.run(['docker', 'compose', '-f', self.compose_file, '-p', project, *args],
+                       env=env, check=True)
+
+    def start(self, model, gpus, port, tp_size, max_len):
+        env = dict(os.environ, MODEL_ID=model, TP_SIZE=str(tp_size), MAX_LEN=str(max_len),
+                   VLLM_PORT=str(port), GPU_IDS=','.join(map(str, gpus)))
+        project = f"vllm{port}"
+        self._compose(project, 'up', '-d', env=env)
+        return project
+
+    def stop(self, handle):
+        self._compose(handle, 'down')
+
+    def prefetch(self, model):
+        """
+        Download the model weights into the shared Hugging Face cache.
+        """
+        subprocess.run([
+            'docker', 'run', '--rm', '-e', 'HF_TOKEN',
+            '-v', f"{self.hf_cache}:/root/.cache/huggingface/",
+            '--entrypoint', 'huggingface-cli', self.image, 'download', model,
+        ], check=False)
+
+
+class FakeBackend:
+    """
+    Serves mock_vllm_server replicas in-process, for testing the sweep without
+    Docker or GPUs. Loading takes `load_seconds`, or `warm_load_seconds` once
+    the model has been prefetched.
+    """
+
+    def __init__(self, load_seconds=2.0, warm_load_seconds=1.0, prefetch_seconds=0.5, latency=0.01):
+        self.load_seconds = load_seconds
+        self.warm_load_seconds = warm_load_seconds
+        self.prefetch_seconds = prefetch_seconds
+        self.latency = latency
+        self.prefetched = set()
+
+    def start(self, model, gpus, port, tp_size, max_len):
+        handle = {'server': None, 'stopped': threading.Event()}
+        delay = self.warm_load_seconds if model in self.prefetched else self.load_seconds
+
+        def serve():
+            if handle['stopped'].wait(delay):
+                return
+            handle['server'] = ThreadingHTTPServer(('127.0.0.1', port), make_handler(self.latency, token_rate=0))
+            handle['server'].serve_forever()
+
+        threading.Thread(target=serve, name=f"fake-vllm-{port}", daemon=True).start()
+        return handle
+
+    def stop(self, handle):
+        handle['stopped'].set()
+        if handle['server'] is not None:
+            handle['server'].shutdown()
+            handle['server'].server_close()
+
+    def prefetch(self, model):
+        time.sleep(self.prefetch_seconds)
+        self.prefetched.add(model)
+
+
+BACKENDS = {'compose': ComposeBackend, 'fake': FakeBackend}
+
+
+class Sweep:
+    """
+    Runs the translation for every model, overlapping each model's loading
+    with the previous model's translation.
+    """
+
+    def __init__(self, backend, models, gpus, tp_size, max_len, load_timeout=900,
+                 health_poll_seconds=HEALTH_POLL_SECONDS, base_port=BASE_PORT):
+        self.backend = backend
+        self.models = models
+        self.gpus = list(range(max(gpus, tp_size)))
+        self.tp_size = tp_size
+        self.max_len = max_len
+        self.load_timeout = load_timeout
+        self.health_poll_seconds = health_poll_seconds
+        self.ports = [base_port, base_port + 1]
+
+    def start(self, model, gpus, port):
+        print(f"Starting {model} on GPUs {','.join(map(str, gpus))}, port {port}")
+        server = Server(model, gpus, port)
+        server.handle = self.backend.start(model, gpus, port, self.tp_size, self.max_len)
+        server.watch(self.health_poll_seconds)
+        return server
+
+    def stop(self, server):
+        server.stop_watching()
+        self.backend.stop(server.handle)
+
+    def run(self, translate):
+        """
+        `translate(model, server)` runs one model's translation and returns
+        its throughput summary. Returns one report entry per model.
+        """
+        report = []
+        pending = None
+        prefetched = None
+        for index, model in enumerate(self.models):
+            print("=" * 56)
+            print(f"Starting experiment for: {model}")
+            print("=" * 56)
+            entry = {'model': model, 'column': column_name(model)}
+            report.append(entry)
+
+            # Overlapped: started during the previous translation; prefetched: weights downloaded then
+            entry['overlapped'] = pending is not None
+            entry['prefetched'] = prefetched == model
+            server = pending or self.start(model, self.gpus[:self.tp_size], self.ports[0])
+            pending = None
+
+            waited_from = time.monotonic()
+            ready = server.ready.wait(max(0, self.load_timeout - (waited_from - server.started_at)))
+            entry['wait_seconds'] = round(time.monotonic() - waited_from, 2)
+            if not ready:
+                print(f"ERROR: vLLM failed to start. Skipping {model}.")
+                entry['status'] = 'failed to start'
+                self.stop(server)
+                continue
+            entry['load_seconds'] = round(server.load_seconds, 2)
+            print(f"vLLM is ready after {entry['load_seconds']:.1f} s "
+                  f"(translation waited {entry['wait_seconds']:.1f} s)")
+
+            prefetch = None
+            if index + 1 < len(self.models):
+                next_model = self.models[index + 1]
+                free = [gpu for gpu in self.gpus if gpu not in server.gpus]
+                if len(free) >= self.tp_size:
+                    other_port = self.ports[1] if server.port == self.ports[0] else self.ports[0]
+                    pending = self.start(next_model, free[:self.tp_size], other_port)
+                else:
+                    print(f"Prefetching {next_model} weights during translation")
+                    prefetched = next_model
+                    prefetch = threading.Thread(target=self.backend.prefetch, args=(next_model,), daemon=True)
+                    prefetch.start()
+
+            started = time.monotonic()
+            try:
+                entry['throughput'] = translate(model, server)
+                entry['status'] = 'ok'
+            except Exception as e:
+                print(f"Translation for {model} failed: {e}")
+                entry['status'] = f"failed: {e}"
+            entry['translate_seconds'] = round(time.monotonic() - started, 2)
+            print(f"Finished {model} in {entry['translate_seconds']:.1f} s")
+
+            self.stop(server)
+            if prefetch is not None:
+                prefetch.join()
+
+        if pending is not None:
+            self.stop(pending)
+        return report
+
+
+def translate_with_library(output_csv, args, metrics=None, compile_checker=None):
+    """
+    Build the per-model translate step: process_csv on the shared results CSV.
+    `metrics` (a PipelineMetrics) follows each model's client in turn, and
+    every model's translations go through the same `compile_checker`.
+    """
+    def translate(model, server):
+        client = VLLMClient(api_url=server.url, pool_size=args.concurrency,
+                            breaker=CircuitBreaker(max_pause=args.load_timeout))
+        cache = TranslationCache(args.cache) if args.cache else None
+        retry_budget = RetryBudget()
+        if metrics is not None:
+            metrics.client, metrics.retry_budget = client, retry_budget
+        try:
+            with client:
+                return translator.process_csv(
+                    output_csv,
+                    output_csv,
+                    'legacy_code',
+                    column_name(model),
+                    translator.TranslationSettings(
+                        model=model,
+                        temperature=args.temperature,
+                        max_tokens=args.max_tokens,
+                        concurrency=args.concurrency,
+                        resume=args.resume,
+                        adaptive_tokens=args.adaptive_max_tokens,
+                        metrics_file=args.metrics_file,
+                        dedup=args.dedup,
+                        near_dup_threshold=args.near_dup_threshold
+                    ),
+                    client=client,
+                    cache=cache,
+                    ratio_store=ExpansionRatioStore(args.ratio_store) if args.ratio_store else None,
+                    retry_budget=retry_budget,
+                    metrics=metrics,
+                    compile_checker=compile_checker,
+                    provenance=ProvenanceIndex(provenance_path_for(output_csv, column_name(model)), column_name(model))
+                )
+        finally:
+            if cache is not None:
+                cache.close()
+
+    return translate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Translate the input CSV with every model in turn.')
+    parser.add_argument('--models', nargs='+', default=MODELS, help='Models to run, in order')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='compose',
+                        help='How vLLM servers are started (default: compose)')
+    parser.add_argument('--gpus', type=int, default=None,
+                        help='GPUs available (default: detected with nvidia-smi)')
+    parser.add_argument('--tp-size', type=int, default=4, help='Tensor parallel size per model (default: 4)')
+    parser.add_argument('--max-len', type=int, default=8192, help='vLLM --max-model-len (default: 8192)')
+    parser.add_argument('--load-timeout', type=float, default=900,
+                        help='Seconds to wait for a model to load (default: 900)')
+    parser.add_argument('--input-csv', default='input.csv', help='Input CSV (default: input.csv)')
+    parser.add_argument('--output-csv', default='final_experiment_results.csv',
+                        help='Results CSV, one column per model (default: final_experiment_results.csv)')
+    parser.add_argument('--report', default='sweep_report.json',
+                        help='JSON file for load and translation times (default: sweep_report.json)')
+    parser.add_argument('--temperature', type=float, default=0.0, help='Sampling temperature (default: 0.0)')
+    parser.add_argument('--max-tokens', type=int, default=2048, help='Maximum tokens to generate (default: 2048)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight per model (default: 8)')
+    parser.add_argument('--cache', default=None,
+                        help='SQLite file caching translations across runs (default: disabled)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted sweep: keep the results CSV and skip the rows '
+                             'journaled by the interrupted model')
+    parser.add_argument('--ratio-store', default='expansion_ratios.json',
+                        help='Learned expansion ratios file (default: expansion_ratios.json)')
+    parser.add_argument('--metrics-file', default='row_metrics.jsonl',
+                        help='Per-row metrics of every model, as JSONL (default: row_metrics.jsonl)')
+    parser.add_argument('--compile-check', action='store_true',
+                        help='Syntax-check translations with gfortran into the score columns')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Translate duplicate snippets once per model and copy the translation to every row')
+    parser.add_argument('--near-dup-threshold', type=float, default=None,
+                        help='Also share translations between near-duplicates at this MinHash similarity')
+    parser.add_argument('--prometheus-port', type=int, default=None,
+                        help='Serve Prometheus metrics of the sweep on this port at /metrics (default: disabled)')
+    parser.add_argument('--prometheus-host', default='127.0.0.1',
+                        help='Interface for --prometheus-port (default: 127.0.0.1)')
+    parser.add_argument('--prometheus-textfile', default=None,
+                        help="Write the Prometheus metrics to this *.prom file for node_exporter's textfile collector")
+    parser.add_argument('--adaptive-max-tokens', action='store_true',
+                        help='Size max_tokens per row from the snippet length')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_csv):
+        print(f"Error: {args.input_csv} not found!")
+        exit(1)
+    if args.resume and os.path.isfile(args.output_csv):
+        print(f"Resuming into {args.output_csv}")
+    else:
+        print(f"Initializing {args.output_csv} from {args.input_csv}...")
+        shutil.copyfile(args.input_csv, args.output_csv)
+
+    gpus = args.gpus if args.gpus is not None else count_gpus()
+    poll = HEALTH_POLL_SECONDS if args.backend == 'compose' else 0.2
+    sweep = Sweep(BACKENDS[args.backend](), args.models, gpus, args.tp_size, args.max_len,
+                  load_timeout=args.load_timeout, health_poll_seconds=poll)
+    compile_checker = None
+    if args.compile_check:
+        try:
+            compile_checker = CompileChecker()
+        except FileNotFoundError as e:
+            print(f"Warning: {e}; compile checks disabled. Install gfortran to enable --compile-check.")
+    metrics = None
+    exporters = []
+    if args.prometheus_port is not None or args.prometheus_textfile:
+        metrics = PipelineMetrics()
+        if args.prometheus_port is not None:
+            exporters.append(MetricsServer(metrics, args.prometheus_port, args.prometheus_host))
+        if args.prometheus_textfile:
+            exporters.append(TextfileExporter(metrics, args.prometheus_textfile))
+    try:
+        report = sweep.run(translate_with_library(args.output_csv, args, metrics, compile_checker))
+    finally:
+        if compile_checker is not None:
+            compile_checker.close()
+        for exporter in exporters:
+            exporter.close()
+
+    with atomic_write(args.report) as f:
+        json.dump(report, f, indent=2)
+
+    print("=" * 56)
+    print("All experiments complete.")
+    print(f"Final consolidated results: {args.output_csv}")
+    for entry in report:
+        print(f"  {entry['model']}: {entry['status']}, load {entry.get('load_seconds', '-')} s, "
+              f"waited {entry['wait_seconds']} s, translation {entry.get('translate_seconds', '-')} s")
+    print(f"Timings saved to {args.report}")
@@ -0,0 +1,192 @@
+# Canonical prompts shared by every translation entry point.
+#
+# SYSTEM_PROMPT must stay byte-identical across scripts and rows: vLLM's
+# automatic prefix caching only reuses the KV cache for an exact token prefix.
+# Anything that varies (output format, per-row notes, the code itself) goes
+# into the user message, after the fixed instructions.
+
+SYSTEM_PROMPT = """
+You are given Fortran 77 code that may contain ESOPE extensions.
+ESOPE is an extension of Fortran designed for structured memory management, based on the concept of segments (SEGMENT, SEGINI, SEGACT, SEGDES, SEGSUP, SEGADJ, etc.) and pointers (POINTEUR).
+The goal is to translate this legacy ESOPE-Fortran code into modern Fortran (Fortran 2008).
+You must follow the strict translation rules and patterns demonstrated in the examples below.
+Translation Rules
+1. Module and Procedure Structure
+Module Creation: A standalone SUBROUTINE or FUNCTION (e.g., subroutine newbk) must be converted into a MODULE(e.g., module newbk_mod).
+Contains: The original procedure must be placed inside the CONTAINS section of the new module.
+Implicit Typing: IMPLICIT NONE must be enforced in all modules and procedures.
+2. Declarations and Dependencies
+external to use: An external <name> declaration (and its associated type declaration, e.g., integer fndbk) must be replaced with a USE statement (e.g., use :: fndbk_mod).
+POINTEUR:
+pointeur lib.PSTR → type(str), pointer :: lib
+pointeur <var>.<seg> → type(<seg>), pointer :: <var>
+INTENT: All procedure arguments must be given an INTENT attribute (e.g., intent(in), intent(out), intent(inout)).
+For POINTEUR arguments that are initialized or modified, intent(inout) is appropriate.
+Includes:
+#include "PSTR.inc" → ! [ooo] empty #include PSTR.inc
+#include "tlib.seg" → Keep the include comments, but add local declarations for the segment's members (e.g., integer :: brcnt, integer :: urcnt).
+3. ESOPE Command and Syntax Translation
+Pointer Access: Convert ESOPE dot-notation to standard Fortran percent-notation.
+lb.bref → lb % bref
+Array Sizing: Convert ESOPE slash-notation to the SIZE intrinsic.
+lb.bref(/1) → size(lb % bref, 1)
+mypnt Function: Convert the generic mypnt call to a typed pointer assignment (=>) using the specific function for that type.
+lb = mypnt(lib,1) → lb => tlib_mypnt(lib, 1)
+ur = mypnt(lib, lb.uref(iur)) → ur => user_mypnt(lib, lb % uref(iur))
+Memory Allocation (segini): The segini macro must be translated to a subroutine call that explicitly passes the segment's dimensioning variables.
+segini, ur → call segini(ur, ubbcnt)
+Memory Resizing (segadj): The segadj macro must also be translated to a call passing the new dimensioning variables.
+segadj, ur → call segadj(ur, ubbcnt)
+segadj, lb → call segadj(lb, brcnt, urcnt)
+4. Obsolete and Unused Code
+Obsolete Macros: All obsolete memory/state management macros must be commented out and tagged ! [ooo].obsolete:. This includes:
+call oooeta(...)
+call actstr(...)
+segact ...
+segdes ...
+call desstr(...)
+Unused Variables: If an ESOPE bookkeeping variable (like libeta) becomes unused after translation, mark its declaration with ! [ooo].not-used:.
+
+
+Example 1 ESOPE+Fortran:
+c arguments
+      pointeur lib.pstr
+      character*(*) title
+c local variables
+      pointeur bk.book
+
+Example 1 Fortran 2008:
+! arguments
+type(str), pointer, intent(in) :: lib
+character(len=*), intent(in) :: title
+! local variables
+type(book), pointer :: bk
+
+Example 2 ESOPE+Fortran:
+subroutine borbk(lib, name, title)
+       implicit none
+#include "PSTR.inc"
+c external functions
+       external fndbk 
+       integer fndbk
+
+Example 2 Fortran 2008:
+module borbk_mod
+  use :: str_mod
+  use :: fndur_mod
+  use :: fndbk_mod
+  ...
+  implicit none
+contains
+  subroutine borbk(lib, name, title)
+    ! [ooo] empty #include PSTR.inc
+    ! external functions
+
+
+Example 3 ESOPE+Fortran:
+bk = mypnt(lib, lb.bref(ibk2))
+segact, bk
+
+Example 3 Fortran 2008:
+bk => book_mypnt(lib, lb % bref(ibk2))
+! [ooo].obsolete: segact,bk
+
+
+Example 4 ESOPE+Fortran:
+brcnt = lb.bref(/1)
+
+Example 4 Fortran 2008:
+brcnt = size(lb % bref, 1)
+
+Example 5 ESOPE+Fortran:
+title2 = bk.btitle
+segdes, bk*NOMOD
+
+Example 5 Fortran 2008:
+title2 = bk % btitle
+! [ooo].obsolete: segdes,bk
+
+
+Example 6 ESOPE+Fortran:
+ubbcnt = ur.ubb(/1)
+ubbcnt = ubbcnt + 1
+segadj, ur
+ur.ubb(ubbcnt) = ibk
+
+Example 6 Fortran 2008:
+ubbcnt = size(ur % ubb, 1)
+ubbcnt = ubbcnt + 1
+call segadj(ur, ubbcnt)
+ur % ubb(ubbcnt) = ibk
+
+
+Example 7 ESOPE+Fortran:
+c local variables    
+      integer libeta
+...
+      call oooeta(lib, libeta)
+      call actstr(lib)
+...
+c deactivate the structure if activated on entry
+      if(libeta.ne.1) call desstr(lib,'MOD')
+
+Example 7 Fortran 2008:
+! local variables    
+    ! [ooo].not-used: integer :: libeta
+...
+    ! [ooo].obsolete: call oooeta(lib,libeta)
+    ! [ooo].obsolete: call actstr(lib)
+...
+    ! deactivate the structure if activated on entry
+    ! [ooo].empty-var: if (libeta /= 1) ! [ooo].obsolete: call desstr(lib,'MOD')
+
+
+Example 8 ESOPE+Fortran:
+if (title2 .eq. title1) then
+Example 8 Fortran 2008:
+if (title2 == title1) then
+"""
+
+JSON_INSTRUCTIONS = """Translate this legacy Fortran code to modern Fortran.
+You must respond ONLY with valid JSON in this exact format:
+{
+  "translated_code": "the translated Fortran 2008 code here"
+}
+Do not include any text before or after the JSON. Do not wrap the JSON in markdown code blocks.
+Because the value is a code string, escape all double quotes (\\") and newlines (\\n) inside it."""
+
+CODE_ONLY_INSTRUCTIONS = """Translate this legacy Fortran code to modern Fortran.
+Give me only the translated code, without any explanation text."""
+
+# JSON schema of the JSON_INSTRUCTIONS contract, for server-side guided decoding
+TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {"translated_code": {"type": "string"}},
+    "required": ["translated_code"],
+    "additionalProperties": False,
+}
+
+FRAGMENT_NOTE = ("This is part {index} of {total} of one long routine that is translated piece by piece."
+                 " Translate only this part; do not add a MODULE wrapper, CONTAINS or END statements"
+                 " that are not in it.")
+
+PRETRANSLATED_NOTE = ("Parts of the code were already translated mechanically; keep them"
+                      " as they are and translate the remaining legacy constructs.")
+
+
+def build_messages(code_snippet, instructions=JSON_INSTRUCTIONS, pretranslated=False, fragment=None):
+    """
+    Build the chat messages for one snippet.
+    The system message and the instructions form a prefix shared by every row.
+    `fragment` is an (index, total) pair when the snippet is part of a split routine.
+    """
+    user_content = instructions
+    if pretranslated:
+        user_content += "\n" + PRETRANSLATED_NOTE
+    if fragment is not None:
+        user_content += "\n" + FRAGMENT_NOTE.format(index=fragment[0], total=fragment[1])
+    user_content += f"\n\nLegacy Code:\n{code_snippet}"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
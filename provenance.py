@@ -0,0 +1,89 @@
+import json
+import os
+import re
+import time
+
+from checkpoint import atomic_write, hash_code
+
+
+# Cells holding an error message instead of code (the last from translate_fortran_v1_without_json.py)
+ERROR_MARKERS = ("Error translating:", "Error:", "! Error:")
+
+
+def provenance_path_for(output_file, translated_col):
+    """
+    Default index location: next to the output file, one index per column.
+    """
+    safe_col = re.sub(r'[^A-Za-z0-9_.-]', '_', translated_col)
+    return f"{output_file}.{safe_col}.provenance.json"
+
+
+class ProvenanceIndex:
+    """
+    Sidecar JSON index of where each translated cell of one column came from:
+    the hash of the legacy code it was translated from, the hash of the
+    translation written, the model, whether the answer was truncated and,
+    for rows deduplicated against another, the row it was copied from.
+
+    rerun_reason() uses it to tell which cells a selective re-run must
+    translate again. The index is rewritten atomically by save().
+    """
+
+    def __init__(self, path, translated_col):
+        self.path = path
+        self.translated_col = translated_col
+        self.rows = {}
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('column') == translated_col:
+                self.rows = {int(i): entry for i, entry in data.get('rows', {}).items()}
+
+    def rerun_reason(self, row_index, legacy_code, cell):
+        """
+        Why the cell must be translated again ('empty', 'error', 'stale',
+        'truncated', 'near-duplicate'), or None to keep it. Cells with no provenance are kept
+        unless empty or an error; cells edited since they were written are
+        kept unless their legacy code changed.
+        """
+        if not cell.strip():
+            return 'empty'
+        if cell.lstrip().startswith(ERROR_MARKERS):
+            return 'error'
+        entry = self.rows.get(row_index)
+        if entry is None:
+            return None
+        if entry['legacy_hash'] != hash_code(legacy_code):
+            return 'stale'
+        if entry['output_hash'] != hash_code(cell):
+            return None
+        if entry.get('truncated'):
+            return 'truncated'
+        if entry.get('near_duplicate'):
+            return 'near-duplicate'
+        return None
+
+    def record(self, row_index, legacy_code, translated, model, finish_reason=None,
+               copied_from=None, near_duplicate=False):
+        """
+        Record the cell written for `row_index`. `copied_from` is the row whose
+        translation was reused; `near_duplicate` copies are provisional.
+        """
+        self.rows[row_index] = {
+            'legacy_hash': hash_code(legacy_code),
+            'output_hash': hash_code(translated),
+            'model': model,
+            'finish_reason': finish_reason,
+            'truncated': finish_reason == 'length',
+            'copied_from': copied_from,
+            'near_duplicate': near_duplicate,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    def forget(self, row_index):
+        self.rows.pop(row_index, None)
+
+    def save(self):
+        with atomic_write(self.path) as f:
+            json.dump({'column': self.translated_col,
+                       'rows': {str(i): entry for i, entry in sorted(self.rows.items())}}, f)
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+
+import requests
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+def is_retryable(error):
+    """
+    Whether a failed request may succeed if sent again: refused connections,
+    timeouts and other transport errors, 429 and 5xx. Other 4xx (prompt too
+    long, unknown model, bad request) fail the same way every time.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """
+    Exponential backoff with full jitter: a random delay up to base * 2**attempt,
+    so workers that failed together don't retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RetryBudget:
+    """
+    Retries shared by the whole run: at most `min_retries` plus `ratio` of
+    the requests made so far. When the server is down every row fails, and
+    without a budget each of them would retry on its own.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def allow_retry(self):
+        with self._lock:
+            if self.retries < self.min_retries + self.ratio * self.requests:
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def summary(self):
+        with self._lock:
+            return f"Retries: {self.retries} of {self.requests} requests, {self.denied} denied by the retry budget"
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after `failure_threshold` consecutive failures
+    (refused connections, timeouts, 5xx).
+
+    While open, requests wait, which pauses the whole pipeline, until
+    `reset_timeout` has passed; then a single probe request is let through.
+    If it succeeds the circuit closes, otherwise it reopens for twice as
+    long (up to `max_reset_timeout`). Once the circuit has been open for
+    `max_pause` seconds, waiting requests fail fast with CircuitOpenError
+    instead; max_pause=0 never waits.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, max_reset_timeout=300.0, max_pause=600.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.max_pause = max_pause
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0
+        self.opened_at = None
+        self.retry_at = None
+        self._condition = threading.Condition()
+
+    def before_request(self):
+        """
+        Wait until a request may be sent, or raise CircuitOpenError.
+        """
+        with self._condition:
+            while True:
+                if self.state == 'closed':
+                    return
+                now = time.monotonic()
+                if self.state == 'open' and now >= self.retry_at:
+                    # This request is the probe
+                    self.state = 'half-open'
+                    print("Circuit breaker half-open, probing the server")
+                    return
+                paused = now - self.opened_at
+                if paused >= self.max_pause:
+                    raise CircuitOpenError(f"circuit breaker open for {paused:.0f} s, server unavailable")
+                wait = self.max_pause - paused
+                if self.state == 'open':
+                    wait = min(wait, self.retry_at - now)
+                self._condition.wait(wait)
+
+    def record(self, success):
+        """
+        Report the outcome of a request that before_request let through.
+        """
+        with self._condition:
+            if success:
+                if self.state != 'closed':
+                    print("Circuit breaker closed, server is back")
+                self.state = 'closed'
+                self.failures = 0
+                self.reset_timeout = self.base_reset_timeout
+                self._condition.notify_all()
+                return
+
+            self.failures += 1
+            if self.state == 'half-open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                now = time.monotonic()
+                if self.state == 'closed':
+                    self.opened_at = now
+                    self.opened += 1
+                self.state = 'open'
+                self.retry_at = now + self.reset_timeout
+                print(f"Circuit breaker open after {self.failures} consecutive failures, "
+                      f"pausing requests for {self.reset_timeout:.0f} s")
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._condition.notify_all()
+
+    def summary(self):
+        with self._condition:
+            return f"Circuit breaker: {self.state}, opened {self.opened} times"
@@ -0,0 +1,98 @@
+import json
+import threading
+
+
+# Per-row fields, in the order used for companion columns (<column>_<field>)
+METRIC_FIELDS = (
+    'latency_s', 'ttft_s', 'prompt_tokens', 'completion_tokens', 'cached_tokens',
+    'finish_reason', 'retries', 'continuations', 'extract_method', 'cache_hit',
+)
+
+
+def row_record(stats, latency):
+    """
+    The metrics of one translated row, from translate_code's stats and its wall time.
+    """
+    return {
+        'latency_s': round(latency, 3),
+        'ttft_s': round(stats['ttft'], 3) if 'ttft' in stats else None,
+        'prompt_tokens': stats.get('prompt_tokens', 0),
+        'completion_tokens': stats.get('completion_tokens', 0),
+        'cached_tokens': stats.get('cached_tokens', 0),
+        'finish_reason': stats.get('finish_reason'),
+        'retries': stats.get('retries', 0),
+        'continuations': stats.get('continuations', 0),
+        'extract_method': stats.get('extract_method'),
+        'cache_hit': stats.get('cache_hit', False),
+    }
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of `values` (q in 0-100), or None if empty.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+class MetricsSidecar:
+    """
+    Appends one JSON line per translated row to a sidecar file.
+    """
+
+    def __init__(self, path, model, column):
+        self.model = model
+        self.column = column
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, row_index, record):
+        line = json.dumps({'row': row_index, 'model': self.model, 'column': self.column, **record})
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class RunSummary:
+    """
+    Throughput of one run: rows and tokens per second of wall time, and row latency.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+    def summary(self, seconds):
+        latencies = [r['latency_s'] for r in self.records if not r['cache_hit']]
+        completion = sum(r['completion_tokens'] for r in self.records)
+        prompt = sum(r['prompt_tokens'] for r in self.records)
+        return {
+            'model': self.model,
+            'rows': len(self.records),
+            'seconds': round(seconds, 2),
+            'rows_per_s': round(len(self.records) / seconds, 3) if seconds else None,
+            'prompt_tokens': prompt,
+            'completion_tokens': completion,
+            'cached_tokens': sum(r['cached_tokens'] for r in self.records),
+            'completion_tokens_per_s': round(completion / seconds, 1) if seconds else None,
+            'latency_p50_s': percentile(latencies, 50),
+            'latency_p95_s': percentile(latencies, 95),
+            'retries': sum(r['retries'] for r in self.records),
+        }
+
+    @staticmethod
+    def format(summary):
+        text = (f"Throughput ({summary['model'] or 'default model'}): {summary['rows']} rows in "
+                f"{summary['seconds']} s, {summary['rows_per_s']} rows/s, "
+                f"{summary['completion_tokens_per_s']} completion tokens/s")
+        if summary['latency_p50_s'] is not None:
+            text += f", latency p50 {summary['latency_p50_s']} s, p95 {summary['latency_p95_s']} s"
+        return text
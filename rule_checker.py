@@ -0,0 +1,270 @@
+"""
+Check translations against the [ooo] translation rules of SYSTEM_PROMPT, e.g.:
+
+    python3 rule_checker.py final_experiment_results.csv --failing-rows failing.json
+    python3 translate_fortran_json_response.py final_experiment_results.csv final_experiment_results.csv \
+        --translated-col output_qwen2_5_coder_32b --only-rows failing.json
+
+Each translation is scanned once, line by line, with compiled patterns;
+program units are tracked on a stack to check implicit none and argument
+intents. Rows with violations can then be re-translated on their own.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+from collections import Counter
+
+from checkpoint import atomic_write
+from csv_pipeline import iter_rows, model_columns
+from esope_rules import COMMENT_RE, DOT_ACCESS_RE, RELATIONAL_RE, STRING_RE
+
+
+RULES = {
+    'obsolete-macro': "segact/segdes and oooeta/actstr/desstr calls must be commented out as ! [ooo].obsolete:",
+    'segment-macro': "segini/segadj/segsup macros must become calls: call segadj(x, dims)",
+    'segment-dims': "call segini/segadj must pass the segment's dimensioning variables",
+    'mypnt': "mypnt must become a typed pointer assignment: x => <type>_mypnt(...)",
+    'pointeur': "pointeur declarations must become type(<seg>), pointer :: x",
+    'dot-access': "ESOPE dot notation (lb.bref) must become lb % bref",
+    'slash-size': "x(/n) must become size(x, n)",
+    'relational-operator': ".eq./.ne./.lt./... must become ==, /=, <, ...",
+    'comment': "fixed-form c/* comment lines must become ! comments",
+    'include': "#include lines must be commented out",
+    'external': "external declarations must become use :: <name>_mod",
+    'implicit-none': "every module and procedure must be under implicit none",
+    'intent': "every procedure argument needs an intent",
+}
+
+# Rules that only look at one statement, as two alternations: statement
+# kinds, matched at its start, and expressions, scanned once (with string
+# literals blanked) when the statement has the characters they need
+STATEMENT_RULES_RE = re.compile(
+    r'(?P<obsolete_macro>(?:segact|segdes)\b|call\s+(?:oooeta|actstr|desstr)\b|'
+    r'if\s*\(.*\)\s*call\s+(?:oooeta|actstr|desstr)\b)'
+    r'|(?P<segment_macro>seg(?:ini|adj|sup)\s*,)'
+    r'|(?P<segment_dims>call\s+seg(?:ini|adj)\s*\(\s*\w+\s*\))'
+    r'|(?P<pointeur>pointeur\b)'
+    r'|(?P<include>#\s*include\b)'
+    r'|(?P<external>external\b)',
+    re.IGNORECASE
+)
+EXPRESSION_RULES_RE = re.compile(
+    r'(?P<mypnt>(?<!\w)mypnt\s*\(|(?<![=<>/])=\s*\w+_mypnt\s*\()'
+    r'|(?P<slash_size>\(\s*/\s*\d+\s*\))'
+    rf'|(?P<relational_operator>{RELATIONAL_RE.pattern})'
+    rf'|(?P<dot_access>{DOT_ACCESS_RE.pattern})',
+    re.IGNORECASE
+)
+# A comment line 'c' that is not an assignment to a variable named c
+FIXED_COMMENT_RE = re.compile(COMMENT_RE.pattern + r'(?!\s*=)')
+PROGRAM_RE = re.compile(r'^(module|program|submodule)\b(?!\s+procedure\b)', re.IGNORECASE)
+PROCEDURE_RE = re.compile(
+    r'^(?:(?:pure|elemental|recursive|impure|module|integer|real|logical|complex|double\s+precision|'
+    r'character(?:\s*\*\s*\d+|\s*\([^)]*\))?|type\s*\(\s*\w+\s*\))\s+)*'
+    r'(subroutine|function)\s+(\w+)\s*(?:\(([^)]*)\))?', re.IGNORECASE
+)
+END_RE = re.compile(r'^end\s*(?:(?:subroutine|function|module|program|submodule)\b.*)?$', re.IGNORECASE)
+IMPLICIT_NONE_RE = re.compile(r'^implicit\s+none\b', re.IGNORECASE)
+DECLARATION_RE = re.compile(r'^([^:!]*?)::(.*)$')
+INTENT_RE = re.compile(r'\bintent\s*\(', re.IGNORECASE)
+INTENT_STATEMENT_RE = re.compile(r'^intent\s*\(\s*\w+\s*\)\s*(?:::)?(.*)$', re.IGNORECASE)
+PARENS_RE = re.compile(r'\([^()]*\)')
+NAME_RE = re.compile(r'(?:^|,)\s*([a-z_]\w*)', re.IGNORECASE)
+
+
+def split_comment(line):
+    """
+    Split `line` into its code and its trailing `!` comment, ignoring `!` in strings.
+    """
+    position = 0
+    for part in STRING_RE.split(line):
+        if not part.startswith(("'", '"')) and '!' in part:
+            cut = position + part.index('!')
+            return line[:cut], line[cut:]
+        position += len(part)
+    return line, ''
+
+
+def declared_names(text):
+    """
+    Names in a declaration's entity list or an argument list, without dimensions or initial values.
+    """
+    while PARENS_RE.search(text):
+        text = PARENS_RE.sub('', text)
+    return [name.lower() for name in NAME_RE.findall(text)]
+
+
+def statements(code):
+    """
+    Yield (line number, statement) with comments stripped and `&` continuations joined.
+    """
+    pending, start = '', None
+    for number, line in enumerate(code.splitlines(), 1):
+        if FIXED_COMMENT_RE.match(line):
+            yield number, None
+            continue
+        text = split_comment(line)[0].strip()
+        if pending:
+            text = text[1:].lstrip() if text.startswith('&') else text
+        if text.endswith('&'):
+            pending += text[:-1] + ' '
+            start = start or number
+            continue
+        yield start or number, pending + text
+        pending, start = '', None
+    if pending:
+        yield start, pending
+
+
+class Unit:
+    """
+    A module, program or procedure being scanned.
+    """
+
+    def __init__(self, kind, name, line, arguments=(), implicit_none=False):
+        self.kind = kind
+        self.name = name
+        self.line = line
+        self.arguments = [a for a in arguments if a != '*']
+        self.implicit_none = implicit_none
+        self.intents = set()
+
+
+def check_translation(code):
+    """
+    Scan one translation and return its violations as (rule, line number, detail).
+    """
+    violations = []
+    units = []
+
+    def close(unit):
+        if not unit.implicit_none:
+            violations.append(('implicit-none', unit.line, f"{unit.kind} {unit.name}"))
+        missing = [a for a in unit.arguments if a not in unit.intents]
+        if missing:
+            violations.append(('intent', unit.line, f"{unit.name}: {', '.join(missing)}"))
+
+    for number, statement in statements(code):
+        if statement is None:
+            violations.append(('comment', number, ''))
+            continue
+        if not statement:
+            continue
+
+        rules = []
+        match = STATEMENT_RULES_RE.match(statement)
+        if match:
+            rules.append(match.lastgroup)
+        if '.' in statement or '/' in statement or 'mypnt' in statement.lower():
+            code = STRING_RE.sub("''", statement) if ("'" in statement or '"' in statement) else statement
+            rules.extend(match.lastgroup for match in EXPRESSION_RULES_RE.finditer(code))
+        for rule in dict.fromkeys(rules):
+            violations.append((rule.replace('_', '-'), number, statement))
+
+        if END_RE.match(statement):
+            if units:
+                close(units.pop())
+            continue
+        match = PROGRAM_RE.match(statement)
+        if match:
+            name = statement.split()[1] if len(statement.split()) > 1 else ''
+            units.append(Unit(match.group(1).lower(), name, number))
+            continue
+        match = PROCEDURE_RE.match(statement)
+        if match:
+            kind, name, arguments = match.groups()
+            inherited = bool(units) and units[-1].implicit_none
+            units.append(Unit(kind.lower(), name, number, declared_names(arguments or ''), inherited))
+            continue
+        if not units:
+            continue
+        if IMPLICIT_NONE_RE.match(statement):
+            units[-1].implicit_none = True
+            continue
+        match = INTENT_STATEMENT_RE.match(statement)
+        if match:
+            units[-1].intents.update(declared_names(match.group(1)))
+            continue
+        match = DECLARATION_RE.match(statement)
+        if match and INTENT_RE.search(match.group(1)):
+            units[-1].intents.update(declared_names(match.group(2)))
+
+    # Units left open (e.g. a truncated translation) are checked as they are
+    while units:
+        close(units.pop())
+    return violations
+
+
+def check_csv(input_file, columns=None, legacy_col='legacy_code', output_file=None):
+    """
+    Check every translation in `columns` (default: every model column).
+
+    Returns {column: {row number (1-based): sorted violated rules}} for the
+    failing rows. With `output_file`, also writes the CSV with a <col>_rules
+    column listing each row's violated rules.
+    """
+    with open(input_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=';', restkey='extra_cols')
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(iter_rows(reader))
+    columns = columns or model_columns(fieldnames, (legacy_col,))
+    missing = [col for col in columns if col not in fieldnames]
+    if missing:
+        raise ValueError(f"Columns not found in {input_file}: {', '.join(missing)}")
+
+    failing = {col: {} for col in columns}
+    for number, row in enumerate(rows, 1):
+        for col in columns:
+            code = row.get(col) or ''
+            rules = []
+            if code and not code.startswith(("Error translating:", "Error:")):
+                rules = sorted({rule for rule, _, _ in check_translation(code)})
+            if rules:
+                failing[col][number] = rules
+            row[f"{col}_rules"] = ','.join(rules)
+
+    if output_file:
+        fieldnames.extend(f"{col}_rules" for col in columns if f"{col}_rules" not in fieldnames)
+        with atomic_write(output_file) as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+    return failing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check translations against the [ooo] translation rules.')
+    parser.add_argument('input_csv', help='Results CSV (e.g. final_experiment_results.csv)')
+    parser.add_argument('--columns', nargs='+', default=None,
+                        help='Columns to check (default: every column with a <col>_score column)')
+    parser.add_argument('--legacy-col', default='legacy_code', help='Legacy code column, never checked (default: legacy_code)')
+    parser.add_argument('--output-csv', default=None,
+                        help='Write the CSV with a <col>_rules column of violated rules per row')
+    parser.add_argument('--failing-rows', default=None,
+                        help='Save {column: [row numbers]} of failing rows as JSON, for --only-rows')
+    parser.add_argument('--verbose', action='store_true', help='Print every violation')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_csv):
+        print(f"Error: Input file '{args.input_csv}' does not exist.")
+        exit(1)
+    try:
+        failing = check_csv(args.input_csv, args.columns, args.legacy_col, args.output_csv)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    for col, rows in failing.items():
+        counts = Counter(rule for rules in rows.values() for rule in rules)
+        print(f"{col}: {len(rows)} rows violate the rules")
+        for rule, count in counts.most_common():
+            print(f"  {rule}: {count} rows ({RULES[rule]})")
+        if args.verbose:
+            for number, rules in rows.items():
+                print(f"    row {number}: {', '.join(rules)}")
+    if args.failing_rows:
+        with atomic_write(args.failing_rows) as f:
+            json.dump({col: sorted(rows) for col, rows in failing.items()}, f, indent=2)
+        print(f"Failing rows saved to {args.failing_rows}")
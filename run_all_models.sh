@@ -76,13 +76,9 @@ systemctl status docker --no-pager
 
 
 ############################################
-# STEP 6: Start docker compose
+# STEP 6: Experiment configuration
 ############################################
 
-echo "[STEP 6] Starting docker compose..."
-docker compose up -d
-# Your existing model loop code continues here...
-
 MODELS=(
 	"codellama/CodeLlama-34b-Instruct-hf"
 	"mistralai/Mistral-7B-Instruct-v0.3"
@@ -95,6 +91,12 @@ TP_SIZE=4
 MAX_LEN=8192
 INPUT_CSV="input.csv"
 FINAL_RESULTS="final_experiment_results.csv"
+# Opt-in: TRANSLATION_CACHE=translation_cache.sqlite reuses translations across runs
+TRANSLATION_CACHE="${TRANSLATION_CACHE:-}"
+# Opt-in: ADAPTIVE_MAX_TOKENS=1 sizes max_tokens per row from the snippet length
+ADAPTIVE_MAX_TOKENS="${ADAPTIVE_MAX_TOKENS:-0}"
+EXPANSION_RATIOS="expansion_ratios.json"
+SWEEP_REPORT="sweep_report.json"
 
 
 
@@ -107,95 +109,32 @@ if [ ! -f "$INPUT_CSV" ]; then
     exit 1
 fi
 
-echo "Initializing $FINAL_RESULTS from $INPUT_CSV..."
-cp "$INPUT_CSV" "$FINAL_RESULTS"
-
-
-
-############################################
-# STEP 8: vLLM health check function
-############################################
-
-wait_for_vllm() {
-    local url="http://localhost:8000/health"
-    local retries=0
-    local max_retries=90
-
-    echo "Waiting for vLLM to load..."
-    until curl -sf "$url" > /dev/null; do
-        sleep 10
-        retries=$((retries + 1))
-        echo -n "."
-        if [ "$retries" -ge "$max_retries" ]; then
-            echo
-            echo "ERROR: vLLM failed to start."
-            return 1
-        fi
-    done
-    echo
-    echo "vLLM is ready."
-    return 0
-}
-
 
 
 ############################################
-# STEP 9: Main experiment loop
+# STEP 8: Main experiment loop
 ############################################
 
+# orchestrator.py starts one docker compose project per model, waits for
+# /health, translates FINAL_RESULTS in-process and loads the next model on
+# the free GPUs (or prefetches its weights) while the current one translates.
+# Load and translation times are written to SWEEP_REPORT.
+OPTIONAL_ARGS=()
+if [ -n "$TRANSLATION_CACHE" ]; then
+    OPTIONAL_ARGS+=(--cache "$TRANSLATION_CACHE")
+fi
+if [ "$ADAPTIVE_MAX_TOKENS" = "1" ]; then
+    OPTIONAL_ARGS+=(--adaptive-max-tokens --ratio-store "$EXPANSION_RATIOS")
+fi
 
-# --- Main Loop ---
-for MODEL_ID in "${MODELS[@]}"; do
-    echo "========================================================"
-    echo "Starting experiment for: $MODEL_ID"
-    echo "========================================================"
-
-    # 1. Generate a sanitized name for the column (no / or -)
-    # Using underscores to match your required header format
-# This is what I used in the updated script I gave you
-    SAFE_NAME=$(echo "$MODEL_ID" | sed 's/[\/\.-]/_/g')
-    COL_NAME="output_${SAFE_NAME}"
-
-    # 2. Overwrite .env file dynamically for Docker Compose
-    echo "Generating .env for $MODEL_ID..."
-    cat > .env <<EOF
-MODEL_ID=$MODEL_ID
-TP_SIZE=$TP_SIZE
-MAX_LEN=$MAX_LEN
-EOF
-
-    # 3. Restart Docker Container
-    echo "Restarting Docker containers..."
-    docker compose down
-    docker compose up -d
-
-    # 4. Wait for the server to be ready
-    if ! wait_for_vllm; then
-        echo "Skipping $MODEL_ID due to server failure."
-        continue
-    fi
-
-    # 5. Run the translation script
-    # We use FINAL_RESULTS as both input and output to append columns
-    echo "Running translation script for column: $COL_NAME"
-
-    # We call the script directly or via make.
-    # Passing the same file to input and output allows the Python script to update it.
-    
-python3 translate_fortran_json_response.py "$FINAL_RESULTS" "$FINAL_RESULTS" \
-    --legacy-col "legacy_code" \
-    --translated-col "$COL_NAME" \
+python3 orchestrator.py \
+    --backend compose \
+    --models "${MODELS[@]}" \
+    --tp-size "$TP_SIZE" \
+    --max-len "$MAX_LEN" \
+    --input-csv "$INPUT_CSV" \
+    --output-csv "$FINAL_RESULTS" \
+    --report "$SWEEP_REPORT" \
     --temperature 0.0 \
     --max-tokens 2048 \
-    --top-p 1.0
-
-    echo "Finished $MODEL_ID. Updated $FINAL_RESULTS"
-
-    # Optional: Clean up docker logs/cache if disk space is an issue
-    # docker system prune -f
-done
-
-echo "========================================================"
-echo "All experiments complete."
-echo "Final consolidated results: $FINAL_RESULTS"
-echo "========================================================"
+    "${OPTIONAL_ARGS[@]}"
@@ -0,0 +1,355 @@
+"""
+Score model translations against a reference column, e.g.:
+
+    python3 scoring.py final_experiment_results.csv --reference-col Reference
+
+Every model column (by default, each column with a <col>_score companion,
+as written by the translation scripts) gets <col>_bleu, <col>_chrf and
+<col>_edit columns, 0-100, and a mean per model is printed. Code is
+normalized first: `!` comments stripped, case-folded, whitespace collapsed.
+
+Blocks of rows are scored in parallel processes, every column of a block
+against references prepared once. Within a block, tokens and n-grams of all
+rows are hashed and counted at once with NumPy. Token edit distances are
+computed row by row.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import numpy as np
+
+from checkpoint import atomic_write
+from csv_pipeline import iter_rows, model_columns
+
+
+METRICS = ('bleu', 'chrf', 'edit')
+BLEU_ORDER = 4
+CHRF_ORDER = 6
+CHRF_BETA = 2
+# Rows per NumPy batch (and per worker task); bounds the memory of the character n-gram arrays
+BLOCK_ROWS = 2000
+ERROR_PREFIXES = ("Error translating:", "Error:")
+
+COMMENT_RE = re.compile(r"""('(?:[^'\n]|'')*'|"(?:[^"\n]|"")*")|!.*""")
+# Common one-character tokens early: none of them starts a longer token
+TOKEN_RE = re.compile(r"""[a-z_][a-z0-9_]*|[(),%+\-]|\d+(?:\.\d*)?(?:[ed][+-]?\d+)?|\.[a-z]+\.|'(?:[^']|'')*'|"""
+                      r""""(?:[^"]|"")*"|=>|==|/=|<=|>=|::|\*\*|//|\S""")
+# Multiplier of the token and n-gram hashes (odd, so no bits are lost)
+HASH_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+def normalize_fortran(code):
+    """
+    Strip `!` comments (outside string literals), case-fold and collapse whitespace.
+    """
+    code = COMMENT_RE.sub(lambda m: m.group(1) or '', code)
+    return ' '.join(code.casefold().split())
+
+
+def token_ids(texts):
+    """
+    Token ids (identifiers, numbers, literals, operators) of a batch of
+    normalized code, as (concatenated ids, tokens per text). An id is a
+    polynomial hash of the token's characters, computed for all tokens at once.
+    """
+    tokens = [TOKEN_RE.findall(text) for text in texts]
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    token_len = np.fromiter(map(len, chain.from_iterable(tokens)), dtype=np.int64, count=int(lengths.sum()))
+    if not len(token_len):
+        return np.zeros(0, dtype=np.uint64), lengths
+    chars = np.frombuffer(''.join(chain.from_iterable(tokens)).encode('utf-32-le'), dtype=np.uint32)
+    starts = np.cumsum(token_len) - token_len
+    powers = np.cumprod(np.full(int(token_len.max()), HASH_MULTIPLIER))
+    position = np.arange(len(chars)) - np.repeat(starts, token_len)
+    hashes = np.add.reduceat(chars.astype(np.uint64) * powers[position], starts)
+    return hashes * HASH_MULTIPLIER + token_len.astype(np.uint64), lengths
+
+
+def char_ids(texts):
+    """
+    Code points of a batch of normalized code, whitespace removed (as chrF
+    does), as (concatenated code points, characters per text).
+    """
+    lengths = np.fromiter((len(text) - text.count(' ') for text in texts), dtype=np.int64, count=len(texts))
+    chars = ''.join(texts).replace(' ', '').encode('utf-32-le')
+    return np.frombuffer(chars, dtype=np.uint32).astype(np.uint64), lengths
+
+
+def ngram_keys(seqs, max_n):
+    """
+    Yield, for n = 1..max_n, the keys of every n-gram of a batch of
+    sequences (as (concatenated elements, lengths)): a rolling hash in the
+    low bits and the sequence's index in the top bits, so sorting the keys
+    groups them by row and the row of a key is `key >> shift`. Yields (keys, shift).
+    """
+    flat, lengths = seqs
+    shift = np.uint64(64 - max(1, (len(lengths) - 1).bit_length()))
+    hash_mask = (np.uint64(1) << shift) - np.uint64(1)
+    row_bits = np.repeat(np.arange(len(lengths), dtype=np.uint64) << shift, lengths)
+    # Elements left in the row from each position; an n-gram starts where at least n are
+    remaining = np.repeat(np.cumsum(lengths), lengths) - np.arange(len(flat))
+    hashes = flat
+    for n in range(1, max_n + 1):
+        if n > 1:
+            hashes = hashes[:-1] * HASH_MULTIPLIER + flat[n - 1:]
+        keys = row_bits[:len(hashes)] | (hashes & hash_mask)
+        yield keys[remaining[:len(hashes)] >= n], shift
+
+
+def count_keys(keys):
+    """
+    Distinct sorted keys and how often each occurs.
+    """
+    keys = np.sort(keys)
+    if not len(keys):
+        return keys, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.diff(np.append(starts, len(keys)))
+
+
+class NgramCounts:
+    """
+    The 1..max_n-gram counts of each sequence of a batch, counted once so a
+    reference batch can be matched against every model column.
+    """
+
+    def __init__(self, seqs, max_n):
+        self.lengths = seqs[1]
+        self.counts = []
+        for keys, self.shift in ngram_keys(seqs, max_n):
+            self.counts.append(count_keys(keys))
+
+    def totals(self, n):
+        return np.maximum(self.lengths - n + 1, 0)
+
+
+def ngram_matches(hyps, refs):
+    """
+    Yield, for each order n of two NgramCounts of the same batch size and
+    per row: clipped n-gram matches, hypothesis n-grams and reference n-grams.
+    """
+    size = len(hyps.lengths)
+    for n, ((hyp_unique, hyp_counts), (ref_unique, ref_counts)) in enumerate(zip(hyps.counts, refs.counts), 1):
+        # Where each hypothesis n-gram would sit among the reference ones, and whether it's there
+        index = np.minimum(np.searchsorted(ref_unique, hyp_unique), max(len(ref_unique) - 1, 0))
+        found = ref_unique[index] == hyp_unique if len(ref_unique) else np.zeros(len(hyp_unique), dtype=bool)
+        clipped = np.minimum(hyp_counts[found], ref_counts[index[found]])
+        matches = np.bincount((hyp_unique[found] >> hyps.shift).astype(np.int64), weights=clipped, minlength=size)
+        yield matches, hyps.totals(n), refs.totals(n)
+
+
+def bleu(hyps, refs):
+    """
+    Sentence BLEU of each row (token 1-4 grams, add-one smoothing above unigrams).
+    """
+    log_precision = np.zeros(len(hyps.lengths))
+    for n, (matches, hyp_total, _) in enumerate(ngram_matches(hyps, refs), 1):
+        smoothing = 0 if n == 1 else 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_precision += np.log((matches + smoothing) / (hyp_total + smoothing)) / BLEU_ORDER
+    hyp_len = hyps.lengths.astype(np.float64)
+    ref_len = refs.lengths.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        brevity = np.where(hyp_len >= ref_len, 0.0, 1 - ref_len / hyp_len)
+        scores = 100 * np.exp(log_precision + brevity)
+    return np.nan_to_num(scores, nan=0.0)
+
+
+def chrf(hyps, refs):
+    """
+    chrF (character 1-6 grams, beta 2) of each row.
+    """
+    size = len(hyps.lengths)
+    precision = np.zeros(size)
+    recall = np.zeros(size)
+    orders = np.zeros(size)
+    for matches, hyp_total, ref_total in ngram_matches(hyps, refs):
+        # Orders longer than a text don't count against it
+        effective = (hyp_total > 0) & (ref_total > 0)
+        precision += np.divide(matches, hyp_total, out=np.zeros(size), where=effective)
+        recall += np.divide(matches, ref_total, out=np.zeros(size), where=effective)
+        orders += effective
+    precision = np.divide(precision, orders, out=np.zeros(size), where=orders > 0)
+    recall = np.divide(recall, orders, out=np.zeros(size), where=orders > 0)
+    beta2 = CHRF_BETA ** 2
+    denominator = beta2 * precision + recall
+    return 100 * np.divide((1 + beta2) * precision * recall, denominator,
+                           out=np.zeros(size), where=denominator > 0)
+
+
+def edit_distance(a, b):
+    """
+    Edit distance between two token sequences. The longer one is the pattern,
+    held as bit vectors in Python ints, one bit per pattern position (Myers'
+    bit-parallel algorithm, as in rapidfuzz): each token of the other sequence
+    updates a whole column of the edit distance table in a few integer operations.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    # The positions of each token in the pattern, as bits
+    peq = {}
+    for i, token in enumerate(a):
+        peq[token] = peq.get(token, 0) | 1 << i
+    mask, last = (1 << len(a)) - 1, 1 << (len(a) - 1)
+    # Vertical deltas of the current column: +1 (pv) or -1 (mv) per pattern position
+    pv, mv, distance = mask, 0, len(a)
+    for token in b:
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        # Horizontal deltas: +1 (ph) or -1 (mh); the last row's is the change in distance
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+        ph = ph << 1 | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return distance
+
+
+def edit_distances(a, b):
+    """
+    Edit distance between the sequences of each row of two batches (as
+    (concatenated elements, lengths)).
+    """
+    (a_flat, a_len), (b_flat, b_len) = a, b
+    a_rows = np.split(a_flat, np.cumsum(a_len)[:-1]) if len(a_len) else []
+    b_rows = np.split(b_flat, np.cumsum(b_len)[:-1]) if len(b_len) else []
+    return np.array([edit_distance(x.tolist(), y.tolist()) for x, y in zip(a_rows, b_rows)], dtype=np.int64)
+
+
+def edit_similarity(hyps, refs):
+    """
+    100 * (1 - token edit distance / length of the longer text) of each row.
+    """
+    longest = np.maximum(hyps[1], refs[1])
+    return 100 * np.divide(longest - edit_distances(hyps, refs), longest,
+                           out=np.zeros(len(longest)), where=longest > 0)
+
+
+def score_block(hypothesis_columns, references):
+    """
+    BLEU, chrF and edit similarity of every row of a block, per column
+    ({metric: scores}, in the order of `hypothesis_columns`). References are
+    normalized, tokenized and counted once for all columns. Rows without a
+    reference or a translation (or with an error message) score None.
+    """
+    ref_text = [normalize_fortran(ref) for ref in references]
+    ref_tokens = token_ids(ref_text)
+    ref_words = NgramCounts(ref_tokens, BLEU_ORDER)
+    ref_chars = NgramCounts(char_ids(ref_text), CHRF_ORDER)
+    results = []
+    for hypotheses in hypothesis_columns:
+        scored = [bool(hyp and ref and not hyp.startswith(ERROR_PREFIXES))
+                  for hyp, ref in zip(hypotheses, references)]
+        hyp_text = [normalize_fortran(hyp) if ok else '' for hyp, ok in zip(hypotheses, scored)]
+        hyp_tokens = token_ids(hyp_text)
+        block_scores = {
+            'bleu': bleu(NgramCounts(hyp_tokens, BLEU_ORDER), ref_words),
+            'chrf': chrf(NgramCounts(char_ids(hyp_text), CHRF_ORDER), ref_chars),
+            'edit': edit_similarity(hyp_tokens, ref_tokens),
+        }
+        results.append({metric: [round(value, 2) if ok else None for value, ok in zip(values.tolist(), scored)]
+                        for metric, values in block_scores.items()})
+    return results
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def score_csv(input_file, output_file, reference_col='Reference', columns=None, legacy_col='legacy_code',
+              workers=None):
+    """
+    Score `columns` (default: every model column) against `reference_col` and
+    write <col>_bleu, <col>_chrf and <col>_edit columns. Returns the mean of
+    each metric per column.
+    """
+    with open(input_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=';', restkey='extra_cols')
+        fieldnames = list(reader.fieldnames or [])
+        rows = list(iter_rows(reader))
+    if reference_col not in fieldnames:
+        raise ValueError(f"Reference column '{reference_col}' not found in {input_file}")
+    columns = columns or model_columns(fieldnames, (reference_col, legacy_col))
+    missing = [col for col in columns if col not in fieldnames]
+    if missing:
+        raise ValueError(f"Columns not found in {input_file}: {', '.join(missing)}")
+
+    references = [row.get(reference_col) or '' for row in rows]
+    print(f"Scoring {len(columns)} columns x {len(rows)} rows against {reference_col}")
+    workers = workers or os.cpu_count() or 1
+    # Blocks of rows, all columns at once, so each reference is prepared once
+    block_rows = max(1, min(BLOCK_ROWS, -(-len(rows) // workers)))
+    starts = range(0, len(rows), block_rows)
+    results = {col: {metric: [] for metric in METRICS} for col in columns}
+    with ProcessPoolExecutor(max_workers=min(len(starts), workers) or 1) as executor:
+        futures = [executor.submit(score_block,
+                                   [[row.get(col) or '' for row in rows[start:start + block_rows]] for col in columns],
+                                   references[start:start + block_rows])
+                   for start in starts]
+        for future in futures:
+            for col, block_scores in zip(columns, future.result()):
+                for metric in METRICS:
+                    results[col][metric].extend(block_scores[metric])
+
+    summary = {}
+    for col, scores in results.items():
+        for metric in METRICS:
+            name = f"{col}_{metric}"
+            if name not in fieldnames:
+                fieldnames.append(name)
+            for row, value in zip(rows, scores[metric]):
+                row[name] = '' if value is None else value
+        summary[col] = {'rows': sum(v is not None for v in scores['bleu']),
+                        **{metric: mean(scores[metric]) for metric in METRICS}}
+
+    with atomic_write(output_file) as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Score translated columns against a reference column.')
+    parser.add_argument('input_csv', help='Results CSV (e.g. final_experiment_results.csv)')
+    parser.add_argument('output_csv', nargs='?', default=None, help='Scored CSV (default: update input_csv)')
+    parser.add_argument('--reference-col', default='Reference', help='Reference translation column (default: Reference)')
+    parser.add_argument('--columns', nargs='+', default=None,
+                        help='Columns to score (default: every column with a <col>_score column)')
+    parser.add_argument('--legacy-col', default='legacy_code', help='Legacy code column, never scored (default: legacy_code)')
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes (default: number of CPUs)')
+    parser.add_argument('--summary', default=None, help='Also save the per-column means to this JSON file')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input_csv):
+        print(f"Error: Input file '{args.input_csv}' does not exist.")
+        exit(1)
+    try:
+        summary = score_csv(args.input_csv, args.output_csv or args.input_csv, args.reference_col,
+                            args.columns, args.legacy_col, args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    print(f"{'column':<40}{'rows':>7}{'BLEU':>8}{'chrF':>8}{'edit':>8}")
+    for col, means in summary.items():
+        print(f"{col:<40}{means['rows']:>7}" + ''.join(
+            f"{'-' if means[m] is None else means[m]:>8}" for m in METRICS))
+    if args.summary:
+        with atomic_write(args.summary) as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to {args.summary}")
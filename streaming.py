@@ -0,0 +1,61 @@
+import json
+
+
+def iter_sse_events(response):
+    """
+    Yield the decoded JSON payloads of an OpenAI-style server-sent event stream.
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return
+        yield json.loads(data)
+
+
+class JsonObjectTracker:
+    """
+    Incrementally follows streamed text until the first top-level JSON object closes.
+
+    Only string, escape and brace state is kept, so each character is looked
+    at once however the text is split across chunks. Anything before the
+    opening brace (e.g. a markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.consumed = 0
+        self.end = None
+
+    def feed(self, text):
+        """
+        Consume the next piece of text. Returns True once the object is complete;
+        `end` is then the offset just past its closing brace in the full text.
+        """
+        if self.end is not None:
+            return True
+        for offset, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.started:
+                self.in_string = True
+            elif char == '{':
+                self.started = True
+                self.depth += 1
+            elif char == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.consumed + offset + 1
+                    self.consumed += len(text)
+                    return True
+        self.consumed += len(text)
+        return False
@@ -0,0 +1,57 @@
+import os
+import socket
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# The modules live at the top of the repository, next to the scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_vllm_server import make_handler  # noqa: E402
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    A mock replica that can be killed, dropping its keep-alive connections too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = []
+
+    def get_request(self):
+        connection, address = super().get_request()
+        self.connections.append(connection)
+        return connection, address
+
+    def kill(self):
+        self.shutdown()
+        self.server_close()
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def mock_server():
+    """
+    Start an in-process mock_vllm_server replica per call, answering at once
+    by default; takes a port (default: any free one) and make_handler's
+    keyword arguments, and returns the server.
+    """
+    servers = []
+
+    def start(port=0, **kwargs):
+        server = MockServer(('127.0.0.1', port), make_handler(**{'latency': 0, 'token_rate': 0, **kwargs}))
+        server.url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.kill()
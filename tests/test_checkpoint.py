@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from checkpoint import CheckpointJournal, atomic_write
+
+
+def test_journal_resumes_matching_rows_with_their_finish_reason(tmp_path):
+    path = str(tmp_path / 'out.csv.col.journal.jsonl')
+    journal = CheckpointJournal(path, 'col', 'model')
+    journal.record(0, 'x = 1', 'x = 1', 'stop')
+    journal.record(1, 'y = 2', 'y =', 'length')
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"row": 2, "col"')  # torn by a crash
+
+    journal = CheckpointJournal(path, 'col', 'model', resume=True)
+    assert journal.lookup(0, 'x = 1') == 'x = 1'
+    assert journal.lookup(1, 'y = 2') == 'y ='
+    assert journal.finish_reason(1) == 'length'
+    assert journal.lookup(0, 'x = 2') is None
+    assert journal.lookup(2, 'z = 3') is None
+    journal.close(remove=True)
+    assert not os.path.exists(path)
+
+
+def test_journal_of_another_model_is_not_reused(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = CheckpointJournal(path, 'col', 'a')
+    journal.record(0, 'x = 1', 'x = 1')
+    journal.close()
+    assert CheckpointJournal(path, 'col', 'b', resume=True).lookup(0, 'x = 1') is None
+
+
+def test_atomic_write_keeps_the_old_file_on_error(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with atomic_write(path) as f:
+        f.write('old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write('new')
+            raise RuntimeError
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'old'
+    assert os.listdir(tmp_path) == ['out.csv']
@@ -0,0 +1,49 @@
+from chunking import split_fortran, stitch_modules
+from token_budget import estimate_tokens
+
+
+def long_routine(name, statements):
+    body = ''.join(f"      x{i} = x{i} + {i}\n" for i in range(statements))
+    return f"      subroutine {name}(x)\n      integer x\n{body}      end\n"
+
+
+def test_small_routines_are_packed_into_one_chunk():
+    code = long_routine('a', 3) + long_routine('b', 3)
+    assert split_fortran(code, 10000) == [[code]]
+
+
+def test_long_routine_is_cut_at_statement_boundaries_outside_blocks():
+    loop = "      do i = 1, n\n        y = y + i\n      end do\n"
+    code = long_routine('a', 40).replace("      end\n", loop * 5 + "      end\n")
+    groups = split_fortran(code, 80)
+    assert len(groups) == 1 and len(groups[0]) > 1
+    assert ''.join(groups[0]) == code
+    for fragment in groups[0]:
+        assert fragment.count('do i') == fragment.count('end do')
+        assert estimate_tokens(fragment) <= 80
+
+
+def test_one_routine_is_stitched_into_a_module():
+    fragments = ["subroutine borbk(lib)\n  integer, intent(in) :: lib\n  x = 1",
+                 "  x = 2\nend subroutine borbk"]
+    stitched = stitch_modules(['\n'.join(fragments)])
+    lines = stitched.splitlines()
+    assert lines[0] == 'module borbk_mod'
+    assert 'contains' in lines
+    assert lines[-1] == 'end module borbk_mod'
+    assert lines.count('subroutine borbk(lib)') == 1
+
+
+def test_modules_are_merged_with_shared_uses():
+    first = "module a_mod\n  use str_mod\n  implicit none\ncontains\nsubroutine a()\nend subroutine a\nend module a_mod"
+    second = "module b_mod\n  use str_mod\n  use book_mod\ncontains\nsubroutine b()\nend subroutine b\nend module b_mod"
+    stitched = stitch_modules([first, second]).splitlines()
+    assert stitched[:4] == ['module a_mod', '  use str_mod', '  use book_mod', '  implicit none']
+    assert stitched.count('contains') == 1
+    assert 'subroutine a()' in stitched and 'subroutine b()' in stitched
+    assert stitched[-1] == 'end module a_mod'
+
+
+def test_a_single_module_keeps_its_layout():
+    module = "module a_mod\n  use str_mod\n  implicit none\ncontains\nsubroutine a()\nend subroutine a\nend module a_mod"
+    assert stitch_modules([module]) == module
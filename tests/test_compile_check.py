@@ -0,0 +1,37 @@
+import shutil
+
+import pytest
+
+from compile_check import check_fortran
+
+
+pytestmark = pytest.mark.skipif(shutil.which('gfortran') is None, reason='gfortran not installed')
+
+
+def test_fragment_is_not_failed_for_declarations_it_cannot_see():
+    fragment = """do jr = ir, ubbcnt - 1
+  ur % ubb(jr) = ur % ubb(jr + 1)
+end do
+bk => book_mypnt(lib, lb % bref(ibk))
+ubbcnt = size(ur % ubb, 1)"""
+    assert check_fortran(fragment) == 'pass:0'
+
+
+def test_fragment_syntax_errors_still_fail():
+    assert check_fortran("ur % ubb(1) = 0\nend do") == 'fail:1'
+
+
+def test_complete_units_count_every_diagnostic():
+    unit = "module m\ncontains\nsubroutine s\nx = y % z\nend subroutine s\nend module m\n"
+    assert check_fortran(unit) == 'fail:1'
+
+
+def test_stub_modules_resolve_use_statements():
+    assert check_fortran("subroutine s\nuse book_mod\nend subroutine s\n") == 'pass:0'
+
+
+def test_timeout_is_an_error_not_a_failure(tmp_path):
+    compiler = tmp_path / 'slow_compiler'
+    compiler.write_text('#!/bin/sh\nsleep 5\n')
+    compiler.chmod(0o755)
+    assert check_fortran("x = 1", compiler=str(compiler), timeout=0.2) == 'error:timeout'
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+import requests
+
+from concurrency_limiter import AIMDLimiter
+from vllm_client import VLLMClient
+
+
+def complete(limiter, latency=1.0, failed=False):
+    limiter.release(limiter.acquire(), latency, failed=failed)
+
+
+def test_slow_start_then_additive_increase():
+    limiter = AIMDLimiter(maximum=20, initial=2)
+    complete(limiter)
+    complete(limiter)
+    assert limiter.limit == 4
+    complete(limiter, failed=True)
+    assert limiter.limit == pytest.approx(2.8)
+    complete(limiter)
+    assert limiter.limit == pytest.approx(2.8 + 1 / 2.8)
+
+
+def test_limit_stays_between_floor_and_ceiling():
+    limiter = AIMDLimiter(maximum=6, minimum=2, initial=4)
+    for _ in range(20):
+        complete(limiter)
+    assert limiter.limit == 6
+    for _ in range(20):
+        complete(limiter, failed=True)
+    assert limiter.limit == 2
+    assert limiter.snapshot() == {'concurrency_limit': 2, 'in_flight': 0, 'limit_min': 2, 'limit_max': 6,
+                                  'limit_decreases': 20}
+
+
+def test_requests_in_flight_at_a_decrease_do_not_lower_it_again():
+    limiter = AIMDLimiter(maximum=10, initial=10)
+    tickets = [limiter.acquire() for _ in range(3)]
+    for ticket in tickets:
+        limiter.release(ticket, failed=True)
+    assert limiter.limit == 7
+    complete(limiter, failed=True)
+    assert limiter.limit == pytest.approx(4.9)
+
+
+def test_latency_far_above_baseline_lowers_the_limit():
+    limiter = AIMDLimiter(maximum=10, initial=8, smoothing=1.0)
+    complete(limiter, latency=1.0)
+    complete(limiter, latency=3.0)
+    assert limiter.limit == pytest.approx(9 * 0.7)
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ReadTimeout('slow'), 429, 503])
+def test_timeouts_and_overload_answers_count_as_failures(error):
+    limiter = AIMDLimiter(maximum=10, initial=10)
+    client = VLLMClient(api_url='http://127.0.0.1:9/v1/chat/completions', limiter=limiter)
+
+    def post(url, **kwargs):
+        if isinstance(error, Exception):
+            raise error
+        response = requests.Response()
+        response.status_code = error
+        return response
+
+    client.session.post = post
+    with client, pytest.raises(requests.exceptions.RequestException):
+        client.chat({})
+    assert limiter.limit == 7
+
+
+def start_waiter(limiter):
+    acquired = threading.Event()
+
+    def wait():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=wait, daemon=True).start()
+    return acquired
+
+
+def test_waiters_are_released_when_the_limit_grows():
+    limiter = AIMDLimiter(maximum=4, initial=2)
+    held = [limiter.acquire(), limiter.acquire()]
+    waiters = [start_waiter(limiter), start_waiter(limiter)]
+    assert not any(acquired.wait(0.1) for acquired in waiters)
+    # One request finishing frees its slot, and the limit growing to 3 frees another
+    limiter.release(held[0], 1.0)
+    assert all(acquired.wait(1) for acquired in waiters)
+    assert limiter.in_flight == 3
+
+
+def test_waiters_are_released_when_the_limit_shrinks():
+    limiter = AIMDLimiter(maximum=4, initial=2, minimum=1)
+    held = [limiter.acquire(), limiter.acquire()]
+    acquired = start_waiter(limiter)
+    limiter.release(held[0], failed=True)
+    # The limit fell to 1 and one request is still in flight, so the waiter stays blocked
+    assert not acquired.wait(0.1)
+    limiter.release(held[1], 1.0)
+    assert acquired.wait(1)
@@ -0,0 +1,40 @@
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from csv_pipeline import count_rows, in_order, iter_rows
+
+
+def test_results_follow_input_order_when_workers_finish_out_of_order():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # Later items finish first; every third needs no work at all
+        tasks = ((i, None if i % 3 == 0 else executor.submit(time.sleep, (20 - i) / 1000)) for i in range(20))
+        assert [item for item, _ in in_order(tasks, 8)] == list(range(20))
+
+
+def test_look_ahead_never_passes_the_bound():
+    consumed = []
+    ahead = []
+
+    def tasks(executor):
+        for i in range(50):
+            # Items read from the input but not yet handed back
+            ahead.append(i - len(consumed))
+            # The first item is slow, so the reader runs ahead until it hits the bound
+            yield i, executor.submit(time.sleep, 0.05 if i == 0 else 0.002 * (i % 5))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for item, _ in in_order(tasks(executor), 6):
+            consumed.append(item)
+    assert consumed == list(range(50))
+    assert max(ahead) == 6
+
+
+def test_rows_lose_overflow_cells_and_count_quoted_newlines(tmp_path):
+    text = 'a;b\n1;"x\ny"\n2;3;4;5\n'
+    path = tmp_path / 'input.csv'
+    path.write_text(text, encoding='utf-8')
+    rows = list(iter_rows(csv.DictReader(io.StringIO(text), delimiter=';', restkey='extra_cols')))
+    assert rows == [{'a': '1', 'b': 'x\ny'}, {'a': '2', 'b': '3'}]
+    assert count_rows(path) == 2
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+from dedup import canonicalize, find_duplicates
+
+
+SNIPPET = """c adjust the array of borrowed books
+      do jr = ir, ubbcnt - 1
+        ur.ubb(jr) = ur.ubb(jr + 1)
+      end do
+      write(*,*) 'Done  now'"""
+
+
+def test_case_whitespace_and_comment_markers_are_canonical():
+    variant = """C adjust   the array of borrowed books
+      DO JR=IR,UBBCNT-1
+         UR.UBB(JR) = UR.UBB(JR+1)
+
+      END DO
+      WRITE(*,*) 'Done  now'"""
+    assert canonicalize(variant) == canonicalize(SNIPPET)
+
+
+def test_comment_text_and_string_literals_are_kept():
+    assert canonicalize(SNIPPET) != canonicalize(SNIPPET.replace('borrowed', 'returned'))
+    assert canonicalize(SNIPPET) != canonicalize(SNIPPET.replace("'Done  now'", "'DONE now'"))
+    assert canonicalize("      x = 1 ! Keep This") == "x=1!Keep This"
+
+
+def test_exact_duplicates_share_the_first_row():
+    duplicate_of, near = find_duplicates([SNIPPET, '', SNIPPET.upper().replace("'DONE  NOW'", "'Done  now'"),
+                                          SNIPPET])
+    assert duplicate_of == {3: 0}
+    assert near == {}
+
+
+def test_near_duplicates_are_reported_separately():
+    snippets = [SNIPPET, SNIPPET + '\n      n = n + 1', SNIPPET + '\n      n = n + 1', 'x = 1']
+    duplicate_of, near = find_duplicates(snippets, near_threshold=0.5)
+    assert duplicate_of == {1: 0, 2: 0}
+    # Row 2 is an exact copy of row 1, the first row of its canonical form
+    assert near == {1: 1, 2: 1}
+
+
+def test_near_duplicate_groups_do_not_depend_on_the_hash_seed():
+    code = ("from dedup import find_duplicates\n"
+            "base = ['      x%d = a(%d) + b' % (i, i) + '\\n      y = x' * (i % 5) for i in range(200)]\n"
+            "print(sorted(find_duplicates(base, near_threshold=0.5)[0].items()))\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        outputs.add(subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                                   capture_output=True, text=True, check=True).stdout)
+    assert len(outputs) == 1
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from endpoints import EndpointPool
+from vllm_client import VLLMClient
+
+
+def test_requests_go_to_the_replica_with_fewest_in_flight():
+    pool = EndpointPool([f"http://127.0.0.1:{port}/v1/chat/completions" for port in (1, 2, 3)],
+                        health_interval=0)
+    held = [pool.acquire() for _ in range(3)]
+    assert len({e.url for e in held}) == 3
+    pool.release(held[1])
+    assert pool.acquire() is held[1]
+    pool.close()
+
+
+def test_failed_replica_leaves_rotation_and_comes_back(mock_server):
+    servers = [mock_server() for _ in range(3)]
+    payload = {'model': 'm', 'messages': [{'role': 'user', 'content': 'Legacy Code:\nx = 1'}]}
+    with VLLMClient(api_url=[s.url for s in servers], health_interval=0) as client:
+        for _ in range(6):
+            client.chat(payload)
+        assert [e.served for e in client.endpoints.endpoints] == [2, 2, 2]
+
+        port = servers[0].server_port
+        servers[0].kill()
+        failures = 0
+        for _ in range(6):
+            try:
+                client.chat(payload)
+            except requests.exceptions.ConnectionError:
+                failures += 1
+        dead = client.endpoints.endpoints[0]
+        assert failures == 1
+        assert not dead.healthy and dead.served == 3
+
+        client.endpoints.check_health()
+        assert not dead.healthy
+        mock_server(port=port)
+        client.endpoints.check_health()
+        assert dead.healthy
+        for _ in range(3):
+            client.chat(payload)
+        assert dead.served == 4
+
+
+def test_health_checks_do_not_wait_for_a_saturated_replica(mock_server):
+    slow, fast = mock_server(latency=1.0), mock_server()
+    with VLLMClient(api_url=[slow.url, fast.url], pool_size=1, health_interval=0) as client:
+        busy = threading.Thread(target=client.session.post, args=(slow.url,),
+                                kwargs={'json': {'messages': []}})
+        busy.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        client.endpoints.check_health()
+        assert time.perf_counter() - started < 0.5
+        assert all(e.healthy for e in client.endpoints.endpoints)
+        busy.join()
+
+
+@pytest.mark.parametrize('urls', ['', ' , '])
+def test_at_least_one_endpoint_is_required(urls):
+    with pytest.raises(ValueError):
+        EndpointPool(urls, health_interval=0)
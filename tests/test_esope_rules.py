@@ -0,0 +1,62 @@
+import pytest
+
+from esope_rules import pretranslate
+from rule_checker import check_translation
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('      segact, bk', '      ! [ooo].obsolete: segact,bk'),
+    ('      segdes, bk*NOMOD', '      ! [ooo].obsolete: segdes,bk'),
+    ('      segact, lb, bk', '      ! [ooo].obsolete: segact,lb,bk'),
+    ('      segdes, lb*MOD, bk*NOMOD', '      ! [ooo].obsolete: segdes,lb,bk'),
+])
+def test_segment_macros_are_commented_out(line, expected):
+    translated, fired, complete = pretranslate(line)
+    assert translated == expected
+    assert fired['obsolete-macro'] == 1
+    assert complete
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('      x = lb.bref', '      x = lb % bref'),
+    ('      x = lb.bref.len', '      x = lb % bref % len'),
+    ('      n = lb.bref.x(/1)', '      n = size(lb % bref % x, 1)'),
+    ('      if (lb.bref.eq.0) x = 1', '      if (lb % bref == 0) x = 1'),
+])
+def test_dot_access_is_rewritten(line, expected):
+    translated, fired, complete = pretranslate(line)
+    assert translated == expected
+    assert fired['dot-access'] == 1
+    assert complete
+
+
+def test_dotted_operators_and_real_literals_are_not_component_access():
+    translated, fired, complete = pretranslate('      if (a.and.b) x = 1.5e3 .or. .true.')
+    assert translated == '      if (a.and.b) x = 1.5e3 .or. .true.'
+    assert not fired
+    assert complete
+
+
+@pytest.mark.parametrize('line', [
+    '      n = ur.ubb(jr).len',
+    '      segact, lb(1)',
+    '      if (found) segdes, bk',
+    '      bk = mypnt(lib, ibk)',
+    '      pointeur bk',
+    '      segini, bk',
+])
+def test_untranslated_esope_needs_the_model(line):
+    assert not pretranslate(line)[2]
+
+
+def test_complete_snippet_passes_the_rule_checker():
+    code = '\n'.join([
+        'c copy the book title',
+        '      segact, lb, bk',
+        '      title = lb.bref.title',
+        '      if (n .ne. 0) n = n - 1',
+        '      segdes, lb*MOD, bk*NOMOD',
+    ])
+    translated, _, complete = pretranslate(code)
+    assert complete
+    assert check_translation(translated) == []
@@ -0,0 +1,37 @@
+import pytest
+
+import json_extract
+from json_extract import extract_translated_code
+
+
+@pytest.mark.parametrize('response, code, method', [
+    ('{"translated_code": "x = 1"}', 'x = 1', 'json'),
+    ('  {"translated_code": "a\\nb"}\n', 'a\nb', 'json'),
+    ('{"translated_code": "a", "note": "b"}', 'a', 'json'),
+    ('{"note": "b", "translated_code": "a"}', 'a', 'json'),
+    ('{"translated_code": "a\nb"}', 'a\nb', 'json'),
+    ('```json\n{"translated_code": "a"}\n```', 'a', 'fenced-json'),
+    ('Here it is: {"translated_code": "a"} Hope this helps.', 'a', 'embedded-json'),
+    ('{"translated_code": "print *, "hi""}', 'print *, "hi"', 'repaired-json'),
+    ('{"translated_code": "a", "note": b}', 'a', 'repaired-json'),
+    ('{"translated_code": "x = 1\\ny = ', 'x = 1\ny =', 'unterminated-json'),
+    ('```fortran\nx = 1\n```', 'x = 1', 'code-block'),
+    ('x = 1', 'x = 1', 'raw'),
+])
+def test_recovery_paths(response, code, method):
+    assert extract_translated_code(response) == (code, method)
+
+
+def test_well_formed_responses_skip_the_scanner(monkeypatch):
+    def scanner(text):
+        raise AssertionError('scanner used for valid JSON')
+
+    monkeypatch.setattr(json_extract, '_find_value', scanner)
+    assert extract_translated_code('{"translated_code": "x = 1", "note": "ok"}') == ('x = 1', 'json')
+
+
+def test_scan_is_linear_on_brace_heavy_output():
+    response = '{"translated_code": "' + 'a(1) = {b} ' * 20000
+    code, method = extract_translated_code(response)
+    assert method == 'unterminated-json'
+    assert code.startswith('a(1) = {b}')
@@ -0,0 +1,97 @@
+import re
+
+import requests
+
+from concurrency_limiter import AIMDLimiter
+from metrics_exporter import CONTENT_TYPE, MetricsServer, PipelineMetrics, TextfileExporter
+from resilience import CircuitBreaker, RetryBudget
+from vllm_client import VLLMClient
+
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)",?')
+MODEL = 'org/model "v2"\\beta\nnew'
+
+
+def record(latency=0.3, **fields):
+    return {'latency_s': latency, 'ttft_s': None, 'prompt_tokens': 100, 'completion_tokens': 40,
+            'cached_tokens': 10, 'retries': 1, 'continuations': 0, 'cache_hit': False, **fields}
+
+
+def parse(text):
+    """
+    {(sample name, labels): value}, checking that every sample follows the HELP and TYPE of its family.
+    """
+    samples, types, family = {}, {}, None
+    lines = text.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith('# HELP '):
+            family = line.split()[2]
+            assert lines[index + 1].startswith(f'# TYPE {family} ')
+            types[family] = lines[index + 1].split()[3]
+            continue
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE_RE.match(line).groups()
+        suffixes = ('_bucket', '_sum', '_count') if types[family] == 'histogram' else ('',)
+        assert any(name == family + suffix for suffix in suffixes), (family, name)
+        pairs = LABEL_RE.findall(labels or '')
+        assert ''.join(f'{k}="{v}",' for k, v in pairs).rstrip(',') == (labels or '')
+        samples[(name, tuple(pairs))] = float(value)
+    return samples, types
+
+
+def test_families_have_help_and_type_and_labels_are_escaped():
+    metrics = PipelineMetrics()
+    metrics.set_input_rows(MODEL, 'output_a', 3)
+    metrics.observe_row(MODEL, 'output_a', record(), 'ok')
+    text = metrics.render()
+    samples, types = parse(text)
+    assert types['fortran_translation_rows_total'] == 'counter'
+    assert types['fortran_translation_row_latency_seconds'] == 'histogram'
+    escaped = 'org/model \\"v2\\"\\\\beta\\nnew'
+    assert samples[('fortran_translation_rows_total',
+                    (('model', escaped), ('column', 'output_a'), ('status', 'ok')))] == 1
+    assert '\nnew' not in text
+
+
+def test_counters_only_grow_and_buckets_are_cumulative():
+    limiter, budget = AIMDLimiter(8), RetryBudget()
+    client = VLLMClient(api_url='http://127.0.0.1:9/v1/chat/completions', limiter=limiter,
+                        breaker=CircuitBreaker())
+    metrics = PipelineMetrics(client, budget)
+    before, types = parse(metrics.render())
+    for latency, status in ((0.07, 'ok'), (3.0, 'error'), (700.0, 'ok')):
+        metrics.observe_row('m', 'output_a', record(latency), status)
+        budget.record_request()
+        budget.allow_retry()
+        metrics.observe_row('m', 'output_a', record(cache_hit=True), 'copied')
+        after, types = parse(metrics.render())
+        for key, value in after.items():
+            if types.get(key[0]) == 'counter':
+                assert value >= before.get(key, 0), key
+        before = after
+    client.close()
+
+    labels = (('model', 'm'), ('column', 'output_a'))
+    buckets = [value for (name, sample_labels), value in after.items()
+               if name == 'fortran_translation_row_latency_seconds_bucket' and sample_labels[:2] == labels]
+    assert buckets == sorted(buckets) and buckets[-1] == 3
+    assert after[('fortran_translation_row_latency_seconds_count', labels)] == 3
+    assert after[('fortran_translation_tokens_total', labels + (('kind', 'completion'),))] == 120
+    assert after[('fortran_translation_rows_total', labels + (('status', 'copied'),))] == 3
+    assert after[('fortran_translation_concurrency_limit', ())] == 4
+
+
+def test_server_and_textfile_expose_the_same_text(tmp_path):
+    metrics = PipelineMetrics()
+    metrics.observe_row('m', 'output_a', record(), 'ok')
+    server = MetricsServer(metrics, 0)
+    try:
+        response = requests.get(f"http://127.0.0.1:{server.server.server_port}/metrics", timeout=5)
+    finally:
+        server.close()
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    exporter = TextfileExporter(metrics, str(tmp_path / 'pipeline.prom'), interval=60)
+    exporter.close()
+    assert response.text == (tmp_path / 'pipeline.prom').read_text(encoding='utf-8') == metrics.render()
@@ -0,0 +1,60 @@
+import argparse
+import csv
+import socket
+
+import pytest
+
+from orchestrator import FakeBackend, Sweep, column_name, translate_with_library
+
+
+MODELS = ['org/model-a', 'org/model-b', 'org/model-c']
+
+
+def free_port_pair():
+    """
+    A port whose successor is free too, as Sweep alternates between two.
+    """
+    for _ in range(20):
+        with socket.socket() as first:
+            first.bind(('127.0.0.1', 0))
+            port = first.getsockname()[1]
+            with socket.socket() as second:
+                try:
+                    second.bind(('127.0.0.1', port + 1))
+                except OSError:
+                    continue
+                return port
+    pytest.skip('no two consecutive free ports')
+
+
+@pytest.mark.parametrize('gpus, overlapped, prefetched', [
+    (8, [False, True, True], [False, False, False]),
+    (4, [False, False, False], [False, True, True]),
+])
+def test_fake_sweep_fills_one_column_per_model(tmp_path, gpus, overlapped, prefetched):
+    path = tmp_path / 'results.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code'])
+        writer.writerows([['      X = 1'], ['      CALL F(A)'], ['']])
+    args = argparse.Namespace(concurrency=2, cache=None, temperature=0.0, max_tokens=256, resume=False,
+                              adaptive_max_tokens=False, ratio_store=None, load_timeout=30,
+                              metrics_file=str(tmp_path / 'rows.jsonl'), dedup=False, near_dup_threshold=None)
+    backend = FakeBackend(load_seconds=0.2, warm_load_seconds=0.1, prefetch_seconds=0.05, latency=0)
+    sweep = Sweep(backend, MODELS, gpus, 4, 2048, load_timeout=30, health_poll_seconds=0.02,
+                  base_port=free_port_pair())
+
+    report = sweep.run(translate_with_library(str(path), args))
+
+    assert [entry['model'] for entry in report] == MODELS
+    assert [entry['status'] for entry in report] == ['ok'] * 3
+    assert [entry['overlapped'] for entry in report] == overlapped
+    assert [entry['prefetched'] for entry in report] == prefetched
+    assert all(entry['load_seconds'] >= 0.1 and entry['throughput']['rows'] == 2 for entry in report)
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        rows = list(reader)
+    columns = [column_name(model) for model in MODELS]
+    assert reader.fieldnames == ['legacy_code'] + [c for col in columns for c in (col, f"{col}_score")]
+    for col in columns:
+        assert [row[col].startswith('! mock translation') for row in rows] == [True, True, False]
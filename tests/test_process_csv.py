@@ -0,0 +1,26 @@
+import csv
+
+import translate_fortran_json_response as translator
+from translation_cache import TranslationCache
+from vllm_client import VLLMClient
+
+
+def write_csv(path, snippets):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code'])
+        writer.writerows([snippet] for snippet in snippets)
+
+
+def test_rerunning_a_cached_row_sends_a_new_request(tmp_path, mock_server):
+    path = tmp_path / 'results.csv'
+    write_csv(path, ['x = 1', 'y = 2'])
+    with VLLMClient(api_url=mock_server().url) as client, \
+            TranslationCache(str(tmp_path / 'cache.sqlite')) as cache:
+        translator.process_csv(path, path, settings=translator.TranslationSettings(model='m'),
+                               client=client, cache=cache)
+        assert client.usage['requests'] == 2
+        translator.process_csv(path, path, settings=translator.TranslationSettings(model='m', only_rows={1}),
+                               client=client, cache=cache)
+        assert client.usage['requests'] == 3
+        assert cache.stats()['hits'] == 0
@@ -0,0 +1,30 @@
+from provenance import ProvenanceIndex
+
+
+def test_rerun_reasons(tmp_path):
+    index = ProvenanceIndex(str(tmp_path / 'out.csv.col.provenance.json'), 'col')
+    index.record(0, 'x = 1', 'x = 1', 'model', 'stop')
+    index.record(1, 'y = 2', 'y =', 'model', 'length')
+    index.record(2, 'z = 3', 'z = 3', 'model', 'stop', copied_from=0, near_duplicate=True)
+    index.record(3, 'x = 1', 'x = 1', 'model', 'stop', copied_from=0)
+    index.save()
+
+    index = ProvenanceIndex(index.path, 'col')
+    assert index.rerun_reason(0, 'x = 1', 'x = 1') is None
+    assert index.rerun_reason(0, 'x = 2', 'x = 1') == 'stale'
+    assert index.rerun_reason(1, 'y = 2', 'y =') == 'truncated'
+    assert index.rerun_reason(2, 'z = 3', 'z = 3') == 'near-duplicate'
+    assert index.rerun_reason(3, 'x = 1', 'x = 1') is None
+    assert index.rows[3]['copied_from'] == 0
+    # Cells edited by hand are kept
+    assert index.rerun_reason(1, 'y = 2', 'y = 2') is None
+    assert index.rerun_reason(2, 'z = 3', 'z = 4') is None
+    assert index.rerun_reason(4, 'w = 1', '') == 'empty'
+    assert index.rerun_reason(4, 'w = 1', 'Error translating: boom') == 'error'
+
+
+def test_index_of_another_column_is_ignored(tmp_path):
+    index = ProvenanceIndex(str(tmp_path / 'index.json'), 'a')
+    index.record(0, 'x = 1', 'x = 1', 'model')
+    index.save()
+    assert ProvenanceIndex(index.path, 'b').rows == {}
@@ -0,0 +1,89 @@
+import pytest
+import requests
+
+import translate_fortran_json_response as translator
+from resilience import CircuitBreaker, RetryBudget, is_retryable
+from vllm_client import VLLMClient
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (requests.exceptions.ConnectionError('refused'), True),
+    (requests.exceptions.ReadTimeout('slow'), True),
+    (http_error(429), True),
+    (http_error(503), True),
+    (http_error(400), False),
+    (http_error(404), False),
+])
+def test_only_transient_errors_are_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+class FailingClient:
+    """
+    Answers every chat request with the same HTTP error.
+    """
+
+    limiter = None
+
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def chat(self, payload):
+        self.calls += 1
+        raise http_error(self.status)
+
+
+def test_client_errors_fail_at_once_without_retries():
+    client, budget = FailingClient(400), RetryBudget()
+    result = translator.translate_code('x = 1', client=client, delay=0, retry_budget=budget)
+    assert client.calls == 1
+    assert budget.retries == 0
+    assert translator.is_translation_error(result)
+    assert not translator.is_retryable_error(result)
+
+
+def test_server_errors_are_retried_then_marked_retryable():
+    client, budget = FailingClient(503), RetryBudget()
+    result = translator.translate_code('x = 1', client=client, delay=0, max_retries=3, retry_budget=budget)
+    assert client.calls == 3
+    assert budget.retries == 2
+    assert translator.is_retryable_error(result)
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.0, min_retries=2)
+    assert [budget.allow_retry() for _ in range(3)] == [True, True, False]
+    assert budget.denied == 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60, max_pause=0)
+    breaker.record(False)
+    assert breaker.state == 'closed'
+    breaker.record(False)
+    assert breaker.state == 'open'
+    with pytest.raises(requests.exceptions.RequestException):
+        breaker.before_request()
+
+
+@pytest.mark.parametrize('status, counted', [(400, False), (429, True), (500, True)])
+def test_breaker_only_counts_server_side_failures(status, counted):
+    breaker = CircuitBreaker(failure_threshold=1, max_pause=0)
+    client = VLLMClient(api_url='http://127.0.0.1:9/v1/chat/completions', breaker=breaker)
+
+    def post(url, **kwargs):
+        response = requests.Response()
+        response.status_code = status
+        return response
+
+    client.session.post = post
+    with client, pytest.raises(requests.exceptions.HTTPError):
+        client.chat({})
+    assert (breaker.state == 'open') is counted
@@ -0,0 +1,59 @@
+import csv
+import json
+
+import translate_fortran_json_response as translator
+from row_metrics import RunSummary, percentile, row_record
+from vllm_client import VLLMClient
+
+
+SNIPPETS = ['x = 1', 'y = 2', '', 'x = 1', 'z = 3', 'w = 4', 'v = 5', 'y = 2', 'u = 6']
+TRANSLATED = [0, 1, 4, 5, 6, 8]
+
+
+def test_sidecar_has_one_record_per_translated_row(tmp_path, mock_server):
+    path, sidecar = tmp_path / 'results.csv', tmp_path / 'metrics.jsonl'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code'])
+        writer.writerows([snippet] for snippet in SNIPPETS)
+    settings = translator.TranslationSettings(model='m', concurrency=4, dedup=True, metrics_file=str(sidecar),
+                                              metrics_columns=True)
+    with VLLMClient(api_url=mock_server(latency=0.02).url) as client:
+        summary = translator.process_csv(path, path, translated_col='output_a', settings=settings, client=client)
+        assert client.usage['requests'] == len(TRANSLATED)
+
+    records = [json.loads(line) for line in sidecar.read_text(encoding='utf-8').splitlines()]
+    assert [r['row'] for r in records] == TRANSLATED
+    assert {(r['model'], r['column']) for r in records} == {('m', 'output_a')}
+    assert summary['rows'] == len(TRANSLATED)
+    assert summary['completion_tokens'] == sum(r['completion_tokens'] for r in records) > 0
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f, delimiter=';'))
+    for r in records:
+        assert rows[r['row']]['output_a_completion_tokens'] == str(r['completion_tokens'])
+        assert rows[r['row']]['output_a_finish_reason'] == r['finish_reason'] == 'stop'
+
+
+def test_row_record_defaults_and_rounding():
+    record = row_record({'ttft': 0.12345, 'completion_tokens': 7}, 1.23456)
+    assert record['latency_s'] == 1.235 and record['ttft_s'] == 0.123
+    assert record['completion_tokens'] == 7 and record['prompt_tokens'] == 0
+    assert record['finish_reason'] is None and record['cache_hit'] is False
+    assert row_record({}, 0)['ttft_s'] is None
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([5], 95) == 5
+    values = list(range(100, 0, -1))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 100)) == (50, 95, 100)
+
+
+def test_summary_leaves_cache_hits_out_of_latency():
+    summary = RunSummary('m')
+    summary.add(row_record({'completion_tokens': 10}, 2.0))
+    summary.add(row_record({'completion_tokens': 4, 'cache_hit': True}, 0.001))
+    result = summary.summary(4.0)
+    assert (result['rows'], result['rows_per_s'], result['completion_tokens_per_s']) == (2, 0.5, 3.5)
+    assert result['latency_p50_s'] == result['latency_p95_s'] == 2.0
+    assert 'latency p50 2.0 s' in RunSummary.format(result)
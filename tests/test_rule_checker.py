@@ -0,0 +1,88 @@
+import csv
+
+import pytest
+
+from rule_checker import check_csv, check_translation
+
+
+GOOD = """module book_mod
+  implicit none
+contains
+  subroutine addbk(lib, ibk, title)
+    type(library), pointer, intent(inout) :: lib
+    integer, intent(in) :: ibk
+    character(len=*), intent(in) :: title
+    type(book), pointer :: bk
+    ! [ooo].obsolete: segact,lib
+    bk => book_mypnt(lib, lib % bref(ibk))
+    if (size(lib % bref, 1) == 0) call segadj(lib, ibk)
+    write(*,*) 'x.eq.y ! not code', title
+  end subroutine addbk
+end module book_mod"""
+
+
+def rules(code):
+    return sorted({rule for rule, _, _ in check_translation(code)})
+
+
+def test_clean_translation_has_no_violations():
+    assert check_translation(GOOD) == []
+
+
+@pytest.mark.parametrize('line, rule', [
+    ('segact, lib', 'obsolete-macro'),
+    ('call oooeta(lib, n)', 'obsolete-macro'),
+    ('segadj, lib', 'segment-macro'),
+    ('call segini(lib)', 'segment-dims'),
+    ('bk = mypnt(lib, 1)', 'mypnt'),
+    ('bk = book_mypnt(lib, 1)', 'mypnt'),
+    ('pointeur lib', 'pointeur'),
+    ('x = lib.bref', 'dot-access'),
+    ('n = lib % bref(/1)', 'slash-size'),
+    ('if (n.eq.0) return', 'relational-operator'),
+    ('#include "lib.inc"', 'include'),
+    ('external fndur', 'external'),
+])
+def test_each_statement_rule_fires(line, rule):
+    code = GOOD.replace("    write(*,*) 'x.eq.y ! not code', title", '    ' + line)
+    assert rules(code) == [rule]
+
+
+def test_violations_report_the_line_of_the_statement():
+    code = "subroutine s\nimplicit none\nx = &\n  lib.bref\nend subroutine s"
+    assert check_translation(code) == [('dot-access', 3, 'x =  lib.bref')]
+
+
+def test_fixed_form_comments_but_not_assignments_to_c():
+    assert rules("c old comment\nc = 1") == ['comment']
+
+
+def test_units_need_implicit_none_and_argument_intents():
+    code = "subroutine s(a, b)\ninteger, intent(in) :: a\nend subroutine s"
+    assert check_translation(code) == [('implicit-none', 1, 'subroutine s'), ('intent', 1, 's: b')]
+
+
+def test_procedures_inherit_implicit_none_and_truncated_units_are_checked():
+    code = "module m\nimplicit none\ncontains\nsubroutine s(a)\nintent(in) a\nend subroutine s\nsubroutine t(b)"
+    assert check_translation(code) == [('intent', 7, 't: b')]
+
+
+def test_check_csv_skips_errors_and_writes_rule_columns(tmp_path):
+    path = tmp_path / 'results.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code', 'output_a', 'output_a_score'])
+        writer.writerow(['segact, lib', GOOD, ''])
+        writer.writerow(['segact, lib', 'segact, lib', ''])
+        writer.writerow(['segact, lib', 'Error translating: timeout', ''])
+    failing = check_csv(path, output_file=tmp_path / 'checked.csv')
+    assert failing == {'output_a': {2: ['obsolete-macro']}}
+    with open(tmp_path / 'checked.csv', newline='', encoding='utf-8') as f:
+        assert [row['output_a_rules'] for row in csv.DictReader(f, delimiter=';')] == ['', 'obsolete-macro', '']
+
+
+def test_check_csv_rejects_unknown_columns(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('legacy_code;output_a\nx;y\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='output_b'):
+        check_csv(path, columns=['output_b'])
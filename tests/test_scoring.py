@@ -0,0 +1,123 @@
+import csv
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from scoring import (TOKEN_RE, NgramCounts, bleu, char_ids, chrf, edit_distances, normalize_fortran,
+                     score_block, score_csv, token_ids)
+
+
+def ngrams(seq, n):
+    return Counter(tuple(seq[k:k + n]) for k in range(len(seq) - n + 1))
+
+
+def naive_bleu(hyp, ref):
+    if not hyp:
+        return 0.0
+    log_precision = 0.0
+    for n in range(1, 5):
+        hyp_grams, ref_grams = ngrams(hyp, n), ngrams(ref, n)
+        matches = sum(min(count, ref_grams[gram]) for gram, count in hyp_grams.items())
+        total = sum(hyp_grams.values())
+        smoothing = 0 if n == 1 else 1
+        if matches + smoothing == 0:
+            return 0.0
+        log_precision += math.log((matches + smoothing) / (total + smoothing)) / 4
+    brevity = 0.0 if len(hyp) >= len(ref) else 1 - len(ref) / len(hyp)
+    return 100 * math.exp(log_precision + brevity)
+
+
+def naive_chrf(hyp, ref):
+    hyp, ref = hyp.replace(' ', ''), ref.replace(' ', '')
+    precision = recall = orders = 0
+    for n in range(1, 7):
+        hyp_grams, ref_grams = ngrams(hyp, n), ngrams(ref, n)
+        if not hyp_grams or not ref_grams:
+            continue
+        matches = sum(min(count, ref_grams[gram]) for gram, count in hyp_grams.items())
+        precision += matches / sum(hyp_grams.values())
+        recall += matches / sum(ref_grams.values())
+        orders += 1
+    if not orders or not precision + recall:
+        return 0.0
+    precision, recall = precision / orders, recall / orders
+    return 100 * 5 * precision * recall / (4 * precision + recall)
+
+
+def naive_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, y in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (x != y))
+    return row[-1]
+
+
+def batch(seqs):
+    return (np.concatenate([np.asarray(s, dtype=np.uint64) for s in seqs] or [np.zeros(0, dtype=np.uint64)]),
+            np.array([len(s) for s in seqs], dtype=np.int64))
+
+
+def random_code(rng, lines):
+    words = ['x', 'y', 'call', 'foo', '(', ')', '=', '+', '1', 'do', 'end', "'ab c'", 'i']
+    return '\n'.join(' '.join(rng.choice(words) for _ in range(rng.randrange(1, 8))) for _ in range(lines))
+
+
+def test_normalize_strips_comments_outside_strings():
+    assert normalize_fortran("  X = 'a ! b'  ! Comment\n  Y = 1") == "x = 'a ! b' y = 1"
+
+
+def test_token_ids_match_equal_tokens_only():
+    flat, lengths = token_ids(['x = x + 10', '', 'x=10'])
+    assert lengths.tolist() == [5, 0, 3]
+    assert flat[0] == flat[2] == flat[5]
+    assert flat[4] == flat[7] and flat[1] == flat[6]
+    assert len(set(flat[:5].tolist())) == 4
+
+
+def test_bleu_and_chrf_match_a_row_by_row_implementation():
+    rng = random.Random(0)
+    refs = [normalize_fortran(random_code(rng, rng.randrange(0, 6))) for _ in range(60)]
+    hyps = [normalize_fortran(random_code(rng, rng.randrange(0, 6))) if k % 3 else ref
+            for k, ref in enumerate(refs)]
+    hyp_tokens, ref_tokens = token_ids(hyps), token_ids(refs)
+    bleu_scores = bleu(NgramCounts(hyp_tokens, 4), NgramCounts(ref_tokens, 4))
+    chrf_scores = chrf(NgramCounts(char_ids(hyps), 6), NgramCounts(char_ids(refs), 6))
+    for hyp, ref, b, c in zip(hyps, refs, bleu_scores, chrf_scores):
+        assert b == pytest.approx(naive_bleu(TOKEN_RE.findall(hyp), TOKEN_RE.findall(ref)))
+        assert c == pytest.approx(naive_chrf(hyp, ref))
+
+
+@pytest.mark.parametrize('longest, alphabet', [(40, 3), (300, 4), (700, 30)])
+def test_edit_distances_match_dynamic_programming(longest, alphabet):
+    rng = random.Random(longest)
+    a = [[rng.randrange(alphabet) for _ in range(rng.randrange(longest))] for _ in range(40)]
+    b = [[rng.randrange(alphabet) for _ in range(rng.randrange(longest))] for _ in range(40)]
+    assert edit_distances(batch(a), batch(b)).tolist() == [naive_distance(x, y) for x, y in zip(a, b)]
+
+
+def test_score_block_skips_missing_and_failed_rows():
+    refs = ['x = 1', 'x = 1', '', 'call foo(a, b)']
+    column = ['x = 1 ! same', 'Error translating: timeout', 'x = 1', '']
+    scores = score_block([column, refs], refs)
+    assert scores[0] == {'bleu': [100.0, None, None, None], 'chrf': [100.0, None, None, None],
+                         'edit': [100.0, None, None, None]}
+    assert scores[1]['edit'] == [100.0, 100.0, None, 100.0]
+
+
+def test_score_csv_blocks_agree_with_one_block(tmp_path, monkeypatch):
+    rng = random.Random(1)
+    path = tmp_path / 'results.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['legacy_code', 'Reference', 'output_a', 'output_a_score'])
+        for _ in range(30):
+            writer.writerow(['x', random_code(rng, 3), random_code(rng, 3), ''])
+    whole = score_csv(path, tmp_path / 'whole.csv', workers=1)
+    monkeypatch.setattr('scoring.BLOCK_ROWS', 7)
+    blocks = score_csv(path, tmp_path / 'blocks.csv', workers=1)
+    assert whole == blocks
+    assert (tmp_path / 'whole.csv').read_text() == (tmp_path / 'blocks.csv').read_text()
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import translate_fortran_json_response as translator
+from streaming import JsonObjectTracker, iter_sse_events
+from vllm_client import VLLMClient
+
+
+OBJECT = json.dumps({"translated_code": "write(*,*) '{\"x\"}', \"a\\\\\"\nend"})
+TEXT = "```json\n" + OBJECT + "\n```\nDone."
+
+
+@pytest.mark.parametrize('cut', range(len(TEXT)))
+def test_tracker_finds_the_end_however_the_text_is_split(cut):
+    tracker = JsonObjectTracker()
+    done = tracker.feed(TEXT[:cut]) or tracker.feed(TEXT[cut:])
+    assert done
+    assert TEXT[:tracker.end] == "```json\n" + OBJECT
+
+
+def test_tracker_waits_for_the_object_to_close():
+    tracker = JsonObjectTracker()
+    for char in OBJECT[:-1]:
+        assert not tracker.feed(char)
+    assert tracker.feed(OBJECT[-1])
+    assert tracker.end == len(OBJECT)
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.lines)
+
+
+def test_sse_events_stop_at_done():
+    lines = [': keep-alive', '', 'data: {"a": 1}', 'data: [DONE]', 'data: {"a": 2}']
+    assert list(iter_sse_events(FakeResponse(lines))) == [{'a': 1}]
+
+
+class StreamingClient:
+    """
+    Streams a fixed text in small deltas and records whether the stream was closed early.
+    """
+
+    def __init__(self, text, size=3):
+        self.text = text
+        self.size = size
+        self.sent = 0
+        self.closed = False
+
+    def stream_chat(self, payload):
+        try:
+            for start in range(0, len(self.text), self.size):
+                self.sent += 1
+                last = start + self.size >= len(self.text)
+                yield {'choices': [{'delta': {'content': self.text[start:start + self.size]},
+                                    'finish_reason': 'stop' if last else None}],
+                       'usage': {'prompt_tokens': 5, 'completion_tokens': self.sent}}
+        finally:
+            self.closed = True
+
+
+def test_stream_stops_once_the_object_closes():
+    client, stats = StreamingClient(OBJECT + "\nLet me know if you need anything else."), {}
+    for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens'):
+        stats[key] = 0
+    content, finish_reason = translator.stream_completion(client, {}, stats)
+    assert content == OBJECT
+    assert finish_reason == 'stop'
+    assert client.closed and client.sent == -(-len(OBJECT) // 3)
+    assert stats['early_stop'] and stats['completion_tokens'] == client.sent
+
+
+@pytest.mark.parametrize('max_tokens, finish_reason', [(2048, 'stop'), (8, 'length')])
+def test_streamed_translation_matches_the_plain_one(mock_server, max_tokens, finish_reason):
+    code = "      WRITE(*,*) '{\"X\"}', \"A\\\\\"\n      END"
+    with VLLMClient(api_url=mock_server().url) as client:
+        plain_stats, streamed_stats = {}, {}
+        plain = translator.translate_code(code, max_tokens=max_tokens, client=client, model='m',
+                                          max_continuations=0, stats=plain_stats)
+        streamed = translator.translate_code(code, max_tokens=max_tokens, client=client, model='m',
+                                             max_continuations=0, stats=streamed_stats, stream=True)
+    assert streamed == plain
+    assert streamed_stats['finish_reason'] == plain_stats['finish_reason'] == finish_reason
+    assert streamed_stats['truncated'] is (finish_reason == 'length')
+    assert not streamed_stats.get('early_stop')
+    assert 'ttft' in streamed_stats and streamed_stats['completion_tokens'] > 0
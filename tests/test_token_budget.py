@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import translate_fortran_json_response as translator
+from token_budget import ExpansionRatioStore, adaptive_max_tokens, estimate_tokens
+
+
+class RecordingClient:
+    """
+    Answers every chat request at once and keeps the payloads.
+    """
+
+    limiter = None
+
+    def __init__(self):
+        self.payloads = []
+
+    def chat(self, payload):
+        self.payloads.append(payload)
+        content = json.dumps({'translated_code': 'x = 1'})
+        return {'choices': [{'message': {'content': content}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5}}
+
+
+@pytest.mark.parametrize('input_tokens, margin, expected', [(100, 256, 406), (10, 16, 64), (10000, 256, 2048)])
+def test_adaptive_max_tokens_scales_between_floor_and_ceiling(input_tokens, margin, expected):
+    assert adaptive_max_tokens(input_tokens, 1.5, margin, ceiling=2048, floor=64) == expected
+
+
+def test_each_chunk_gets_a_budget_from_its_own_size():
+    small = "      SUBROUTINE A\n      X = 1\n      END\n"
+    large = "      SUBROUTINE B\n" + "      Y = Y + 1\n" * 60 + "      END\n"
+    client, stats = RecordingClient(), {}
+    translator.translate_chunked(small + large, 200, client=client, stats=stats, model='m',
+                                 adaptive_tokens=(1.5, 16))
+    budgets = []
+    for payload in client.payloads:
+        chunk = payload['messages'][-1]['content'].split('Legacy Code:\n', 1)[1]
+        assert payload['max_tokens'] == adaptive_max_tokens(estimate_tokens(chunk), 1.5, 16)
+        budgets.append(payload['max_tokens'])
+    assert len(set(budgets)) > 1
+    assert stats['reserved_tokens'] == sum(budgets)
+
+
+def test_ratio_store_uses_a_high_percentile_once_it_has_enough_samples(tmp_path):
+    store = ExpansionRatioStore(str(tmp_path / 'ratios.json'), percentile=0.9, min_samples=5)
+    for completion in (10, 20, 30, 40):
+        store.record('m', 10, completion)
+    assert store.ratio('m', default=1.5) == 1.5
+    store.record('m', 10, 50)
+    store.record('m', 0, 50)
+    store.record('m', 10, 0)
+    assert store.ratio('m') == 5.0
+    assert store.ratio('other', default=1.5) == 1.5
+
+
+def test_ratio_store_keeps_recent_samples_across_runs(tmp_path):
+    path = str(tmp_path / 'ratios.json')
+    store = ExpansionRatioStore(path, max_samples=3, min_samples=1, percentile=0.0)
+    for completion in (10, 20, 30, 40):
+        store.record('m', 10, completion)
+    store.save()
+    assert ExpansionRatioStore(path).samples == {'m': [2.0, 3.0, 4.0]}
+    assert ExpansionRatioStore(path, min_samples=1, percentile=0.0).ratio('m') == 2.0
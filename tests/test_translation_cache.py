@@ -0,0 +1,74 @@
+import json
+import sqlite3
+
+import pytest
+
+import translate_fortran_json_response as translator
+from translation_cache import TranslationCache
+
+
+def test_entries_keep_their_finish_reason(tmp_path):
+    with TranslationCache(str(tmp_path / 'cache.sqlite')) as cache:
+        key = cache.make_key({'model': 'm', 'messages': [], 'stream': True})
+        assert key == cache.make_key({'model': 'm', 'messages': []})
+        assert cache.get(key) is None
+        cache.put(key, 'x = 1', 'stop')
+        assert cache.get(key) == 'x = 1'
+        assert cache.get_entry(key) == ('x = 1', 'stop')
+        assert cache.stats()['hits'] == 2
+
+
+def test_caches_without_finish_reasons_are_migrated(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE translations (key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                 " created REAL NOT NULL, last_access REAL NOT NULL)")
+    conn.execute("INSERT INTO translations VALUES ('k', 'x = 1', 1e12, 1e12)")
+    conn.commit()
+    conn.close()
+    with TranslationCache(path) as cache:
+        assert cache.get_entry('k') == ('x = 1', None)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    with TranslationCache(str(tmp_path / 'cache.sqlite'), max_entries=2) as cache:
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key)
+        cache.evict()
+        assert sum(cache.get(key) is not None for key in ('a', 'b', 'c')) == 2
+
+
+def test_long_runs_are_evicted_while_inserting(tmp_path):
+    with TranslationCache(str(tmp_path / 'cache.sqlite'), max_entries=2, evict_every=3) as cache:
+        for key in ('a', 'b', 'c'):
+            cache.put(key, key)
+        count = cache._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        assert count == 2
+
+
+class AnsweringClient:
+    """
+    Answers every chat request with the same content.
+    """
+
+    limiter = None
+
+    def __init__(self, content):
+        self.content = content
+
+    def chat(self, payload):
+        return {'choices': [{'message': {'content': self.content}, 'finish_reason': 'stop'}]}
+
+
+@pytest.mark.parametrize('content, cached', [
+    (json.dumps({'translated_code': 'x = 1'}), True),
+    ('Here it is: ' + json.dumps({'translated_code': 'x = 1'}), True),
+    ('{"translated_code": "x = "a""}', False),
+    ('{"translated_code": "x = 1', False),
+    ('x = 1', False),
+])
+def test_only_cleanly_extracted_answers_are_cached(tmp_path, content, cached):
+    with TranslationCache(str(tmp_path / 'cache.sqlite')) as cache:
+        translator.translate_code('x = 1', client=AnsweringClient(content), cache=cache, model='m')
+        count = cache._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        assert count == int(cached)
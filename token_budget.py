@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+from checkpoint import atomic_write
+
+
+# --- Configuration ---
+# Context length vLLM was started with (--max-model-len), same variable as docker-compose.yml
+MAX_MODEL_LEN = int(os.getenv("MAX_LEN", "8192"))
+
+# Rough characters per token for Fortran source; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Output tokens per input token: translations are longer than the legacy
+# code and JSON escaping adds more on top
+EXPANSION_RATIO = 1.5
+
+# Extra tokens on top of the expansion estimate for the JSON wrapper and module boilerplate
+TOKEN_MARGIN = 256
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate that needs no tokenizer.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_token_budget(max_model_len=MAX_MODEL_LEN, max_tokens=2048, prompt_tokens=0,
+                       expansion_ratio=EXPANSION_RATIO):
+    """
+    Largest input chunk, in tokens, that can be translated in one request.
+
+    The chunk, the fixed prompt and the generation must all fit in the
+    context window, and the expected translation must fit in max_tokens.
+    """
+    fits_context = max_model_len - prompt_tokens - max_tokens
+    fits_output = int(max_tokens / expansion_ratio)
+    return max(1, min(fits_context, fits_output))
+
+
+def adaptive_max_tokens(input_tokens, expansion_ratio=EXPANSION_RATIO, margin=TOKEN_MARGIN,
+                        ceiling=2048, floor=64):
+    """
+    Per-row generation cap sized from the input instead of one global value.
+
+    vLLM reserves KV-cache room against max_tokens, so a tight cap lets it
+    batch more sequences. Underestimates are caught by continuation requests.
+    """
+    return max(floor, min(ceiling, int(input_tokens * expansion_ratio) + margin))
+
+
+class ExpansionRatioStore:
+    """
+    Output/input token ratios observed in previous runs, per model, in a JSON file.
+    Input tokens are always estimate_tokens counts, as adaptive_max_tokens is given.
+
+    The ratio used for a model is a high percentile of its recent samples,
+    so most rows fit in one request without reserving the global maximum.
+    """
+
+    def __init__(self, path, percentile=0.9, max_samples=500, min_samples=5):
+        self.path = path
+        self.percentile = percentile
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self.samples = {}
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.samples = json.load(f)
+
+    def ratio(self, model, default=EXPANSION_RATIO):
+        with self._lock:
+            samples = sorted(self.samples.get(model, []))
+        if len(samples) < self.min_samples:
+            return default
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile))]
+
+    def record(self, model, input_tokens, completion_tokens):
+        if input_tokens <= 0 or completion_tokens <= 0:
+            return
+        with self._lock:
+            samples = self.samples.setdefault(model, [])
+            samples.append(round(completion_tokens / input_tokens, 4))
+            del samples[:-self.max_samples]
+
+    def save(self):
+        with self._lock:
+            with atomic_write(self.path) as f:
+                json.dump(self.samples, f)
@@ -1,338 +1,710 @@
 import requests
 import csv
+import json
 import time
 import argparse
 import os
-import json
-import re
+from collections import Counter
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from checkpoint import CheckpointJournal, atomic_write, journal_path_for
+from compile_check import CompileChecker
+from concurrency_limiter import AIMDLimiter
+from chunking import split_fortran, stitch_modules
+from csv_pipeline import count_rows, in_order, iter_rows
+from dedup import find_duplicates
+from esope_rules import pretranslate
+from json_extract import CLEAN_METHODS, extract_translated_code
+from metrics_exporter import MetricsServer, PipelineMetrics, TextfileExporter
+from prompts import TRANSLATION_SCHEMA, build_messages
+from provenance import ProvenanceIndex, provenance_path_for
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, backoff_delay, is_retryable
+from row_metrics import METRIC_FIELDS, MetricsSidecar, RunSummary, row_record
+from streaming import JsonObjectTracker
+from token_budget import (
+    EXPANSION_RATIO, MAX_MODEL_LEN, TOKEN_MARGIN, ExpansionRatioStore, adaptive_max_tokens,
+    chunk_token_budget, estimate_tokens
+)
+from translation_cache import TranslationCache
+from vllm_client import (
+    API_URL, HEALTH_INTERVAL, VLLMClient, continuation_payload, get_default_client, guided_decoding_params
+)
 
 
 # --- Configuration ---
-API_URL = os.getenv("API_URL", "http://localhost:8000/v1/chat/completions")
 MODEL = os.getenv("MODEL_ID", "")
 
-SYSTEM_PROMPT = """
-You are given Fortran 77 code that may contain ESOPE extensions.
-ESOPE is an extension of Fortran designed for structured memory management, based on the concept of segments (SEGMENT, SEGINI, SEGACT, SEGDES, SEGSUP, SEGADJ, etc.) and pointers (POINTEUR).
-The goal is to translate this legacy ESOPE-Fortran code into modern Fortran (Fortran 2008).
-You must follow the strict translation rules and patterns demonstrated in the examples below.
-Translation Rules
-1. Module and Procedure Structure
-Module Creation: A standalone SUBROUTINE or FUNCTION (e.g., subroutine newbk) must be converted into a MODULE(e.g., module newbk_mod).
-Contains: The original procedure must be placed inside the CONTAINS section of the new module.
-Implicit Typing: IMPLICIT NONE must be enforced in all modules and procedures.
-2. Declarations and Dependencies
-external to use: An external <name> declaration (and its associated type declaration, e.g., integer fndbk) must be replaced with a USE statement (e.g., use :: fndbk_mod).
-POINTEUR:
-pointeur lib.PSTR → type(str), pointer :: lib
-pointeur <var>.<seg> → type(<seg>), pointer :: <var>
-INTENT: All procedure arguments must be given an INTENT attribute (e.g., intent(in), intent(out), intent(inout)).
-For POINTEUR arguments that are initialized or modified, intent(inout) is appropriate.
-Includes:
-#include "PSTR.inc" → ! [ooo] empty #include PSTR.inc
-#include "tlib.seg" → Keep the include comments, but add local declarations for the segment's members (e.g., integer :: brcnt, integer :: urcnt).
-3. ESOPE Command and Syntax Translation
-Pointer Access: Convert ESOPE dot-notation to standard Fortran percent-notation.
-lb.bref → lb % bref
-Array Sizing: Convert ESOPE slash-notation to the SIZE intrinsic.
-lb.bref(/1) → size(lb % bref, 1)
-mypnt Function: Convert the generic mypnt call to a typed pointer assignment (=>) using the specific function for that type.
-lb = mypnt(lib,1) → lb => tlib_mypnt(lib, 1)
-ur = mypnt(lib, lb.uref(iur)) → ur => user_mypnt(lib, lb % uref(iur))
-Memory Allocation (segini): The segini macro must be translated to a subroutine call that explicitly passes the segment's dimensioning variables.
-segini, ur → call segini(ur, ubbcnt)
-Memory Resizing (segadj): The segadj macro must also be translated to a call passing the new dimensioning variables.
-segadj, ur → call segadj(ur, ubbcnt)
-segadj, lb → call segadj(lb, brcnt, urcnt)
-4. Obsolete and Unused Code
-Obsolete Macros: All obsolete memory/state management macros must be commented out and tagged ! [ooo].obsolete:. This includes:
-call oooeta(...)
-call actstr(...)
-segact ...
-segdes ...
-call desstr(...)
-Unused Variables: If an ESOPE bookkeeping variable (like libeta) becomes unused after translation, mark its declaration with ! [ooo].not-used:.
-
-
-Example 1 ESOPE+Fortran:
-c arguments
-      pointeur lib.pstr
-      character*(*) title
-c local variables
-      pointeur bk.book
-
-Example 1 Fortran 2008:
-! arguments
-type(str), pointer, intent(in) :: lib
-character(len=*), intent(in) :: title
-! local variables
-type(book), pointer :: bk
-
-Example 2 ESOPE+Fortran:
-subroutine borbk(lib, name, title)
-       implicit none
-#include "PSTR.inc"
-c external functions
-       external fndbk 
-       integer fndbk
-
-Example 2 Fortran 2008:
-module borbk_mod
-  use :: str_mod
-  use :: fndur_mod
-  use :: fndbk_mod
-  ...
-  implicit none
-contains
-  subroutine borbk(lib, name, title)
-    ! [ooo] empty #include PSTR.inc
-    ! external functions
-
-
-Example 3 ESOPE+Fortran:
-bk = mypnt(lib, lb.bref(ibk2))
-segact, bk
-
-Example 3 Fortran 2008:
-bk => book_mypnt(lib, lb % bref(ibk2))
-! [ooo].obsolete: segact,bk
-
-
-Example 4 ESOPE+Fortran:
-brcnt = lb.bref(/1)
-
-Example 4 Fortran 2008:
-brcnt = size(lb % bref, 1)
-
-Example 5 ESOPE+Fortran:
-title2 = bk.btitle
-segdes, bk*NOMOD
-
-Example 5 Fortran 2008:
-title2 = bk % btitle
-! [ooo].obsolete: segdes,bk
-
-
-Example 6 ESOPE+Fortran:
-ubbcnt = ur.ubb(/1)
-ubbcnt = ubbcnt + 1
-segadj, ur
-ur.ubb(ubbcnt) = ibk
-
-Example 6 Fortran 2008:
-ubbcnt = size(ur % ubb, 1)
-ubbcnt = ubbcnt + 1
-call segadj(ur, ubbcnt)
-ur % ubb(ubbcnt) = ibk
-
-
-Example 7 ESOPE+Fortran:
-c local variables    
-      integer libeta
-...
-      call oooeta(lib, libeta)
-      call actstr(lib)
-...
-c deactivate the structure if activated on entry
-      if(libeta.ne.1) call desstr(lib,'MOD')
-
-Example 7 Fortran 2008:
-! local variables    
-    ! [ooo].not-used: integer :: libeta
-...
-    ! [ooo].obsolete: call oooeta(lib,libeta)
-    ! [ooo].obsolete: call actstr(lib)
-...
-    ! deactivate the structure if activated on entry
-    ! [ooo].empty-var: if (libeta /= 1) ! [ooo].obsolete: call desstr(lib,'MOD')
-
-
-Example 8 ESOPE+Fortran:
-if (title2 .eq. title1) then
-Example 8 Fortran 2008:
-if (title2 == title1) then
-
-
-IMPORTANT: You must respond ONLY with valid JSON in this exact format:
-{
-  "translated_code": "the translated Fortran 2008 code here"
-}
-
-Do not include any text before or after the JSON. Do not wrap the JSON in markdown code blocks.
-"""
+# Prefixes translate_code uses when it returns an error message instead of code
+ERROR_PREFIXES = ("Error translating:", "Error:")
+
+# Marks rows that failed because the server was unreachable or overloaded;
+# they are never cached or journaled, so --resume translates them again
+RETRYABLE_ERROR = "Error translating: [retryable]"
 
 
 def extract_code_from_json(response_text):
     """
     Extract translated code from LLM response by parsing JSON.
+    See json_extract.extract_translated_code for the recovery paths.
     """
-    response_text = response_text.strip()
-    
-    # Method 1: Direct JSON parse
-    try:
-        data = json.loads(response_text)
-        if 'translated_code' in data:
-            return data['translated_code'].strip()
-    except json.JSONDecodeError:
-        pass
-    
-    # Method 2: JSON in markdown blocks
-    json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-    matches = re.findall(json_pattern, response_text, re.DOTALL)
-    if matches:
-        try:
-            data = json.loads(matches[0])
-            if 'translated_code' in data:
-                return data['translated_code'].strip()
-        except json.JSONDecodeError:
-            pass
-    
-    # Method 3: Extract value using regex
-    value_pattern = r'"translated_code"\s*:\s*"((?:[^"\\]|\\.)*)"'
-    matches = re.findall(value_pattern, response_text, re.DOTALL)
-    if matches:
-        code = matches[0]
-        code = code.replace('\\"', '"')
-        code = code.replace('\\n', '\n')
-        code = code.replace('\\t', '\t')
-        return code.strip()
-    
-    # Method 4: Find JSON with brace matching
-    if '"translated_code"' in response_text:
-        brace_count = 0
-        start_idx = -1
-        
-        for i, char in enumerate(response_text):
-            if char == '{':
-                if brace_count == 0:
-                    start_idx = i
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0 and start_idx != -1:
-                    try:
-                        json_str = response_text[start_idx:i+1]
-                        data = json.loads(json_str)
-                        if 'translated_code' in data:
-                            return data['translated_code'].strip()
-                    except json.JSONDecodeError:
-                        continue
-    
-    # Method 5: Extract from code blocks
-    code_pattern = r'```(?:fortran)?\s*(.*?)\s*```'
-    code_matches = re.findall(code_pattern, response_text, re.DOTALL | re.IGNORECASE)
-    if code_matches:
-        return code_matches[0].strip()
-    
-    # Method 6: Strip JSON wrapper manually
-
-    if response_text.startswith('{'):
-        cleaned = re.sub(r'^\s*\{\s*"translated_code"\s*:\s*"', '', response_text)
-        cleaned = re.sub(r'"\s*\}\s*$', '', cleaned)
-        cleaned = cleaned.replace('\\"', '"')
-        cleaned = cleaned.replace('\\n', '\n')
-        cleaned = cleaned.replace('\\t', '\t')
-        if cleaned != response_text and len(cleaned) > 0:
-            return cleaned.strip()
-    
-    # Last resort
-    return response_text.strip()
-
-
-
-def translate_code(code_snippet, temperature=0.1, max_tokens=2048, top_p=1.0, max_retries=3, delay=1):
+    return extract_translated_code(response_text)[0]
+
+
+def translate_code(code_snippet, temperature=0.1, max_tokens=2048, top_p=1.0, max_retries=3, delay=1,
+                   client=None, cache=None, pretranslated=False, fragment=None,
+                   max_continuations=3, stats=None, adaptive_tokens=None, stream=False, guided=None,
+                   retry_budget=None, model=None, refresh_cache=False):
     """
-    Calls the vLLM API to translate a single code snippet.
+    Calls the vLLM API to translate a single code snippet with `model`
+    (default: $MODEL_ID).
+    If a TranslationCache is given, it is checked before calling the API,
+    and complete answers whose JSON needed no repair are stored in it; with
+    `refresh_cache`, it is only written, so a re-translation is new.
+    `pretranslated` tells the model the snippet already went through esope_rules,
+    and `fragment` is an (index, total) pair for pieces of a split routine.
+
+    When a response stops at max_tokens (finish_reason "length"), up to
+    `max_continuations` follow-up requests extend the partial output instead
+    of regenerating it. If `stats` is a dict, the number of continuations,
+    the final finish_reason, whether the output is still truncated, the
+    prompt/completion/cached token usage, the number of retries, whether
+    the cache answered and the json_extract method that recovered the code
+    are recorded in it.
+
+    `adaptive_tokens`, an (expansion ratio, margin) pair, sizes this request's
+    generation cap from the snippet's estimated tokens, below `max_tokens`
+    (see token_budget.adaptive_max_tokens), and records it in `stats` as
+    reserved_tokens. The cache key still uses `max_tokens`, since a finished
+    answer doesn't depend on the cap.
+
+    With `stream`, the response is consumed as server-sent events and the
+    request is closed as soon as the JSON object is complete (see
+    stream_completion), and the time-to-first-token and inter-token latency
+    are recorded in `stats`.
+
+    `guided` is a guided-decoding mode from VLLMClient.detect_guided_decoding;
+    the server then constrains the output to TRANSLATION_SCHEMA.
+
+    Failed requests are retried after a jittered backoff while the shared
+    `retry_budget` allows it. When they can't be, or the client's circuit
+    breaker is open, the result starts with RETRYABLE_ERROR. Errors a retry
+    can't fix (4xx other than 429) fail at once, without that marker.
     """
+    if stats is None:
+        stats = {}
+    stats.setdefault('continuations', 0)
+    stats.setdefault('truncated', False)
+    stats.setdefault('prompt_tokens', 0)
+    stats.setdefault('completion_tokens', 0)
+    stats.setdefault('cached_tokens', 0)
+    stats.setdefault('retries', 0)
+    client = client or get_default_client()
     payload = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user", 
-                "content": f"Translate this legacy Fortran code to modern Fortran. Respond with JSON only.\n\nLegacy Code:\n{code_snippet}"
-            }
-        ],
+        "model": model or MODEL,
+        "messages": build_messages(code_snippet, pretranslated=pretranslated, fragment=fragment),
         "temperature": temperature,
         "max_tokens": max_tokens,
         "top_p": top_p,
+        **guided_decoding_params(guided, TRANSLATION_SCHEMA),
     }
 
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(payload)
+        cached = None if refresh_cache else cache.get_entry(cache_key)
+        if cached is not None:
+            stats['cache_hit'] = True
+            stats['finish_reason'] = cached[1]
+            return cached[0]
+
+    if adaptive_tokens is not None:
+        payload['max_tokens'] = adaptive_max_tokens(estimate_tokens(code_snippet), *adaptive_tokens,
+                                                    ceiling=max_tokens)
+        stats['reserved_tokens'] = payload['max_tokens']
+
+    if retry_budget is not None:
+        retry_budget.record_request()
+
     for attempt in range(max_retries):
         try:
-            response = requests.post(API_URL, json=payload, timeout=300)
-            response.raise_for_status()
-            data = response.json()
-            
-            full_response = data['choices'][0]['message']['content']
-            translated_code = extract_code_from_json(full_response)
+            if stream:
+                full_response, finish_reason = stream_completion(client, payload, stats)
+            else:
+                data = client.chat(payload)
+                record_usage(stats, data)
+                choice = data['choices'][0]
+                full_response = choice['message']['content']
+                finish_reason = choice.get('finish_reason')
+
+            full_response, finish_reason = continue_truncated(
+                client, payload, full_response, finish_reason, max_continuations, stats
+            )
+            stats['finish_reason'] = finish_reason
+            stats['truncated'] = finish_reason == 'length'
+            translated_code, stats['extract_method'] = extract_translated_code(full_response)
+
+            # A still-truncated or repaired answer is not worth keeping: a rerun should retry it
+            if cache_key is not None and not stats['truncated'] and stats['extract_method'] in CLEAN_METHODS:
+                cache.put(cache_key, translated_code, finish_reason)
             
             return translated_code
             
+        except CircuitOpenError as e:
+            return f"{RETRYABLE_ERROR} {str(e)}"
         except requests.exceptions.RequestException as e:
             print(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(delay * (2 ** attempt))
-            else:
+            if not is_retryable(e):
                 return f"Error translating: {str(e)}"
+            if attempt < max_retries - 1 and (retry_budget is None or retry_budget.allow_retry()):
+                stats['retries'] += 1
+                time.sleep(backoff_delay(attempt, delay))
+            else:
+                return f"{RETRYABLE_ERROR} {str(e)}"
         except Exception as e:
             print(f"Unexpected error: {e}")
             return f"Error: {str(e)}"
 
 
+def record_usage(stats, data):
+    usage = data.get('usage') or {}
+    stats['prompt_tokens'] += usage.get('prompt_tokens') or 0
+    stats['completion_tokens'] += usage.get('completion_tokens') or 0
+    stats['cached_tokens'] += (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+
+
+def stream_completion(client, payload, stats):
+    """
+    Stream a completion and stop reading once the JSON object is complete.
+
+    Whatever the model would add after the closing brace is never generated:
+    closing the stream makes vLLM abort the request. Returns the content up
+    to the closing brace and the finish_reason ("stop" on early termination).
+    """
+    tracker = JsonObjectTracker()
+    parts = []
+    gaps = []
+    finish_reason = None
+    usage = None
+    start = time.perf_counter()
+    last = None
+
+    chunks = client.stream_chat(payload)
+    try:
+        for chunk in chunks:
+            usage = chunk.get('usage') or usage
+            if not chunk.get('choices'):
+                continue
+            choice = chunk['choices'][0]
+            delta = (choice.get('delta') or {}).get('content') or ''
+            if delta:
+                now = time.perf_counter()
+                if last is None:
+                    stats['ttft'] = now - start
+                else:
+                    gaps.append(now - last)
+                last = now
+                parts.append(delta)
+                if tracker.feed(delta):
+                    finish_reason = 'stop'
+                    stats['early_stop'] = choice.get('finish_reason') is None
+                    break
+            finish_reason = choice.get('finish_reason') or finish_reason
+    finally:
+        chunks.close()
+
+    if usage:
+        record_usage(stats, {'usage': usage})
+    if gaps:
+        stats['itl_mean'] = sum(gaps) / len(gaps)
+        stats['itl_max'] = max(gaps)
+
+    content = ''.join(parts)
+    if tracker.end is not None:
+        content = content[:tracker.end]
+    return content, finish_reason
+
+
+def continue_truncated(client, payload, content, finish_reason, max_continuations, stats):
+    """
+    Extend a length-truncated response with continuation requests.
+    Returns the combined content and the last finish_reason.
+    """
+    while finish_reason == 'length' and stats['continuations'] < max_continuations:
+        try:
+            data = client.chat(continuation_payload(payload, content))
+        except requests.exceptions.RequestException as e:
+            # e.g. the partial answer no longer fits in the context: keep what we have
+            print(f"    Continuation failed: {e}")
+            break
+        stats['continuations'] += 1
+        record_usage(stats, data)
+        choice = data['choices'][0]
+        content += choice['message']['content']
+        finish_reason = choice.get('finish_reason')
+    return content, finish_reason
+
+
+def translate_chunked(code_snippet, chunk_tokens, chunk_concurrency=4, **kwargs):
+    """
+    Translate a snippet that may not fit in one request.
+
+    Snippets above `chunk_tokens` are split at SUBROUTINE/FUNCTION and
+    statement boundaries, the chunks are translated in parallel and the
+    results are stitched back into one module. Other keyword arguments are
+    passed to translate_code.
+    """
+    groups = split_fortran(code_snippet, chunk_tokens)
+    if len(groups) == 1 and len(groups[0]) == 1:
+        return translate_code(code_snippet, **kwargs)
+
+    stats = kwargs.pop('stats', None)
+
+    jobs = []
+    for group in groups:
+        for index, chunk in enumerate(group):
+            fragment = (index + 1, len(group)) if len(group) > 1 else None
+            jobs.append((chunk, fragment))
+    print(f"    Split into {len(jobs)} chunks of at most ~{chunk_tokens} tokens")
+
+    chunk_stats = [{} for _ in jobs]
+    with ThreadPoolExecutor(max_workers=max(1, min(chunk_concurrency, len(jobs)))) as executor:
+        results = list(executor.map(
+            lambda job, job_stats: translate_code(job[0], fragment=job[1], stats=job_stats, **kwargs),
+            jobs, chunk_stats
+        ))
+    if stats is not None:
+        merge_stats(stats, chunk_stats)
+
+    for result in results:
+        if is_translation_error(result):
+            return result
+
+    # Fragments of one routine are concatenated before the modules are merged
+    translations = []
+    position = 0
+    for group in groups:
+        translations.append('\n'.join(results[position:position + len(group)]))
+        position += len(group)
+    return stitch_modules(translations)
+
+
+# Per-request timings; chunks run in parallel, so a row is as slow as its slowest chunk
+MAX_STATS = ('ttft', 'itl_mean', 'itl_max')
+
+
+def merge_stats(stats, parts):
+    """
+    Combine per-chunk stats into the row's stats: counts are summed, timings
+    take the slowest chunk, flags are true if any chunk set them, and other
+    values keep the last chunk's.
+    """
+    for part in parts:
+        for key, value in part.items():
+            if key in MAX_STATS:
+                stats[key] = max(stats.get(key, 0), value)
+            elif key == 'finish_reason':
+                # One truncated chunk truncates the row
+                stats[key] = 'length' if stats.get(key) == 'length' else value
+            elif isinstance(value, bool):
+                stats[key] = stats.get(key, False) or value
+            elif isinstance(value, (int, float)):
+                stats[key] = stats.get(key, 0) + value
+            else:
+                stats[key] = value
+
+
+def is_translation_error(text):
+    """
+    True if `text` is an error message returned by translate_code rather than code.
+    """
+    return text.startswith(ERROR_PREFIXES)
+
+
+def is_retryable_error(text):
+    """
+    True if `text` is an error worth retrying later (server down or overloaded).
+    """
+    return text.startswith(RETRYABLE_ERROR)
 
 
-def process_csv(input_file, output_file, legacy_col='legacy_code', 
-                translated_col='translated_code', temperature=0.1, max_tokens=2048, top_p=1.0):
+def load_only_rows(value, translated_col):
+    """
+    0-based indices of the rows to translate, from row numbers as printed while
+    translating (1-based): a list such as "3,7-9", or a JSON file of
+    {column: [row numbers]} as written by rule_checker.py --failing-rows.
+    """
+    if os.path.isfile(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            numbers = json.load(f).get(translated_col, [])
+    else:
+        numbers = []
+        for part in value.split(','):
+            first, _, last = part.strip().partition('-')
+            numbers.extend(range(int(first), int(last or first) + 1))
+    return {number - 1 for number in numbers}
+
+
+@dataclass
+class TranslationSettings:
+    """
+    How process_csv translates a column; the defaults match the CLI's.
     """
-    Process CSV file with code translation.
+    model: str = None  # default: $MODEL_ID
+    temperature: float = 0.1
+    max_tokens: int = 2048
+    top_p: float = 1.0
+    # Requests in flight at once (the limiter's ceiling when the client has one)
+    concurrency: int = 1
+    # Skip rows the checkpoint journal already holds
+    resume: bool = False
+    journal_file: str = None  # default: next to the output CSV
+    # Run the mechanical ESOPE rules first; rows they fully handle skip the model
+    use_pretranslation: bool = False
+    # Split snippets too large for max_model_len (see translate_chunked)
+    max_model_len: int = MAX_MODEL_LEN
+    chunking: bool = True
+    chunk_concurrency: int = 4
+    # Follow-up requests for a response cut off at max_tokens
+    max_continuations: int = 3
+    # Size each row's max_tokens from its input tokens; max_tokens is the ceiling
+    adaptive_tokens: bool = False
+    expansion_ratio: float = EXPANSION_RATIO
+    token_margin: int = TOKEN_MARGIN
+    # Stream responses and stop after the JSON object
+    stream: bool = False
+    # Use schema-constrained output when the server supports it
+    guided_decoding: bool = False
+    # JSONL of per-row latency, tokens and finish_reason, and the same as columns
+    metrics_file: str = None
+    metrics_columns: bool = False
+    # 0-based rows to translate; the others keep their cells
+    only_rows: set = None
+    # Only translate cells the provenance index marks empty, failed, truncated or stale
+    rerun_failed: bool = False
+    # Translate each group of duplicate (or, with the threshold, near-duplicate) snippets once
+    dedup: bool = False
+    near_dup_threshold: float = None
+
+
+def process_csv(input_file, output_file, legacy_col='legacy_code', translated_col='translated_code',
+                settings=None, client=None, cache=None, ratio_store=None, retry_budget=None, metrics=None,
+                compile_checker=None, provenance=None):
     """
+    Translate `legacy_col` of the CSV into `translated_col` as `settings` (a TranslationSettings)
+    say, and return the run's throughput summary (see row_metrics.RunSummary).
+    """
+    client = client or get_default_client()
+    settings = settings or TranslationSettings()
+    model = settings.model or MODEL
+    expansion_ratio = settings.expansion_ratio
+    guided = None
+    if settings.guided_decoding:
+        guided = client.detect_guided_decoding(model, TRANSLATION_SCHEMA)
+        if guided:
+            print(f"Guided decoding: using {guided}")
+        else:
+            print("Guided decoding: not supported by the server, falling back to prompt-only JSON")
     print(f"Loading: {input_file}")
-    
-    rows = []
-    fieldnames = []
-    
-    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-        reader = csv.DictReader(infile, delimiter=';', restkey='extra_cols')
-        fieldnames = list(reader.fieldnames) if reader.fieldnames else []
-        rows = list(reader)
+    total = count_rows(input_file)
+    kept_rows = set()
+    kept = 0
+    rule_only_rows = set()
+    # Compile checks of rows the rules translated on their own, by row index
+    rule_checks = {}
+    fanned_out_rows = {}
+    solo_rows = set()
+    rerun_reasons = Counter()
+    duplicate_of, near_rows, last_rows, shared = {}, {}, {}, {}
+    fanned_out = 0
+    if settings.dedup or settings.near_dup_threshold is not None:
+        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
+            reader = csv.DictReader(infile, delimiter=';', restkey='extra_cols')
+            duplicate_of, near_rows = find_duplicates((row.get(legacy_col) for row in reader),
+                                                      settings.near_dup_threshold)
+        # A group's translation is held until its last row has been dispatched
+        # Near-duplicates translated on their own still share with their exact duplicates
+        for i, first in list(duplicate_of.items()) + list(near_rows.items()):
+            last_rows[first] = max(i, last_rows.get(first, first))
+        print(f"Deduplication: {len(duplicate_of)} rows are duplicates of {len(set(duplicate_of.values()))} others "
+              f"({len(near_rows)} near-duplicates)")
+    if settings.only_rows is not None:
+        print(f"Translating only {len(settings.only_rows)} selected rows; "
+              f"the others keep their current {translated_col}")
+    if settings.rerun_failed and provenance is None:
+        raise ValueError("rerun_failed needs a provenance index")
+    if metrics is not None:
+        metrics.set_input_rows(model, translated_col, total)
+    run_started = time.perf_counter()
+    run_summary = RunSummary(model)
+    sidecar = MetricsSidecar(settings.metrics_file, model, translated_col) if settings.metrics_file else None
+    metric_cols = [f"{translated_col}_{field}" for field in METRIC_FIELDS] if settings.metrics_columns else []
 
     score_col = f"{translated_col}_score"
-    
-    if translated_col not in fieldnames:
-        fieldnames.append(translated_col)
-    if score_col not in fieldnames:
-        fieldnames.append(score_col)
-
-    for i, row in enumerate(rows):
-        keys_to_fix = [k for k in row.keys() if k is None or k == 'extra_cols']
-        for k in keys_to_fix:
-            del row[k]
-
-        legacy_code = row.get(legacy_col, '')
-        
-        if not legacy_code:
-            row[translated_col] = ''
-            row[score_col] = ''
-            continue
-
-        print(f"  [{i+1}/{len(rows)}] Translating for {translated_col}...")
-        translated_code = translate_code(
-            legacy_code, 
-            temperature=temperature, 
-            max_tokens=max_tokens,
-            top_p=top_p
+
+    journal = CheckpointJournal(
+        settings.journal_file or journal_path_for(output_file, translated_col),
+        translated_col, model, resume=settings.resume
+    )
+    # Budget what's left of the context after the fixed prompt and the generation
+    prompt_tokens = sum(estimate_tokens(message['content']) for message in build_messages(''))
+    chunk_tokens = chunk_token_budget(settings.max_model_len, settings.max_tokens, prompt_tokens)
+    if not settings.chunking:
+        chunk_tokens = float('inf')
+
+    resumed = 0
+    resumed_finish_reasons = {}
+    rule_only = 0
+    rules_fired = Counter()
+
+    continuation_counts = Counter()
+    extract_methods = Counter()
+    truncated_rows = 0
+    retryable_rows = 0
+    compile_results = Counter()
+
+    if settings.adaptive_tokens and ratio_store is not None:
+        expansion_ratio = ratio_store.ratio(model, expansion_ratio)
+        print(f"Adaptive max_tokens: expansion ratio {expansion_ratio:.2f}, margin {settings.token_margin}")
+    reserved_tokens = 0
+
+    # Runs in the worker threads; its stats are counted by the writer loop below
+    def translate_row(i, legacy_code, code_snippet, pretranslated):
+        stats = {}
+        limit = ''
+        if client.limiter is not None:
+            stats['concurrency_limit'] = client.limiter.snapshot()['concurrency_limit']
+            limit = f" (concurrency limit {stats['concurrency_limit']})"
+        print(f"  [{i+1}/{total}] Translating for {translated_col}...{limit}")
+        started = time.perf_counter()
+        translated_code = translate_chunked(
+            code_snippet, 
+            chunk_tokens,
+            settings.chunk_concurrency,
+            temperature=settings.temperature, 
+            max_tokens=settings.max_tokens,
+            top_p=settings.top_p,
+            client=client,
+            cache=cache,
+            pretranslated=pretranslated,
+            max_continuations=settings.max_continuations,
+            stats=stats,
+            # Each chunk's cap is sized from that chunk
+            adaptive_tokens=(expansion_ratio, settings.token_margin) if settings.adaptive_tokens else None,
+            stream=settings.stream,
+            guided=guided,
+            retry_budget=retry_budget,
+            model=model,
+            # Rows picked for re-translation were translated before; their cached answer is what failed
+            refresh_cache=settings.only_rows is not None or settings.rerun_failed
         )
-        
-        row[translated_col] = translated_code
-        row[score_col] = ''
-
-    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(rows)
-    
+        record = row_record(stats, time.perf_counter() - started)
+        if 'ttft' in stats:
+            itl = f", ITL {stats['itl_mean'] * 1000:.1f} ms" if 'itl_mean' in stats else ''
+            early = ', stopped after JSON' if stats.get('early_stop') else ''
+            print(f"  [{i+1}/{total}] TTFT {stats['ttft']:.2f} s{itl}{early}")
+        if ratio_store is not None and stats.get('finish_reason') == 'stop':
+            ratio_store.record(model, estimate_tokens(code_snippet), stats['completion_tokens'])
+        continuations = stats.get('continuations', 0)
+        if continuations:
+            print(f"  [{i+1}/{total}] Needed {continuations} continuation(s)")
+        if stats.get('truncated'):
+            print(f"  [{i+1}/{total}] Still truncated after {continuations} continuation(s)")
+        # Retryable errors are not journaled, so a resumed run retries them;
+        # errors a retry can't fix (4xx) are, so it doesn't send them again
+        if not is_retryable_error(translated_code):
+            journal.record(i, legacy_code, translated_code, stats.get('finish_reason'))
+        check = None
+        if compile_checker is not None and not is_translation_error(translated_code):
+            check = compile_checker.submit(translated_code)
+        return translated_code, record, check, stats
+
+    def tasks(rows, executor):
+        nonlocal resumed, rule_only
+        for i, row in enumerate(rows):
+            if settings.only_rows is not None and i not in settings.only_rows:
+                kept_rows.add(i)
+                yield row, None
+                continue
+
+            legacy_code = row.get(legacy_col, '')
+            if settings.rerun_failed and legacy_code:
+                reason = provenance.rerun_reason(i, legacy_code, row.get(translated_col) or '')
+                if reason is None:
+                    kept_rows.add(i)
+                    yield row, None
+                    continue
+                rerun_reasons[reason] += 1
+                if reason == 'near-duplicate':
+                    solo_rows.add(i)
+            
+            if not legacy_code:
+                row[translated_col] = ''
+                yield row, None
+                continue
+
+            done = journal.lookup(i, legacy_code)
+            if done is not None:
+                row[translated_col] = done
+                resumed += 1
+                resumed_finish_reasons[i] = journal.finish_reason(i)
+                yield row, None
+                continue
+
+            code_snippet = legacy_code
+            pretranslated = False
+            if settings.use_pretranslation:
+                code_snippet, fired, complete = pretranslate(legacy_code)
+                rules_fired.update(fired)
+                pretranslated = bool(fired)
+                rules = ', '.join(f"{name} x{count}" for name, count in sorted(fired.items())) or 'none'
+                print(f"  [{i+1}/{total}] Rules fired: {rules}")
+                if complete:
+                    row[translated_col] = code_snippet
+                    rule_only += 1
+                    rule_only_rows.add(i)
+                    if compile_checker is not None:
+                        rule_checks[i] = compile_checker.submit(code_snippet)
+                    yield row, None
+                    continue
+
+            group = near_rows[i] if i in solo_rows else duplicate_of.get(i, i)
+            source, future = shared.get(group, (i, None))
+            if future is None:
+                future = executor.submit(translate_row, i, legacy_code, code_snippet, pretranslated)
+                if group in last_rows:
+                    shared[group] = (i, future)
+            else:
+                fanned_out_rows[i] = source
+                same = 'Similar' if i in near_rows else 'Same'
+                print(f"  [{i+1}/{total}] {same} code as row {source+1}, reusing its translation")
+            if last_rows.get(group) == i:
+                shared.pop(group, None)
+            yield row, future
+
+    # output_file is often the input file too, so write to a temp file that
+    # replaces it only once the input has been fully read
+    with atomic_write(output_file) as outfile:
+        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
+            reader = csv.DictReader(infile, delimiter=';', restkey='extra_cols')
+            fieldnames = list(reader.fieldnames) if reader.fieldnames else []
+
+            if translated_col not in fieldnames:
+                fieldnames.append(translated_col)
+            if score_col not in fieldnames:
+                fieldnames.append(score_col)
+            fieldnames.extend(col for col in metric_cols if col not in fieldnames)
+
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=';', extrasaction='ignore')
+            writer.writeheader()
+
+            max_workers = max(1, settings.concurrency)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # A few rows per worker are read ahead so workers never starve
+                rows = in_order(tasks(iter_rows(reader), executor), max_workers * 4)
+                for i, (row, result) in enumerate(rows):
+                    if i in kept_rows:
+                        kept_rows.discard(i)
+                        kept += 1
+                        writer.writerow(row)
+                        continue
+                    # Resumed rows keep the finish_reason of the run that translated them
+                    record = {'finish_reason': resumed_finish_reasons.pop(i)} if i in resumed_finish_reasons else {}
+                    row[score_col] = ''
+                    check = rule_checks.pop(i, None)
+                    if result is not None:
+                        row[translated_col], record, check, stats = result
+                        if is_retryable_error(row[translated_col]):
+                            retryable_rows += 1
+                    if check is not None:
+                        row[score_col] = check.result()
+                        compile_results[row[score_col].split(':')[0]] += 1
+                    copied_from = fanned_out_rows.pop(i, None)
+                    near = i in near_rows and i not in solo_rows
+                    if copied_from is not None:
+                        # Another row's request: count the request once, and the row as a copy.
+                        # Only exact copies are final; near-duplicates are left for --rerun-failed
+                        fanned_out += 1
+                        if not near and not is_retryable_error(row[translated_col]):
+                            journal.record(i, row[legacy_col], row[translated_col], record.get('finish_reason'))
+                        record = {'finish_reason': record.get('finish_reason')}
+                        if metrics is not None:
+                            metrics.observe_row(model, translated_col, record, 'copied')
+                    elif result is not None:
+                        if 'extract_method' in stats:
+                            extract_methods[stats['extract_method']] += 1
+                        continuation_counts[stats.get('continuations', 0)] += 1
+                        truncated_rows += bool(stats.get('truncated'))
+                        reserved_tokens += stats.get('reserved_tokens', 0)
+                        run_summary.add(record)
+                        if sidecar is not None:
+                            sidecar.write(i, record)
+                        if metrics is not None:
+                            status = ('retryable' if is_retryable_error(row[translated_col]) else
+                                      'error' if is_translation_error(row[translated_col]) else 'ok')
+                            metrics.observe_row(model, translated_col, record, status)
+                    for field, col in zip(METRIC_FIELDS, metric_cols):
+                        row[col] = '' if record.get(field) is None else record[field]
+                    if provenance is not None:
+                        legacy_code, cell = row.get(legacy_col, ''), row[translated_col]
+                        if legacy_code and cell and not is_translation_error(cell):
+                            source = 'esope_rules' if i in rule_only_rows else model
+                            provenance.record(i, legacy_code, cell, source, record.get('finish_reason'),
+                                              copied_from, near and copied_from is not None)
+                        else:
+                            provenance.forget(i)
+                    writer.writerow(row)
+
+    # The CSV now holds every result, so the journal is only needed to retry failed rows
+    journal.close(remove=not retryable_rows)
+    if provenance is not None:
+        provenance.save()
+    if sidecar is not None:
+        sidecar.close()
+    summary = run_summary.summary(time.perf_counter() - run_started)
+
     print(f"Successfully updated {output_file}")
+    print(client.usage_summary())
+    if retry_budget is not None:
+        print(retry_budget.summary())
+    if resumed:
+        print(f"Resumed {resumed} rows from the checkpoint journal")
+    if duplicate_of:
+        print(f"Deduplication: {fanned_out} rows reused the translation of a duplicate instead of "
+              f"a request")
+    if settings.rerun_failed:
+        reasons = ', '.join(f"{reason} {count}" for reason, count in rerun_reasons.most_common()) or 'none'
+        print(f"Re-run: {sum(rerun_reasons.values())} cells translated again ({reasons}), {kept} kept")
+    if retryable_rows:
+        print(f"{retryable_rows} rows failed because the server was unavailable (marked "
+              f"'{RETRYABLE_ERROR}'); rerun with --resume to translate only those rows")
+    if compile_checker is not None:
+        timeouts = f", {compile_results['error']} timed out" if compile_results['error'] else ''
+        print(f"Compile check: {compile_results['pass']} passed, {compile_results['fail']} failed{timeouts}")
+    if set(extract_methods) - {'json'}:
+        print("JSON extraction: " + ', '.join(
+            f"{method} {count}" for method, count in extract_methods.most_common()
+        ))
+    if set(continuation_counts) - {0}:
+        print("Continuations per row: " + ', '.join(
+            f"{count}: {rows} rows" for count, rows in sorted(continuation_counts.items())
+        ))
+        if truncated_rows:
+            print(f"{truncated_rows} rows still truncated; consider raising --max-tokens")
+    if settings.adaptive_tokens:
+        print(f"Adaptive max_tokens reserved {reserved_tokens} tokens in total")
+    if ratio_store is not None:
+        ratio_store.save()
+    if settings.use_pretranslation:
+        print(f"Pre-translation: {rule_only} rows fully handled by rules, skipping the model")
+        for name, count in rules_fired.most_common():
+            print(f"  {name}: {count}")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate)")
+    print(RunSummary.format(summary))
+    return summary
 
 
 if __name__ == "__main__":
@@ -351,6 +723,102 @@ if __name__ == "__main__":
                         help='Maximum tokens for generation (default: 2048)')
     parser.add_argument('--top-p', type=float, default=1.0,
                         help='Top-p (nucleus sampling) for generation (default: 1.0)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Number of translation requests kept in flight (default: 1)')
+    parser.add_argument('--endpoints', default=API_URL,
+                        help='Comma-separated chat completion URLs of one or more vLLM replicas; '
+                             'requests go to the least busy healthy one (default: $API_URL)')
+    parser.add_argument('--health-interval', type=float, default=HEALTH_INTERVAL,
+                        help='Seconds between /health checks of the replicas (default: 10)')
+    parser.add_argument('--adaptive-concurrency', action='store_true',
+                        help='Adjust the requests in flight between 1 and --concurrency from observed '
+                             'latency and timeouts/5xx (AIMD)')
+    parser.add_argument('--retry-budget', type=float, default=0.2,
+                        help='Retries allowed across the run, as a fraction of requests (default: 0.2)')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='Consecutive failures that open the circuit breaker (default: 5)')
+    parser.add_argument('--breaker-reset', type=float, default=30.0,
+                        help='Seconds the circuit stays open before a probe request (default: 30)')
+    parser.add_argument('--breaker-max-pause', type=float, default=600.0,
+                        help='Seconds to pause the pipeline while the circuit is open before failing '
+                             'rows as retryable; 0 fails fast (default: 600)')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Append per-row latency, TTFT, token usage, retries and extraction method '
+                             'to this JSONL file')
+    parser.add_argument('--metrics-columns', action='store_true',
+                        help='Also write the per-row metrics to <translated-col>_<metric> columns')
+    parser.add_argument('--prometheus-port', type=int, default=None,
+                        help='Serve Prometheus metrics (rows, latency histogram, tokens, cache hits, '
+                             'retries, requests in flight) on this port at /metrics (default: disabled)')
+    parser.add_argument('--prometheus-host', default='127.0.0.1',
+                        help='Interface for --prometheus-port; 0.0.0.0 to allow remote scrapes (default: 127.0.0.1)')
+    parser.add_argument('--prometheus-textfile', default=None,
+                        help="Write the Prometheus metrics to this file for node_exporter's textfile "
+                             "collector (a *.prom file)")
+    parser.add_argument('--prometheus-interval', type=float, default=15.0,
+                        help='Seconds between --prometheus-textfile updates (default: 15)')
+    parser.add_argument('--compile-check', action='store_true',
+                        help='Syntax-check each translation with gfortran -fsyntax-only while translating, '
+                             'writing pass:N/fail:N (N diagnostics) to the score column')
+    parser.add_argument('--compile-workers', type=int, default=None,
+                        help='Processes running compile checks (default: number of CPUs)')
+    parser.add_argument('--compiler', default='gfortran',
+                        help='Fortran compiler for --compile-check (default: gfortran)')
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help='HTTP connection pool size (default: same as --concurrency)')
+    parser.add_argument('--connect-timeout', type=float, default=10.0,
+                        help='Seconds to wait when connecting to the API (default: 10)')
+    parser.add_argument('--read-timeout', type=float, default=300.0,
+                        help='Seconds to wait for a response from the API (default: 300)')
+    parser.add_argument('--cache', default=None,
+                        help='SQLite file caching translations across runs (default: disabled)')
+    parser.add_argument('--cache-max-entries', type=int, default=100000,
+                        help='Maximum number of cached translations (default: 100000)')
+    parser.add_argument('--cache-max-age-days', type=float, default=None,
+                        help='Evict cached translations older than this (default: never)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip rows already completed by an interrupted run for this column and model')
+    parser.add_argument('--journal', default=None,
+                        help='Checkpoint journal path (default: <output_csv>.<translated_col>.journal.jsonl)')
+    parser.add_argument('--rerun-failed', action='store_true',
+                        help='Only translate cells that are empty, hold an error, were truncated or whose '
+                             'legacy code changed since they were translated; keep the rest')
+    parser.add_argument('--provenance', default=None,
+                        help='Per-cell provenance index used by --rerun-failed '
+                             '(default: <output_csv>.<translated_col>.provenance.json)')
+    parser.add_argument('--no-provenance', action='store_true',
+                        help='Do not keep the provenance index')
+    parser.add_argument('--only-rows', default=None,
+                        help='Translate only these rows (numbers as printed, e.g. "3,7-9", or a '
+                             'rule_checker.py --failing-rows JSON file) and keep the rest of the column')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Send rows whose legacy code differs only in case, whitespace or comments to '
+                             'the model once and copy the translation to all of them')
+    parser.add_argument('--near-dup-threshold', type=float, default=None,
+                        help='Also share one translation between near-duplicate snippets '
+                             'whose estimated (MinHash) Jaccard similarity is at least this, e.g. 0.9')
+    parser.add_argument('--pretranslate', action='store_true',
+                        help='Apply the mechanical ESOPE rules before calling the model')
+    parser.add_argument('--max-model-len', type=int, default=MAX_MODEL_LEN,
+                        help=f'Context length of the served model, used to size chunks (default: $MAX_LEN or {MAX_MODEL_LEN})')
+    parser.add_argument('--chunk-concurrency', type=int, default=4,
+                        help='Chunks of one large snippet translated in parallel (default: 4)')
+    parser.add_argument('--no-chunking', action='store_true',
+                        help='Send every snippet in one request, however large')
+    parser.add_argument('--max-continuations', type=int, default=3,
+                        help='Follow-up requests for a response cut off at --max-tokens (default: 3)')
+    parser.add_argument('--adaptive-max-tokens', action='store_true',
+                        help='Size max_tokens per row from the snippet length; --max-tokens becomes the ceiling')
+    parser.add_argument('--expansion-ratio', type=float, default=EXPANSION_RATIO,
+                        help=f'Output/input token ratio before any is learned (default: {EXPANSION_RATIO})')
+    parser.add_argument('--token-margin', type=int, default=TOKEN_MARGIN,
+                        help=f'Tokens added to each adaptive max_tokens (default: {TOKEN_MARGIN})')
+    parser.add_argument('--ratio-store', default=None,
+                        help='JSON file where observed expansion ratios are learned per model (default: disabled)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream responses, stop at the end of the JSON object and record TTFT/ITL')
+    parser.add_argument('--guided-json', action='store_true',
+                        help='Constrain output to the JSON schema with vLLM guided decoding when the server supports it')
 
     args = parser.parse_args()
 
@@ -358,12 +826,91 @@ if __name__ == "__main__":
         print(f"Error: Input file '{args.input_csv}' does not exist.")
         exit(1)
 
-    process_csv(
-        args.input_csv, 
-        args.output_csv, 
-        args.legacy_col, 
-        args.translated_col,
-        args.temperature,
-        args.max_tokens,
-        args.top_p
+    client = VLLMClient(
+        api_url=args.endpoints,
+        pool_size=args.pool_size or args.concurrency,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        health_interval=args.health_interval,
+        limiter=AIMDLimiter(args.concurrency) if args.adaptive_concurrency else None,
+        breaker=CircuitBreaker(args.breaker_threshold, args.breaker_reset, max_pause=args.breaker_max_pause)
     )
+
+    cache = None
+    if args.cache:
+        max_age = args.cache_max_age_days * 86400 if args.cache_max_age_days is not None else None
+        cache = TranslationCache(args.cache, max_entries=args.cache_max_entries,
+                                 max_age_seconds=max_age)
+
+    if args.rerun_failed and args.no_provenance:
+        print("Error: --rerun-failed needs the provenance index; drop --no-provenance.")
+        exit(1)
+    provenance = None
+    if not args.no_provenance:
+        provenance = ProvenanceIndex(args.provenance or provenance_path_for(args.output_csv, args.translated_col),
+                                     args.translated_col)
+
+    compile_checker = None
+    if args.compile_check:
+        try:
+            compile_checker = CompileChecker(args.compile_workers, args.compiler)
+        except FileNotFoundError as e:
+            print(f"Error: {e}; install gfortran or drop --compile-check.")
+            exit(1)
+
+    retry_budget = RetryBudget(args.retry_budget)
+    metrics = exporters = None
+    if args.prometheus_port is not None or args.prometheus_textfile:
+        metrics = PipelineMetrics(client, retry_budget)
+        exporters = []
+        if args.prometheus_port is not None:
+            exporters.append(MetricsServer(metrics, args.prometheus_port, args.prometheus_host))
+        if args.prometheus_textfile:
+            exporters.append(TextfileExporter(metrics, args.prometheus_textfile, args.prometheus_interval))
+
+    try:
+        with client:
+            process_csv(
+                args.input_csv, 
+                args.output_csv, 
+                args.legacy_col, 
+                args.translated_col,
+                TranslationSettings(
+                    temperature=args.temperature,
+                    max_tokens=args.max_tokens,
+                    top_p=args.top_p,
+                    concurrency=args.concurrency,
+                    resume=args.resume,
+                    journal_file=args.journal,
+                    use_pretranslation=args.pretranslate,
+                    max_model_len=args.max_model_len,
+                    chunking=not args.no_chunking,
+                    chunk_concurrency=args.chunk_concurrency,
+                    max_continuations=args.max_continuations,
+                    adaptive_tokens=args.adaptive_max_tokens,
+                    expansion_ratio=args.expansion_ratio,
+                    token_margin=args.token_margin,
+                    stream=args.stream,
+                    guided_decoding=args.guided_json,
+                    metrics_file=args.metrics_file,
+                    metrics_columns=args.metrics_columns,
+                    only_rows=load_only_rows(args.only_rows, args.translated_col) if args.only_rows else None,
+                    rerun_failed=args.rerun_failed,
+                    dedup=args.dedup,
+                    near_dup_threshold=args.near_dup_threshold
+                ),
+                client=client,
+                cache=cache,
+                ratio_store=ExpansionRatioStore(args.ratio_store) if args.ratio_store else None,
+                retry_budget=retry_budget,
+                metrics=metrics,
+                compile_checker=compile_checker,
+                provenance=provenance
+            )
+    finally:
+        if compile_checker is not None:
+            compile_checker.close()
+        for exporter in exporters or []:
+            exporter.close()
+        if cache is not None:
+            cache.close()
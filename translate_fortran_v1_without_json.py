@@ -6,25 +6,14 @@ import os
 import json
 import re
 
+from checkpoint import atomic_write
+from csv_pipeline import count_rows, iter_rows
+from prompts import build_messages
+from vllm_client import get_default_client
+
 # --- Configuration ---
-API_URL = os.getenv("API_URL", "http://localhost:8000/v1/chat/completions")
 MODEL = os.getenv("MODEL_ID", "gpt-3.5-turbo")
 
-SYSTEM_PROMPT = """
-You are an expert Fortran programmer. You are given Fortran 77 code that contains ESOPE extensions.
-The goal is to translate this legacy ESOPE-Fortran code into modern Fortran (Fortran 2008).
-
-Translation Rules:
-1. Module/Procedure: Standalone SUBROUTINE/FUNCTION -> MODULE containing the procedure. IMPLICIT NONE is required.
-2. Dependencies: external <name> -> use :: <name>_mod
-3. Syntax: lb.bref -> lb % bref, segini -> call segini, etc.
-4. Obsolete: segact, segdes -> Comment out with ! [ooo].obsolete:
-
-Output Format:
-You must return a JSON object with the key "translated_code".
-IMPORTANT: Because the value is a code string, you MUST escape all double quotes (\") and newlines (\\n) inside the string.
-"""
-
 
 def calculate_dynamic_max_tokens(code_snippet):
     input_len = len(code_snippet)
@@ -74,23 +63,13 @@ def robust_json_extractor(raw_text):
     raise ValueError("Could not extract code from response.")
 
 
-def translate_code(code_snippet, max_retries=3, delay=1):
+def translate_code(code_snippet, max_retries=3, delay=1, client=None):
+    client = client or get_default_client()
     max_tok = calculate_dynamic_max_tokens(code_snippet)
 
-    user_content = f"""
-Translate this legacy code to modern Fortran.
-Return JSON format: {{ "translated_code": "YOUR_CODE_HERE" }}
-
-Legacy Code:
-{code_snippet}
-"""
-
     payload = {
         "model": MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_content}
-        ],
+        "messages": build_messages(code_snippet),
         "temperature": 0.1,
         "max_tokens": max_tok,
         # Note: I removed 'response_format' because it causes errors on some
@@ -99,10 +78,7 @@ Legacy Code:
 
     for attempt in range(max_retries):
         try:
-            response = requests.post(API_URL, json=payload, timeout=300)
-            response.raise_for_status()
-
-            data = response.json()
+            data = client.chat(payload)
             raw_content = data['choices'][0]['message']['content']
 
             # USE THE ROBUST EXTRACTOR
@@ -131,45 +107,45 @@ def process_csv(input_file, output_file, legacy_col, translated_col):
     print(f"Reading: {input_file}")
     print(f"Writing: {output_file}")
 
-    rows = []
-    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-        sample = infile.read(1024)
-        infile.seek(0)
-        sniffer = csv.Sniffer()
-        try:
-            delimiter = sniffer.sniff(sample).delimiter
-        except:
-            delimiter = ','
-
-        reader = csv.DictReader(infile, delimiter=delimiter)
-        rows = list(reader)
-
-    fieldnames = list(rows[0].keys())
-    if translated_col not in fieldnames:
-        fieldnames.append(translated_col)
-
     processed_count = 0
-    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for i, row in enumerate(rows):
-            print(f"Processing row {i + 1}/{len(rows)}...")
-
-            legacy_code = row.get(legacy_col, '')
-
-            if not legacy_code or len(legacy_code.strip()) == 0:
-                row[translated_col] = ''
-            else:
-                row[translated_col] = translate_code(legacy_code)
-                processed_count += 1
-
-            writer.writerow(row)
-            # time.sleep(0.1) # Uncomment if you need rate limiting
+    # Rows are streamed to a temp file that replaces output_file at the end,
+    # so input and output may be the same file
+    with atomic_write(output_file) as outfile:
+        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
+            sample = infile.read(1024)
+            infile.seek(0)
+            sniffer = csv.Sniffer()
+            try:
+                delimiter = sniffer.sniff(sample).delimiter
+            except:
+                delimiter = ','
+            total = count_rows(input_file, delimiter)
+
+            reader = csv.DictReader(infile, delimiter=delimiter)
+            fieldnames = list(reader.fieldnames or [])
+            if translated_col not in fieldnames:
+                fieldnames.append(translated_col)
+
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+            writer.writeheader()
+
+            for i, row in enumerate(iter_rows(reader)):
+                print(f"Processing row {i + 1}/{total}...")
+
+                legacy_code = row.get(legacy_col, '')
+
+                if not legacy_code or len(legacy_code.strip()) == 0:
+                    row[translated_col] = ''
+                else:
+                    row[translated_col] = translate_code(legacy_code)
+                    processed_count += 1
+
+                writer.writerow(row)
+                # time.sleep(0.1) # Uncomment if you need rate limiting
 
     print("-" * 40)
     print(f"Done. Processed {processed_count} rows.")
-
+    print(get_default_client().usage_summary())
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Translate Fortran CSV (Robust).')
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Payload keys that only change how the response is transported, not what is generated
+TRANSPORT_KEYS = ('stream', 'stream_options')
+# Inserts between evictions, so a long run stays near max_entries
+EVICT_EVERY = 1000
+
+
+class TranslationCache:
+    """
+    On-disk, content-addressed cache of successful translations.
+
+    Entries are keyed by a hash of the full request payload (system prompt,
+    legacy snippet, model and sampling parameters), so a cached answer is
+    only reused when every input that shapes the generation is unchanged.
+    Old entries are evicted by age and by count (least recently used first)
+    on open, on close and every `evict_every` inserts.
+    """
+
+    def __init__(self, path, max_entries=100000, max_age_seconds=None, evict_every=EVICT_EVERY):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " finish_reason TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(translations)")}
+        if 'finish_reason' not in columns:
+            # Caches written before finish reasons were kept
+            self._conn.execute("ALTER TABLE translations ADD COLUMN finish_reason TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS translations_last_access ON translations(last_access)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(payload):
+        """
+        Hash a chat completion payload into a stable cache key.
+        """
+        relevant = {k: v for k, v in payload.items() if k not in TRANSPORT_KEYS}
+        encoded = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """
+        Return (translation, finish_reason) for `key`, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, finish_reason FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE translations SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0], row[2]
+
+    def put(self, key, value, finish_reason=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, created, last_access, finish_reason)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, finish_reason)
+            )
+            self._conn.commit()
+            self.inserts += 1
+            due = self.inserts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop expired entries, then the least recently used ones above max_entries.
+        """
+        with self._lock:
+            if self.max_age_seconds is not None:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE created < ?",
+                    (time.time() - self.max_age_seconds,)
+                )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE key IN ("
+                    " SELECT key FROM translations ORDER BY last_access DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def _expired(self, created, now):
+        return self.max_age_seconds is not None and created < now - self.max_age_seconds
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': hit_rate}
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import closing, contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from endpoints import EndpointPool
+from streaming import iter_sse_events
+
+
+# --- Configuration ---
+# One URL, or a comma-separated list of vLLM replicas to balance across
+API_URL = os.getenv("API_URL", "http://localhost:8000/v1/chat/completions")
+POOL_SIZE = int(os.getenv("VLLM_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("VLLM_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("VLLM_READ_TIMEOUT", "300"))
+HEALTH_INTERVAL = float(os.getenv("VLLM_HEALTH_INTERVAL", "10"))
+
+# Ways of asking vLLM for schema-constrained output, newest first: the
+# OpenAI-style response_format and the older guided_json extension. Each
+# mode is also the request field it sets (see guided_decoding_params)
+GUIDED_MODES = ('response_format', 'guided_json')
+
+
+class VLLMClient:
+    """
+    Reusable client for the vLLM OpenAI-compatible API.
+
+    Owns a pooled keep-alive session so rows and retries reuse TCP
+    connections instead of opening a new one per request. `api_url` may list
+    several replicas (comma-separated or a list); requests then go to the
+    least busy healthy one (see endpoints.EndpointPool). An optional
+    concurrency_limiter.AIMDLimiter caps the requests in flight from the
+    latencies and failures it observes, and an optional
+    resilience.CircuitBreaker holds requests back while the server is down.
+    """
+
+    def __init__(self, api_url=API_URL, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 health_interval=HEALTH_INTERVAL, limiter=None, breaker=None):
+        self.pool_size = max(1, pool_size)
+        self.limiter = limiter
+        self.breaker = breaker
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self.endpoints = EndpointPool(api_url, health_interval=health_interval)
+        # pool_block makes extra threads wait for a free connection instead of
+        # opening throwaway ones that end up in TIME_WAIT.
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints.endpoints), pool_maxsize=self.pool_size,
+                              pool_block=True, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.usage = Counter()
+        self._usage_lock = threading.Lock()
+
+    @contextmanager
+    def _request(self):
+        """
+        Hold a concurrency slot and a replica for one request.
+
+        The body sets outcome['ok'] once the server has answered, and may set
+        'latency' (default: the whole request) and 'tokens' for the limiter.
+        Refused connections and 5xx take the replica out of rotation; those,
+        429 and timeouts count as failures for the limiter and the circuit
+        breaker. Other 4xx are the request's fault, not the server's.
+        """
+        if self.breaker is not None:
+            self.breaker.before_request()
+        ticket = self.limiter.acquire() if self.limiter is not None else None
+        endpoint = self.endpoints.acquire()
+        outcome = {}
+        failed = unhealthy = False
+        start = time.perf_counter()
+        try:
+            yield endpoint, outcome
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            failed = True
+            unhealthy = isinstance(e, requests.exceptions.ConnectionError)
+            raise
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            unhealthy = status >= 500
+            failed = unhealthy or status == 429
+            raise
+        finally:
+            self.endpoints.release(endpoint, not unhealthy)
+            if self.breaker is not None:
+                self.breaker.record(not failed)
+            if ticket is not None:
+                latency = outcome.get('latency', time.perf_counter() - start) if outcome.get('ok') else None
+                self.limiter.release(ticket, latency, outcome.get('tokens'), failed)
+
+    def chat(self, payload):
+        """
+        POST a chat completion payload and return the decoded JSON body.
+        Raises requests.exceptions.RequestException on network/HTTP errors.
+        """
+        with self._request() as (endpoint, outcome):
+            response = self.session.post(endpoint.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            outcome['ok'] = True
+            outcome['tokens'] = (data.get('usage') or {}).get('completion_tokens')
+        self.record_usage(data.get('usage'))
+        return data
+
+    def stream_chat(self, payload):
+        """
+        POST a streaming chat completion and yield its chunks as they arrive.
+
+        Closing the generator early closes the connection, which makes vLLM
+        abort the request instead of generating tokens nobody will read.
+        Usage is requested on every chunk so it is known even then. The
+        limiter sees the time to the first chunk, where queueing shows up.
+        """
+        payload = dict(payload, stream=True,
+                       stream_options={"include_usage": True, "continuous_usage_stats": True})
+        usage = None
+        with self._request() as (endpoint, outcome):
+            start = time.perf_counter()
+            response = self.session.post(endpoint.url, json=payload, timeout=self.timeout, stream=True)
+            with closing(response):
+                response.raise_for_status()
+                try:
+                    for chunk in iter_sse_events(response):
+                        if not outcome:
+                            outcome.update(ok=True, latency=time.perf_counter() - start)
+                        usage = chunk.get('usage') or usage
+                        yield chunk
+                finally:
+                    self.record_usage(usage)
+
+    def detect_guided_decoding(self, model, schema, modes=GUIDED_MODES):
+        """
+        Return the first guided-decoding mode the server actually enforces, or None.
+
+        A tiny request asks for a plain word under the schema: servers that
+        reject the parameter fail, and servers that silently ignore it answer
+        with the word instead of a JSON object.
+        """
+        for mode in modes:
+            payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": "Reply with the single word: hello"}],
+                "temperature": 0,
+                "max_tokens": 16,
+                **guided_decoding_params(mode, schema),
+            }
+            try:
+                data = self.chat(payload)
+                content = data['choices'][0]['message']['content'] or ''
+            except (requests.exceptions.RequestException, KeyError, IndexError, ValueError):
+                continue
+            if content.lstrip().startswith('{'):
+                return mode
+        return None
+
+    def record_usage(self, usage):
+        """
+        Accumulate the `usage` block of a response.
+        cached_tokens is only reported when vLLM runs with --enable-prompt-tokens-details.
+        """
+        if not usage:
+            return
+        details = usage.get('prompt_tokens_details') or {}
+        with self._usage_lock:
+            self.usage['requests'] += 1
+            self.usage['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            self.usage['completion_tokens'] += usage.get('completion_tokens') or 0
+            self.usage['cached_tokens'] += details.get('cached_tokens') or 0
+
+    def usage_summary(self):
+        with self._usage_lock:
+            usage = dict(self.usage)
+        prompt = usage.get('prompt_tokens', 0)
+        cached = usage.get('cached_tokens', 0)
+        cached_share = cached / prompt if prompt else 0.0
+        summary = (f"Usage: {usage.get('requests', 0)} requests, {prompt} prompt tokens "
+                   f"({cached} cached, {cached_share:.0%}), "
+                   f"{usage.get('completion_tokens', 0)} completion tokens")
+        if len(self.endpoints.endpoints) > 1:
+            summary += f"\nEndpoints: {self.endpoints.summary()}"
+        if self.limiter is not None:
+            summary += f"\n{self.limiter.summary()}"
+        if self.breaker is not None:
+            summary += f"\n{self.breaker.summary()}"
+        return summary
+
+    def close(self):
+        self.endpoints.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Return the process-wide client built from the environment configuration.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = VLLMClient()
+    return _default_client
+
+
+def guided_decoding_params(mode, schema):
+    """
+    Request fields that constrain the output to `schema` in the given mode.
+    """
+    if mode == 'response_format':
+        return {"response_format": {"type": "json_schema",
+                                    "json_schema": {"name": "translation", "schema": schema}}}
+    if mode == 'guided_json':
+        return {"guided_json": schema}
+    return {}
+
+
+def continuation_payload(payload, partial_content):
+    """
+    Build a request that continues a length-truncated assistant message.
+
+    vLLM's continue_final_message resumes generation from the end of the
+    partial answer instead of regenerating it from scratch. Guided decoding
+    is dropped: its grammar would start a new JSON object mid-string.
+    """
+    continued = {key: value for key, value in payload.items() if key not in GUIDED_MODES}
+    continued['messages'] = list(payload['messages']) + [
+        {"role": "assistant", "content": partial_content}
+    ]
+    continued['continue_final_message'] = True
+    continued['add_generation_prompt'] = False
+    return continued